@@ -8,6 +8,13 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from config.settings import Config
 from services.gemini_service import gemini_service
 from services.firebase_service import firebase_service
+from services.context_builder import context_builder
+from services.deadline import deadline
+from services.export_service import EXPORT_FORMATS, FORMATION_MODES, available_formats, export_query, time_fields
+from services.history_index import history_index
+from services.intent_router import intent_router
+from services.tracing import tracer
+import json
 from datetime import datetime
 
 # 페이지 설정
@@ -61,6 +68,162 @@ def display_recent_queries(user_id: str):
                     if 'timestamp' in query_data and query_data['timestamp']:
                         st.write(f"**시간:** {query_data['timestamp']}")
 
+def display_history_search(user_id: str):
+    """과거 질문/답변 검색 (로컬 색인, Firestore/Gemini 호출 없음)"""
+    st.sidebar.subheader("🔎 이전 질문 검색")
+    keyword = st.sidebar.text_input("검색어", placeholder="예: 가입자", label_visibility="collapsed")
+    if not keyword:
+        return
+    
+    only_mine = st.sidebar.checkbox("내 질문만", value=True)
+    results = history_index.search(keyword, user_id=user_id if only_mine else None,
+                                   limit=Config.HISTORY_SEARCH_LIMIT)
+    if not results:
+        st.sidebar.caption("검색 결과가 없습니다.")
+        return
+    
+    st.sidebar.caption(f"{len(results)}개 결과 (최신순)")
+    for query_data in results:
+        with st.sidebar.expander(query_data['query'][:30]):
+            st.write(f"**질문:** {query_data['query']}")
+            st.write(f"**답변:** {query_data['response']}")
+            if query_data.get('timestamp'):
+                st.write(f"**시간:** {query_data['timestamp']}")
+
+def display_chart(chart: dict):
+    """차트 데이터 표시 (서버에서 이미 점 개수를 줄인 데이터)"""
+    if not chart or not chart.get('x'):
+        return
+    
+    is_time_series = chart['type'] == 'line'
+    spec = {
+        'title': chart['title'],
+        'mark': {'type': 'line', 'point': len(chart['x']) <= 60} if is_time_series else {'type': 'bar'},
+        'data': {'values': [{'x': x, 'y': y} for x, y in zip(chart['x'], chart['y'])]},
+        'encoding': {
+            # 서버에서 정한 순서(구간/많은 순)를 그대로 유지
+            'x': {'field': 'x', 'type': 'temporal' if is_time_series else 'nominal',
+                  'sort': None, 'title': chart.get('x_label')},
+            'y': {'field': 'y', 'type': 'quantitative', 'title': chart.get('y_label')}
+        }
+    }
+    st.vega_lite_chart(spec, use_container_width=True)
+    if chart.get('original_points', 0) > len(chart['x']):
+        st.caption(f"📉 원본 {chart['original_points']:,}개 데이터를 {len(chart['x']):,}개 점으로 요약해 표시했습니다.")
+
+def display_trace(trace):
+    """질문 처리 단계별 소요 시간(waterfall) 표시 (디버그용)"""
+    if trace is None:
+        return
+    
+    with st.expander(f"🐞 처리 단계 ({trace.duration_ms:,.0f}ms)"):
+        rows = trace.waterfall()
+        labels = [f"{'  ' * row['depth']}{index + 1}. {row['name']}" for index, row in enumerate(rows)]
+        spec = {
+            'mark': {'type': 'bar', 'tooltip': True},
+            'data': {'values': [
+                {'단계': label, '시작(ms)': row['start_ms'], '끝(ms)': row['end_ms'],
+                 '소요(ms)': row['duration_ms'], '스레드': row['thread'],
+                 '속성': json.dumps(row['attributes'], ensure_ascii=False, default=str)}
+                for label, row in zip(labels, rows)
+            ]},
+            'encoding': {
+                'y': {'field': '단계', 'type': 'nominal', 'sort': None, 'title': None},
+                'x': {'field': '시작(ms)', 'type': 'quantitative', 'title': 'ms'},
+                'x2': {'field': '끝(ms)'},
+                'color': {'field': '스레드', 'type': 'nominal'}
+            },
+            'height': max(120, 22 * len(rows))
+        }
+        st.vega_lite_chart(spec, use_container_width=True)
+        st.download_button("⬇️ Chrome trace JSON 다운로드",
+                           data=json.dumps(trace.to_chrome(), ensure_ascii=False),
+                           file_name=f"trace_{trace.started_at.strftime('%Y%m%d_%H%M%S')}.json",
+                           mime="application/json")
+
+def display_export_section(prompt: str = None):
+    """질문과 관련된 원본 데이터 내보내기"""
+    if not firebase_service.has_backend():
+        return
+    
+    with st.expander("📥 데이터 내보내기"):
+        schema = firebase_service.get_database_schema()
+        collections = list(schema.get('collections', {}).keys())
+        if not collections:
+            st.info("내보낼 수 있는 컬렉션이 없습니다.")
+            return
+        
+        # 질문이 알려진 지표와 매칭되면 해당 컬렉션과 기간을 기본값으로 사용
+        intent = intent_router.match(prompt) if prompt else None
+        default_collection = 0
+        default_window = None
+        if intent:
+            metric = intent_router.get_metric(intent['metric'])
+            if metric and metric['collection'] in collections:
+                default_collection = collections.index(metric['collection'])
+                default_window = intent.get('window')
+        
+        window_options = {None: '전체 기간', 'today': '오늘', 'this_week': '이번 주',
+                          'this_month': '이번 달', 'last_7_days': '최근 7일'}
+        col_a, col_b = st.columns(2)
+        with col_a:
+            collection_name = st.selectbox("컬렉션", collections, index=default_collection)
+            # 기간 필터 필드는 선택한 컬렉션 스키마의 timestamp 필드 중에서 선택
+            fields = time_fields(collection_name)
+            time_field = st.selectbox("기간 기준 필드", fields) if fields else None
+            window = None
+            if time_field:
+                window = st.selectbox("기간", list(window_options.keys()),
+                                      index=list(window_options.keys()).index(default_window),
+                                      format_func=lambda key: window_options[key])
+        with col_b:
+            export_format = st.selectbox("형식", available_formats(),
+                                         format_func=lambda key: EXPORT_FORMATS[key]['label'])
+            formation_mode = st.selectbox("동선 배열(formations)", list(FORMATION_MODES.keys()),
+                                          format_func=lambda key: FORMATION_MODES[key])
+        
+        if st.button("📦 파일 만들기"):
+            filters = []
+            start = intent_router.window_start(window)
+            if start is not None:
+                filters.append({'field': time_field, 'operator': '>=', 'value': start})
+            
+            progress = st.progress(0.0, text="내보내는 중...")
+            
+            def on_progress(written, total):
+                ratio = min(written / total, 1.0) if total else 0.0
+                progress.progress(ratio, text=f"{written:,}건 기록됨" + (f" / {total:,}건" if total else ""))
+            
+            try:
+                path, written = export_query(collection_name, export_format, filters,
+                                             formation_mode=formation_mode,
+                                             progress_callback=on_progress)
+                # 이전에 만든 파일은 정리
+                previous = st.session_state.get('export_file')
+                if previous and os.path.exists(previous['path']):
+                    os.remove(previous['path'])
+                st.session_state.export_file = {
+                    'path': path,
+                    'rows': written,
+                    'name': f"{collection_name}{EXPORT_FORMATS[export_format]['suffix']}",
+                    'mime': EXPORT_FORMATS[export_format]['mime']
+                }
+                progress.progress(1.0, text=f"✅ {written:,}건 내보내기 완료")
+            except Exception as e:
+                st.error(f"❌ 내보내기 중 오류: {str(e)}")
+        
+        export_file = st.session_state.get('export_file')
+        if export_file and os.path.exists(export_file['path']):
+            # 다운로드 버튼은 파일 전체를 메모리에 올리므로 크기 상한까지만 제공
+            size_mb = os.path.getsize(export_file['path']) / (1024 * 1024)
+            if size_mb > Config.EXPORT_DOWNLOAD_MAX_MB:
+                st.warning(f"파일이 너무 큽니다 ({size_mb:,.1f}MB > {Config.EXPORT_DOWNLOAD_MAX_MB}MB). "
+                           f"기간을 줄이거나 동선 배열을 제외하고 다시 만들어주세요.")
+            else:
+                with open(export_file['path'], 'rb') as f:
+                    st.download_button(f"⬇️ {export_file['name']} 다운로드 ({export_file['rows']:,}건, {size_mb:,.1f}MB)",
+                                       data=f, file_name=export_file['name'], mime=export_file['mime'])
+
 def main():
     """메인 애플리케이션 함수"""
     # 서비스 초기화
@@ -76,6 +239,7 @@ def main():
     
     # 사이드바에 최근 질문들 표시
     display_recent_queries(st.session_state.user_id)
+    display_history_search(st.session_state.user_id)
     
     # 메인 컨텐츠
     col1, col2 = st.columns([3, 1])
@@ -91,6 +255,8 @@ def main():
         with st.expander("🔧 고급 옵션"):
             save_to_firebase = st.checkbox("Firebase에 질문 저장", value=True)
             include_context = st.checkbox("이전 대화 맥락 포함", value=False)
+            approximate = st.checkbox("⚡ 근사 모드 (표본 추정, 빠른 응답)", value=False,
+                                      help="큰 컬렉션의 합계/평균과 그룹별 지표를 무작위 표본으로 추정하고 신뢰구간을 함께 표시합니다.")
     
     with col2:
         st.subheader("📊 상태")
@@ -115,24 +281,38 @@ def main():
             return
         
         # 로딩 스피너와 함께 AI 응답 생성
-        with st.spinner("🤖 AI가 답변을 생성하는 중입니다..."):
+        with st.spinner("🤖 AI가 답변을 생성하는 중입니다..."), \
+                tracer.trace('app.question', question=prompt[:50]) as trace, \
+                deadline(Config.REQUEST_DEADLINE_SECONDS):
             # 컨텍스트 준비 (옵션)
             context = None
             if include_context and firebase_service.is_connected():
-                recent_queries = firebase_service.get_user_queries(st.session_state.user_id, limit=3)
-                if recent_queries:
-                    context = "\n".join([f"Q: {q['query']} A: {q['response']}" for q in recent_queries])
+                with tracer.span('app.context'):
+                    recent_queries = firebase_service.get_user_queries(
+                        st.session_state.user_id, limit=Config.CONTEXT_HISTORY_LIMIT)
+                    context = context_builder.build(st.session_state.user_id, prompt, recent_queries)
             
             # AI 응답 생성
-            response = gemini_service.generate_response(prompt, context)
-            
-            # 결과 표시
-            st.markdown("### 🎯 답변")
+            result = gemini_service.get_smart_query_result(prompt, context, approximate=approximate)
+            response = result['answer']
+        
+        # 결과 표시
+        st.markdown("### 🎯 답변")
+        if result.get('source') in ('partial', 'timeout'):
+            st.warning(response)
+        else:
             st.success(response)
-            
-            # Firebase에 저장 (옵션)
-            if save_to_firebase:
-                save_query_to_firebase(st.session_state.user_id, prompt, response)
+        display_chart(result.get('chart'))
+        
+        # 처리 단계별 소요 시간
+        display_trace(trace)
+
+        # Firebase에 저장 (옵션)
+        if save_to_firebase:
+            save_query_to_firebase(st.session_state.user_id, prompt, response)
+    
+    # 데이터 내보내기
+    display_export_section(prompt)
     
     # 푸터
     st.markdown("---")
@@ -0,0 +1,141 @@
+"""
+질문 일괄 실행 CLI
+
+JSONL 파일의 질문들을 UI 없이 get_smart_query_response 경로로 동시에 처리하고,
+답변/소요 시간/토큰 사용량을 JSONL로 기록합니다. 캐시와 Gemini 속도 제한은 모든 작업 스레드가 공유합니다.
+
+입력 형식 (한 줄에 하나):
+    {"id": "q1", "question": "오늘 신규 가입자 수는?", "user_id": "nightly"}
+    ("approximate": true를 넣으면 해당 질문은 표본 기반 근사 모드로 처리)
+
+사용 예:
+    python batch_runner.py questions.jsonl -o answers.jsonl --concurrency 8 --save
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+from config.settings import Config
+from services.firebase_service import firebase_service
+from services.gemini_service import gemini_service
+
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    """JSONL 질문 파일 읽기 (빈 줄 무시, 문자열만 있는 줄은 질문으로 취급)
+
+    JSON으로 읽을 수 없는 줄은 배치를 멈추지 않고 'error'가 있는 실패 항목으로 넣어 결과에 기록합니다.
+    """
+    questions = []
+    with open(path, encoding='utf-8') as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                item = {'error': f"{line_number}번째 줄 JSON 오류: {e.msg}"}
+            if isinstance(item, str):
+                item = {'question': item}
+            if not isinstance(item, dict):
+                item = {'error': f"{line_number}번째 줄이 객체나 문자열이 아닙니다"}
+            if item.get('error'):
+                print(item['error'], file=sys.stderr)
+                item.update(id=str(line_number), question=line)
+                questions.append(item)
+                continue
+            if not item.get('question'):
+                print(f"{line_number}번째 줄에 question이 없어 건너뜁니다.", file=sys.stderr)
+                continue
+            item.setdefault('id', str(line_number))
+            questions.append(item)
+    return questions
+
+
+def answer_question(item: Dict[str, Any]) -> Dict[str, Any]:
+    """질문 하나 처리 (작업 스레드에서 실행)"""
+    gemini_service.reset_usage()
+    started = time.perf_counter()
+    try:
+        if item.get('error'):
+            raise ValueError(item['error'])  # 입력 줄을 읽지 못한 항목
+        result = gemini_service.get_smart_query_result(item['question'], item.get('context'),
+                                                      approximate=bool(item.get('approximate')))
+        answer, source, error = result['answer'], result['source'], None
+    except Exception as e:
+        answer, source, error = None, 'error', str(e)
+
+    return {
+        'id': item['id'],
+        'question': item['question'],
+        'user_id': item.get('user_id'),
+        'answer': answer,
+        'source': source,
+        'error': error,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        'usage': dict(gemini_service.get_usage()),
+        'answered_at': datetime.now().isoformat(timespec='seconds')
+    }
+
+
+def run_batch(questions: List[Dict[str, Any]], concurrency: int) -> Iterator[Dict[str, Any]]:
+    """질문들을 최대 concurrency개씩 동시에 처리하여 입력 순서대로 결과 반환"""
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch') as executor:
+        yield from executor.map(answer_question, questions)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='JSONL 질문 파일을 일괄 실행합니다.')
+    parser.add_argument('input', help='질문 JSONL 파일')
+    parser.add_argument('-o', '--output', help='결과 JSONL 파일 (기본: 표준 출력)')
+    parser.add_argument('--concurrency', type=int, default=Config.BATCH_CONCURRENCY,
+                        help='동시에 처리할 질문 수')
+    parser.add_argument('--user-id', default='batch_runner', help='질문에 user_id가 없을 때 사용할 값')
+    parser.add_argument('--save', action='store_true', help='결과를 user_queries에 일괄 저장')
+    parser.add_argument('--save-batch-size', type=int, default=Config.BATCH_SAVE_SIZE,
+                        help='user_queries 일괄 저장 단위')
+    args = parser.parse_args(argv)
+
+    questions = load_questions(args.input)
+    for item in questions:
+        item.setdefault('user_id', args.user_id)
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    pending: List[Dict[str, str]] = []
+    saved = failed = 0
+    totals = {'calls': 0, 'total_tokens': 0}
+    started = time.perf_counter()
+    try:
+        for result in run_batch(questions, args.concurrency):
+            output.write(json.dumps(result, ensure_ascii=False) + '\n')
+            output.flush()
+            totals['calls'] += result['usage']['calls']
+            totals['total_tokens'] += result['usage']['total_tokens']
+
+            if result['error'] or result['source'] == 'error':
+                failed += 1
+            elif args.save:
+                pending.append({'user_id': result['user_id'], 'query': result['question'],
+                                'response': result['answer']})
+                if len(pending) >= args.save_batch_size:
+                    saved += firebase_service.save_user_queries_batch(pending, args.save_batch_size)
+                    pending = []
+
+        if pending:
+            saved += firebase_service.save_user_queries_batch(pending, args.save_batch_size)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"질문 {len(questions)}개 처리 완료 ({elapsed:.1f}초, 실패 {failed}개, "
+          f"LLM 호출 {totals['calls']}회, 토큰 {totals['total_tokens']:,}개, 저장 {saved}개)",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
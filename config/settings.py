@@ -30,20 +30,137 @@ def get_env_var(key: str, default: str = None):
     # 둘 다 없으면 기본값 반환
     return default
 
+def parse_int_map(value: str) -> dict:
+    """'키=정수,키=정수' 형식 문자열을 dict로 변환"""
+    result = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        key, number = item.split("=", 1)
+        try:
+            result[key.strip()] = int(number)
+        except ValueError:
+            continue
+    return result
+
 class Config:
     """애플리케이션 설정 클래스"""
     
     # Gemini API 설정
     GEMINI_API_KEY = get_env_var("GEMINI_API_KEY")
     GEMINI_MODEL = "gemini-2.0-flash"
+    # 분당 요청 수 제한 (0이면 제한 없음)과 연속 허용 요청 수
+    GEMINI_RPM = float(get_env_var("GEMINI_RPM", "60"))
+    GEMINI_BURST = int(get_env_var("GEMINI_BURST", "5"))
     
     # Firebase 설정
     FIREBASE_CREDENTIALS_PATH = get_env_var("FIREBASE_CREDENTIALS_PATH", "config/firebase-credentials.json")
     FIREBASE_PROJECT_ID = get_env_var("FIREBASE_PROJECT_ID")
     
+    # 조회용 저장소 백엔드 설정 ('firestore' 또는 'sqlite')
+    STORAGE_BACKEND = get_env_var("STORAGE_BACKEND", "firestore").lower()
+    SQLITE_DB_PATH = get_env_var("SQLITE_DB_PATH", "data/local.db")
+    
     # Streamlit 설정
     APP_TITLE = "🤖 New Flower"
-    
+
+    # 대화 맥락 설정
+    CONTEXT_TOKEN_BUDGET = int(get_env_var("CONTEXT_TOKEN_BUDGET", "800"))
+    CONTEXT_HISTORY_LIMIT = int(get_env_var("CONTEXT_HISTORY_LIMIT", "10"))
+
+    # 빠른 경로(의도 라우터) 설정
+    INTENT_ROUTER_ENABLED = get_env_var("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+    INTENT_METRIC_TTL = int(get_env_var("INTENT_METRIC_TTL", "300"))
+
+    # 컬렉션 조인 설정
+    JOIN_BATCH_SIZE = int(get_env_var("JOIN_BATCH_SIZE", "100"))
+    JOIN_CACHE_SIZE = int(get_env_var("JOIN_CACHE_SIZE", "5000"))
+    JOIN_CACHE_TTL = int(get_env_var("JOIN_CACHE_TTL", "300"))
+
+    # 데이터 내보내기 설정
+    # - EXPORT_DIR: 내보내기 파일 저장 위치, EXPORT_FILE_TTL_MINUTES가 지난 파일은 다음 내보내기 때 삭제
+    # - EXPORT_DOWNLOAD_MAX_MB: 다운로드 버튼은 파일 전체를 메모리로 읽으므로 이 크기까지만 제공
+    EXPORT_PAGE_SIZE = int(get_env_var("EXPORT_PAGE_SIZE", "500"))
+    EXPORT_DIR = get_env_var("EXPORT_DIR", "data/exports")
+    EXPORT_FILE_TTL_MINUTES = int(get_env_var("EXPORT_FILE_TTL_MINUTES", "60"))
+    EXPORT_DOWNLOAD_MAX_MB = int(get_env_var("EXPORT_DOWNLOAD_MAX_MB", "50"))
+
+    # 차트 설정 (브라우저로 보내는 최대 점/막대 개수)
+    CHART_POINT_BUDGET = int(get_env_var("CHART_POINT_BUDGET", "500"))
+    CHART_MAX_BARS = int(get_env_var("CHART_MAX_BARS", "20"))
+
+    # 동선 분석 설정
+    # - FORMATION_MOVE_EPSILON: 이 거리보다 많이 움직여야 대형 변화로 셈
+    # - FORMATION_CHUNK_SIZE: 한 번에 읽어 분석할 작품 수
+    # - FORMATION_BATCH_ELEMENTS: 벡터 연산 중간 배열 최대 원소 수 (메모리 상한)
+    FORMATION_MOVE_EPSILON = float(get_env_var("FORMATION_MOVE_EPSILON", "0.01"))
+    FORMATION_CHUNK_SIZE = int(get_env_var("FORMATION_CHUNK_SIZE", "200"))
+    FORMATION_BATCH_ELEMENTS = int(get_env_var("FORMATION_BATCH_ELEMENTS", "4000000"))
+
+    # 배치 실행 설정 (batch_runner.py)
+    BATCH_CONCURRENCY = int(get_env_var("BATCH_CONCURRENCY", "4"))
+    BATCH_SAVE_SIZE = int(get_env_var("BATCH_SAVE_SIZE", "100"))
+
+    # 질문 수 분산 카운터 shard 수 (많을수록 동시 쓰기에 강하지만 읽기 수 증가)
+    QUERY_COUNTER_SHARDS = int(get_env_var("QUERY_COUNTER_SHARDS", "10"))
+
+    # 사용자별 최근 대화 링 버퍼 / 질문 기록 보존 설정 (maintenance.py)
+    USER_HISTORY_SIZE = int(get_env_var("USER_HISTORY_SIZE", "20"))
+    USER_HISTORY_RESPONSE_CHARS = int(get_env_var("USER_HISTORY_RESPONSE_CHARS", "4000"))
+    QUERY_RETENTION_DAYS = int(get_env_var("QUERY_RETENTION_DAYS", "90"))
+    QUERY_ARCHIVE_COLLECTION = get_env_var("QUERY_ARCHIVE_COLLECTION", "user_queries_archive")
+
+    # 과거 질문 검색 색인 (로컬 파일)
+    HISTORY_INDEX_PATH = get_env_var("HISTORY_INDEX_PATH", "data/history_index.json.gz")
+    HISTORY_INDEX_RESPONSE_CHARS = int(get_env_var("HISTORY_INDEX_RESPONSE_CHARS", "2000"))
+    HISTORY_INDEX_FLUSH_EVERY = int(get_env_var("HISTORY_INDEX_FLUSH_EVERY", "20"))
+    HISTORY_SEARCH_LIMIT = int(get_env_var("HISTORY_SEARCH_LIMIT", "10"))
+
+    # 단계별 추적 설정
+    # - TRACE_EXPORT_DIR: 지정하면 요청마다 Chrome trace-event JSON 파일을 저장
+    TRACE_ENABLED = get_env_var("TRACE_ENABLED", "true").lower() == "true"
+    TRACE_EXPORT_DIR = get_env_var("TRACE_EXPORT_DIR", "")
+    TRACE_HISTORY = int(get_env_var("TRACE_HISTORY", "20"))
+
+    # 실시간 모드 ('오늘' 지표를 Firestore 리스너 카운터로 유지)
+    LIVE_MODE = get_env_var("LIVE_MODE", "false").lower() == "true"
+
+    # 쿼리 결과 캐시 설정
+    # - QUERY_CACHE_SNAP_SECONDS: datetime 필터를 내림할 구간 (초)
+    # - QUERY_CACHE_TTLS: 컬렉션별 TTL (초, 0이면 캐시하지 않음)
+    QUERY_CACHE_ENABLED = get_env_var("QUERY_CACHE_ENABLED", "true").lower() == "true"
+    QUERY_CACHE_SIZE = int(get_env_var("QUERY_CACHE_SIZE", "256"))
+    QUERY_CACHE_TTL = int(get_env_var("QUERY_CACHE_TTL", "60"))
+    QUERY_CACHE_SNAP_SECONDS = int(get_env_var("QUERY_CACHE_SNAP_SECONDS", "300"))
+    QUERY_CACHE_COLLECTION_TTLS = parse_int_map(get_env_var(
+        "QUERY_CACHE_TTLS",
+        "User_V2=120,PERFORMANCE_V2=120,PREMIUM_PERFORMANCE_V2=600,user_queries=0,business_data=60"))
+
+    # 프로세스 간 공유 캐시 (여러 Streamlit 프로세스가 같은 서버에서 실행될 때)
+    # - SHARED_CACHE_VERSION: 바꾸면 기존 공유 캐시 항목을 모두 무시 (배포 시 데이터 형식이 바뀌면 변경)
+    SHARED_CACHE_ENABLED = get_env_var("SHARED_CACHE_ENABLED", "true").lower() == "true"
+    SHARED_CACHE_PATH = get_env_var("SHARED_CACHE_PATH", "data/shared_cache.db")
+    SHARED_CACHE_MAX_MB = int(get_env_var("SHARED_CACHE_MAX_MB", "256"))
+    SHARED_CACHE_VERSION = get_env_var("SHARED_CACHE_VERSION", "1")
+    SHARED_CACHE_DASHBOARD_TTL = int(get_env_var("SHARED_CACHE_DASHBOARD_TTL", "60"))
+    SHARED_CACHE_ANSWER_TTL = int(get_env_var("SHARED_CACHE_ANSWER_TTL", "300"))
+
+    # 요청 마감 시간 (초, 0이면 제한 없음)
+    # - DEADLINE_SHARE_*: 스마트 쿼리 단계별로 사용할 남은 시간 비율 (데이터 조회 → 최종 답변 LLM은 나머지 전부)
+    # - DASHBOARD_DEADLINE_SECONDS: 대시보드 영역 조회 제한, 넘긴 영역은 마지막 결과를 부분 결과로 표시
+    REQUEST_DEADLINE_SECONDS = float(get_env_var("REQUEST_DEADLINE_SECONDS", "30"))
+    DEADLINE_SHARE_EXECUTE = float(get_env_var("DEADLINE_SHARE_EXECUTE", "0.5"))
+    DASHBOARD_DEADLINE_SECONDS = float(get_env_var("DASHBOARD_DEADLINE_SECONDS", "8"))
+
+    # 근사 모드 (표본 기반 추정)
+    # - APPROX_SAMPLE_SIZE: 읽을 표본 문서 수, APPROX_PARTITIONS: 표본을 나눠 읽을 무작위 문서 ID 구간 수
+    #   (구간이 작고 많을수록 단순 무작위 표본에 가까워짐)
+    # - APPROX_MIN_POPULATION: 전체 문서 수가 이보다 적으면 근사 모드에서도 정확히 계산
+    APPROX_SAMPLE_SIZE = int(get_env_var("APPROX_SAMPLE_SIZE", "2000"))
+    APPROX_PARTITIONS = int(get_env_var("APPROX_PARTITIONS", "100"))
+    APPROX_CONFIDENCE = float(get_env_var("APPROX_CONFIDENCE", "0.95"))
+    APPROX_MIN_POPULATION = int(get_env_var("APPROX_MIN_POPULATION", "5000"))
+
     @classmethod
     def validate_config(cls):
         """필수 설정값들이 있는지 확인"""
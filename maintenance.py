@@ -0,0 +1,75 @@
+"""
+질문 기록 정리 CLI
+
+보존 기간(QUERY_RETENTION_DAYS)보다 오래된 user_queries 문서를 batch 삭제하여 조회 대상 컬렉션을 작게 유지합니다.
+--archive를 주면 삭제 전에 QUERY_ARCHIVE_COLLECTION으로 복사합니다.
+질문 수 카운터(누적)와 사용자별 최근 대화 링 버퍼(user_history)는 그대로 유지되고,
+과거 질문 검색 색인에서는 같은 기간보다 오래된 질문을 함께 제거합니다.
+--rebuild-index는 과거 질문 검색 색인 파일을 user_queries 전체로 다시 만듭니다.
+--rebuild-counters는 질문 수 분산 카운터를 user_queries 전체로 다시 계산합니다 (배포 시 1회 필수).
+
+사용 예:
+    python maintenance.py --days 90 --archive
+    python maintenance.py --days 30 --dry-run
+    python maintenance.py --rebuild-index
+    python maintenance.py --rebuild-counters
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List
+from config.settings import Config
+from services.firebase_service import firebase_service
+from services.history_index import history_index
+from services.sharded_counter import query_counter
+from services.user_history import user_history_store
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='오래된 질문 기록을 보관/삭제합니다.')
+    parser.add_argument('--days', type=int, default=Config.QUERY_RETENTION_DAYS,
+                        help='이 기간(일)보다 오래된 문서를 정리')
+    parser.add_argument('--archive', action='store_true',
+                        help=f'삭제 전에 {Config.QUERY_ARCHIVE_COLLECTION} 컬렉션으로 복사')
+    parser.add_argument('--batch-size', type=int, default=400,
+                        help='한 번에 커밋할 문서 수 (보관 시 최대 250)')
+    parser.add_argument('--dry-run', action='store_true', help='대상 문서 수만 출력')
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help='정리 대신 과거 질문 검색 색인을 다시 만듦')
+    parser.add_argument('--rebuild-counters', action='store_true',
+                        help='정리 대신 질문 수 카운터를 기존 질문으로 다시 계산')
+    args = parser.parse_args(argv)
+
+    if not firebase_service.is_connected():
+        print("Firebase가 연결되지 않아 정리할 수 없습니다.", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    if args.rebuild_counters:
+        count = query_counter.rebuild()
+        print(f"질문 {count:,}개로 카운터 재계산 완료 ({time.perf_counter() - started:.1f}초)", file=sys.stderr)
+        return 0
+
+    if args.rebuild_index:
+        count = history_index.rebuild()
+        print(f"질문 {count:,}개 색인 완료 ({time.perf_counter() - started:.1f}초) → {history_index.path}",
+              file=sys.stderr)
+        return 0
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.days)
+    count = user_history_store.compact(args.days, archive=args.archive,
+                                       batch_size=args.batch_size, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"{args.days}일보다 오래된 질문 {count:,}개가 정리 대상입니다.", file=sys.stderr)
+    else:
+        # 보존 기간이 지난 질문은 검색 색인에서도 제거
+        removed = history_index.remove_older_than(cutoff)
+        action = '보관 후 삭제' if args.archive else '삭제'
+        print(f"질문 {count:,}개 {action}, 검색 색인 {removed:,}개 제거 완료 "
+              f"({time.perf_counter() - started:.1f}초)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
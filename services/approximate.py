@@ -0,0 +1,249 @@
+"""
+근사 집계 모듈
+
+탐색용 질문처럼 정확한 값이 꼭 필요하지 않을 때, 컬렉션 전체를 읽지 않고 무작위 표본(무작위 문서 ID 구간)만 읽어
+합계/평균과 그룹별 개수를 신뢰구간과 함께 추정합니다.
+개수는 서버 측 COUNT 집계 한 번이 표본 읽기보다 빠르고 정확하므로 추정하지 않습니다.
+
+- 전체 문서 수 N은 서버 측 COUNT 집계로 구하고(문서를 내려받지 않음), 필터는 표본에 메모리에서 적용합니다.
+  (표본 쿼리는 ID 순 정렬만 쓰므로 필터 필드와 조합한 복합 인덱스가 필요 없음)
+- 합계: N × (표본 평균), 평균: 조건을 만족하는 표본의 평균 (정규 근사 신뢰구간, 유한 모집단 보정 포함)
+  조건을 만족하는 표본이 _MIN_MATCHED개보다 적으면 정규 근사가 맞지 않으므로 추정하지 않습니다
+  (드문 조건은 서버 측 필터로 읽을 문서도 적어 정확한 계산이 빠름).
+- 그룹별 개수: 비율마다 Wilson 점수 구간, 표본에 나타나지 않은 값은 rule of three(-ln(1-신뢰수준)/n) 상한
+- 모든 구간은 표본을 단순 무작위 표본으로 가정합니다. ID 구간 표본은 문서 ID가 Firestore 자동 생성 ID일 때만
+  이 가정을 만족하므로, 그렇지 않은 컬렉션은 백엔드가 저수지 표본(전체 1회 스캔)으로 대신합니다.
+- 요청 단위 설정: approximate_mode()로 켜면 get_aggregated_data와 그룹별 지표가 근사 모드로 계산됩니다.
+"""
+import contextvars
+import math
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import Config
+
+_approximate: contextvars.ContextVar[bool] = contextvars.ContextVar('approximate_mode', default=False)
+
+
+def is_approximate() -> bool:
+    """현재 요청이 근사 모드인지 여부"""
+    return _approximate.get()
+
+
+@contextmanager
+def approximate_mode(enabled: bool = True):
+    """이 블록 안의 집계/그룹 조회를 근사 모드로 실행"""
+    token = _approximate.set(bool(enabled))
+    try:
+        yield
+    finally:
+        _approximate.reset(token)
+
+
+def _comparable(left: Any, right: Any):
+    """비교용 값 정리 (시간대 없는 datetime은 Firestore 클라이언트와 같이 UTC로 간주)"""
+    if isinstance(left, datetime) and isinstance(right, datetime):
+        if left.tzinfo is None:
+            left = left.replace(tzinfo=timezone.utc)
+        if right.tzinfo is None:
+            right = right.replace(tzinfo=timezone.utc)
+    return left, right
+
+
+_COMPARATORS = {
+    '<': lambda left, right: left < right,
+    '<=': lambda left, right: left <= right,
+    '>': lambda left, right: left > right,
+    '>=': lambda left, right: left >= right,
+}
+
+
+def matches(row: Dict[str, Any], filters: Optional[List[Dict]]) -> bool:
+    """Firestore 필터 조건을 문서 하나에 메모리에서 적용"""
+    for condition in filters or []:
+        field = condition.get('field')
+        value = condition.get('value')
+        if not field or value is None:
+            continue
+        operator = condition.get('operator', '==')
+        if field not in row:
+            return False  # Firestore도 필드가 없는 문서는 결과에서 제외
+        actual = row[field]
+        try:
+            if operator == '==':
+                left, right = _comparable(actual, value)
+                ok = left == right
+            elif operator == '!=':
+                left, right = _comparable(actual, value)
+                ok = left != right
+            elif operator in _COMPARATORS:
+                ok = _COMPARATORS[operator](*_comparable(actual, value))
+            elif operator == 'in':
+                ok = actual in value
+            elif operator == 'not-in':
+                ok = actual not in value
+            elif operator == 'array-contains':
+                ok = isinstance(actual, list) and value in actual
+            elif operator == 'array-contains-any':
+                ok = isinstance(actual, list) and any(item in actual for item in value)
+            else:
+                return False
+        except TypeError:
+            ok = False  # 타입이 다른 값은 Firestore에서도 범위 비교에 걸리지 않음
+        if not ok:
+            return False
+    return True
+
+
+# 합계/평균을 추정하기 위한 조건 만족 표본 최소 개수
+_MIN_MATCHED = 30
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class ApproximateAggregator:
+    """표본 기반 근사 집계"""
+
+    def __init__(self, sample_size: int = None, partitions: int = None, confidence: float = None,
+                 min_population: int = None):
+        self.sample_size = sample_size or Config.APPROX_SAMPLE_SIZE
+        self.partitions = partitions or Config.APPROX_PARTITIONS
+        self.confidence = confidence or Config.APPROX_CONFIDENCE
+        self.min_population = Config.APPROX_MIN_POPULATION if min_population is None else min_population
+        self._z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+
+    def _population(self, collection_name: str) -> int:
+        from services.firebase_service import firebase_service
+        return firebase_service.backend.count(collection_name)
+
+    def _sample(self, collection_name: str, fields: List[str]) -> List[Dict[str, Any]]:
+        from services.firebase_service import firebase_service
+        return firebase_service.backend.sample(collection_name, self.sample_size, self.partitions,
+                                               select=sorted(set(fields)) or ['__name__'])
+
+    def should_sample(self, population: int) -> bool:
+        """표본이 전체의 절반을 넘으면 정확한 계산이 더 낫다고 판단"""
+        return population >= max(self.min_population, self.sample_size * 2)
+
+    def _fpc(self, population: int, n: int) -> float:
+        """유한 모집단 보정"""
+        return math.sqrt(max(0.0, (population - n) / (population - 1))) if population > 1 else 0.0
+
+    def _wilson(self, count: int, n: int, fpc: float) -> Tuple[float, float]:
+        """표본 n개 중 count개인 비율의 Wilson 점수 구간 (0개여도 상한이 0이 되지 않음)"""
+        p = count / n
+        z2 = self._z ** 2
+        denominator = 1 + z2 / n
+        center = (p + z2 / (2 * n)) / denominator
+        half_width = self._z * math.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / denominator * fpc
+        return max(0.0, center - half_width), min(1.0, center + half_width)
+
+    def _estimate(self, value: float, standard_error: float, n: int, population: int) -> Dict[str, Any]:
+        margin = self._z * standard_error
+        return {
+            'result': value,
+            'approximate': True,
+            'margin': margin,
+            'ci_low': value - margin,
+            'ci_high': value + margin,
+            'confidence': self.confidence,
+            'sample_size': n,
+            'population': population,
+        }
+
+    def aggregate(self, collection_name: str, aggregation_type: str, field: str = None,
+                  filters: List[Dict] = None) -> Optional[Dict[str, Any]]:
+        """sum/avg 추정 (표본으로 추정할 수 없으면 None → 호출 측에서 정확히 계산)
+
+        count는 서버 측 COUNT 집계 한 번이 표본(N 조회 + 문서 수천 개)보다 빠르고 정확하므로 항상 None입니다.
+        """
+        aggregation_type = aggregation_type.lower()
+        if aggregation_type not in ('sum', 'avg') or not field:
+            return None
+        fields = [condition['field'] for condition in filters or []
+                  if condition.get('field') and condition.get('value') is not None]
+        population = self._population(collection_name)
+        if not self.should_sample(population):
+            return None
+
+        rows = self._sample(collection_name, fields + [field])
+        n = len(rows)
+        if not n:
+            return None
+
+        values = [row[field] for row in rows if matches(row, filters) and _is_number(row.get(field))]
+        if len(values) < _MIN_MATCHED:
+            return None  # 조건을 만족하는 표본이 너무 적어 오차를 믿을 수 없음
+        fpc = self._fpc(population, n)
+        if aggregation_type == 'sum':
+            # 조건에 맞지 않는 표본은 0으로 보고 N × 평균으로 추정
+            contributions = values + [0] * (n - len(values))
+            mean = sum(contributions) / n
+            variance = sum((value - mean) ** 2 for value in contributions) / max(1, n - 1)
+            estimate = self._estimate(population * mean, population * math.sqrt(variance / n) * fpc,
+                                      n, population)
+            estimate.update(type='sum', count=int(round(population * len(values) / n)))
+            return estimate
+
+        mean = sum(values) / len(values)
+        variance = sum((value - mean) ** 2 for value in values) / max(1, len(values) - 1)
+        estimate = self._estimate(mean, math.sqrt(variance / len(values)) * fpc, n, population)
+        estimate.update(type='avg', count=int(round(population * len(values) / n)))
+        return estimate
+
+    def group_counts(self, collection_name: str, field: str,
+                     filters: List[Dict] = None) -> Optional[Dict[str, Any]]:
+        """그룹별 문서 수 추정 (표본으로 추정할 수 없으면 None)
+
+        Returns:
+            {'groups': {값: 추정 개수}, 'intervals': {값: (하한, 상한)}, 'margins': {값: 구간 반폭},
+             'unseen_max': 표본에 없는 값의 개수 상한, 'total', 'approximate', 'confidence', 'sample_size', 'population'}
+        """
+        population = self._population(collection_name)
+        if not self.should_sample(population):
+            return None
+
+        fields = [condition['field'] for condition in filters or []
+                  if condition.get('field') and condition.get('value') is not None] + [field]
+        rows = self._sample(collection_name, fields)
+        n = len(rows)
+        if not n:
+            return None
+
+        counts = Counter(row.get(field) for row in rows if field in row and matches(row, filters))
+        fpc = self._fpc(population, n)
+        scale = population / n
+        groups = {value: int(round(count * scale)) for value, count in counts.items()}
+        intervals = {}
+        for value, count in counts.items():
+            low, high = self._wilson(count, n, fpc)
+            intervals[value] = (int(math.floor(population * low)), int(math.ceil(population * high)))
+        return {
+            'groups': groups,
+            'intervals': intervals,
+            'margins': {value: (high - low) / 2 for value, (low, high) in intervals.items()},
+            # rule of three: 표본 n개에 한 번도 없었다면 비율 상한은 -ln(1-신뢰수준)/n
+            'unseen_max': int(math.ceil(population * min(1.0, -math.log(1 - self.confidence) / n))),
+            'total': int(round(sum(counts.values()) * scale)),
+            'approximate': True,
+            'confidence': self.confidence,
+            'sample_size': n,
+            'population': population,
+        }
+
+
+def describe_estimate(result: Dict[str, Any], unit: str = '') -> str:
+    """근사 결과에 붙일 설명 (정확한 결과면 빈 문자열)"""
+    if not result or not result.get('approximate'):
+        return ''
+    margin = result.get('margin')
+    interval = f", {result['confidence'] * 100:.0f}% 신뢰구간 ±{margin:,.1f}{unit}" if margin is not None else ''
+    return f" (표본 {result['sample_size']:,}개 기준 추정치{interval})"
+
+
+# 싱글톤 인스턴스 생성
+approximate_aggregator = ApproximateAggregator()
@@ -0,0 +1,164 @@
+"""
+차트 데이터 생성 모듈
+
+질의 결과를 Streamlit 차트용 데이터로 변환합니다.
+데이터가 많으면 서버에서 먼저 줄여서(시계열은 LTTB, 분포는 구간화) 브라우저로 보내는 점 개수를 제한합니다.
+"""
+import math
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from config.settings import Config
+
+
+def lttb(points: Sequence[Tuple[float, float]], threshold: int) -> List[Tuple[float, float]]:
+    """Largest-Triangle-Three-Buckets 다운샘플링
+
+    시계열의 모양(최고점/최저점)을 최대한 유지하면서 점 개수를 threshold 이하로 줄입니다.
+
+    Args:
+        points: x 기준으로 정렬된 (x, y) 목록
+        threshold: 남길 최대 점 개수 (3 이상)
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (count - 2) / (threshold - 2)
+    selected_index = 0
+
+    for bucket in range(threshold - 2):
+        # 다음 버킷의 평균점
+        next_start = int(math.floor((bucket + 1) * bucket_size)) + 1
+        next_end = min(int(math.floor((bucket + 2) * bucket_size)) + 1, count)
+        next_points = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(point[0] for point in next_points) / len(next_points)
+        avg_y = sum(point[1] for point in next_points) / len(next_points)
+
+        # 현재 버킷에서 삼각형 넓이가 가장 큰 점 선택
+        start = int(math.floor(bucket * bucket_size)) + 1
+        end = int(math.floor((bucket + 1) * bucket_size)) + 1
+        anchor_x, anchor_y = points[selected_index]
+        max_area = -1.0
+        for index in range(start, end):
+            x, y = points[index]
+            area = abs((anchor_x - avg_x) * (y - anchor_y) - (anchor_x - x) * (avg_y - anchor_y))
+            if area > max_area:
+                max_area = area
+                selected_index = index
+        sampled.append(points[selected_index])
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def histogram(values: Sequence[float], bins: int) -> List[Tuple[str, int]]:
+    """값 목록을 bins개 구간으로 나눈 (구간 라벨, 개수) 목록"""
+    values = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+    if not values:
+        return []
+
+    low, high = min(values), max(values)
+    if low == high:
+        return [(f"{low:,.0f}", len(values))]
+
+    width = (high - low) / bins
+    counts = [0] * bins
+    for value in values:
+        index = min(int((value - low) / width), bins - 1)
+        counts[index] += 1
+    return [(f"{low + index * width:,.0f}~{low + (index + 1) * width:,.0f}", counts[index])
+            for index in range(bins)]
+
+
+def rebin_categories(groups: Dict[Any, int], max_bars: int) -> List[Tuple[str, int]]:
+    """범주형 분포를 막대 개수 제한에 맞게 정리 (상위 항목 + '기타')"""
+    ordered = sorted(groups.items(), key=lambda item: -item[1])
+    if len(ordered) <= max_bars:
+        return [(str(key), count) for key, count in ordered]
+    head = ordered[:max_bars - 1]
+    rest = sum(count for _, count in ordered[max_bars - 1:])
+    return [(str(key), count) for key, count in head] + [('기타', rest)]
+
+
+def daily_counts(timestamps: Sequence[Any]) -> List[Tuple[date, int]]:
+    """시각 목록을 일별 개수로 집계 (빈 날짜는 0으로 채움)"""
+    counts = Counter()
+    for value in timestamps:
+        if isinstance(value, datetime):
+            counts[value.date()] += 1
+        elif isinstance(value, date):
+            counts[value] += 1
+    if not counts:
+        return []
+
+    day = min(counts)
+    last = max(counts)
+    series = []
+    while day <= last:
+        series.append((day, counts.get(day, 0)))
+        day += timedelta(days=1)
+    return series
+
+
+def time_series_chart(series: Sequence[Tuple[date, float]], title: str, y_label: str,
+                      point_budget: int = None) -> Optional[Dict[str, Any]]:
+    """(날짜, 값) 시계열을 점 예산에 맞춘 선 차트 데이터로 변환"""
+    if not series:
+        return None
+
+    point_budget = point_budget or Config.CHART_POINT_BUDGET
+    points = [(datetime(day.year, day.month, day.day).timestamp(), float(value)) for day, value in series]
+    sampled = lttb(points, point_budget)
+    return {
+        'type': 'line',
+        'title': title,
+        'x_label': '날짜',
+        'y_label': y_label,
+        'x': [datetime.fromtimestamp(x).date().isoformat() for x, _ in sampled],
+        'y': [y for _, y in sampled],
+        'original_points': len(points),
+    }
+
+
+def distribution_chart(groups: Dict[Any, int], title: str, y_label: str,
+                       labels: Dict[Any, str] = None, max_bars: int = None) -> Optional[Dict[str, Any]]:
+    """범주형 분포를 막대 차트 데이터로 변환"""
+    if not groups:
+        return None
+
+    max_bars = max_bars or Config.CHART_MAX_BARS
+    labels = labels or {}
+    named = Counter()
+    for key, count in groups.items():
+        named[labels.get(key, str(key))] += count
+    bars = rebin_categories(dict(named), max_bars)
+    return {
+        'type': 'bar',
+        'title': title,
+        'x_label': '구분',
+        'y_label': y_label,
+        'x': [label for label, _ in bars],
+        'y': [count for _, count in bars],
+        'original_points': len(groups),
+    }
+
+
+def histogram_chart(bars: Sequence[Tuple[str, int]], title: str, y_label: str,
+                    x_label: str = '구간') -> Optional[Dict[str, Any]]:
+    """histogram()으로 구간화한 (구간, 개수) 목록을 히스토그램 차트 데이터로 변환
+
+    원본 값 대신 구간화 결과를 받으므로 지표 캐시에는 막대 수만큼만 보관하면 됩니다.
+    """
+    if not bars:
+        return None
+    return {
+        'type': 'bar',
+        'title': title,
+        'x_label': x_label,
+        'y_label': y_label,
+        'x': [label for label, _ in bars],
+        'y': [count for _, count in bars],
+        'original_points': sum(count for _, count in bars),
+    }
@@ -0,0 +1,187 @@
+"""
+대화 맥락(컨텍스트) 구성 모듈
+
+이전 질문/답변 기록을 토큰 예산 안에 맞춰 프롬프트용 컨텍스트 문자열로 만듭니다.
+"""
+from typing import Dict, List, Optional, Set
+from config.settings import Config
+from services.lru_cache import LRUCache
+
+
+def estimate_tokens(text: str) -> int:
+    """텍스트의 대략적인 토큰 수 추정
+
+    한글 음절은 대략 1토큰, 그 외 문자는 4글자당 1토큰으로 계산합니다.
+    """
+    if not text:
+        return 0
+
+    hangul = sum(1 for ch in text if '가' <= ch <= '힣')
+    others = len(text) - hangul
+    return hangul + (others + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """토큰 예산에 맞게 텍스트를 잘라내고 생략 표시를 붙임"""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # 이진 탐색으로 예산 안에 들어가는 가장 긴 접두사 찾기
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) + 1 <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+
+    return text[:low].rstrip() + "…"
+
+
+def _char_ngrams(text: str, n: int = 2) -> Set[str]:
+    """공백을 제거한 문자 n-gram 집합 (한국어 유사도 계산용)"""
+    compact = "".join(text.lower().split())
+    if len(compact) < n:
+        return {compact} if compact else set()
+    return {compact[i:i + n] for i in range(len(compact) - n + 1)}
+
+
+class ContextBuilder:
+    """토큰 예산 기반 대화 맥락 생성기
+
+    최근 window_size개 대화 중에서 최근성과 현재 질문과의 관련도로 순위를 매겨 예산 안에서 원문을 포함하고,
+    창 밖으로 밀려난 오래된 대화는 사용자별 누적 요약(새로 밀려난 대화만 앞에 추가)으로 대체합니다.
+    """
+
+    # 사용자별 누적 요약에 보관하는 최대 주제 수 (넘치는 주제는 생략 건수로만 기록)
+    _MAX_SUMMARY_TOPICS = 50
+
+    def __init__(self, token_budget: int = None, summary_ratio: float = 0.25,
+                 recency_decay: float = 0.7, window_size: int = 5, summary_cache_size: int = 1000):
+        self.token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+        self.summary_ratio = summary_ratio
+        self.recency_decay = recency_decay
+        self.window_size = window_size
+        # user_id -> {'seen': frozenset(요약에 반영된 대화 ID), 'topics': [주제, ...] (최신순), 'omitted': int}
+        self._summary_cache = LRUCache(maxsize=summary_cache_size)
+
+    def build(self, user_id: str, question: str, history: List[Dict]) -> Optional[str]:
+        """현재 질문에 맞는 컨텍스트 문자열 생성
+
+        Args:
+            user_id: 사용자 ID (요약 캐시 키)
+            question: 현재 사용자 질문
+            history: get_user_queries 결과 (최신순)
+
+        Returns:
+            토큰 예산 안에 들어가는 컨텍스트 문자열 (기록이 없으면 None)
+        """
+        turns = [turn for turn in history if turn.get('query')]
+        if not turns:
+            return None
+
+        summary_budget = int(self.token_budget * self.summary_ratio)
+        verbatim_budget = self.token_budget - summary_budget
+
+        window, dropped = turns[:self.window_size], turns[self.window_size:]
+        selected = self._select_turns(question, window, verbatim_budget)
+
+        sections = []
+        summary = self._get_summary(user_id, dropped, summary_budget)
+        if summary:
+            sections.append(f"[이전 대화 요약]\n{summary}")
+
+        if selected:
+            # 원래 순서(최신순)를 시간순으로 되돌려 출력
+            ordered = sorted(selected, key=lambda item: item[0], reverse=True)
+            lines = [text for _, text in ordered]
+            sections.append("[최근 관련 대화]\n" + "\n".join(lines))
+
+        return "\n\n".join(sections) if sections else None
+
+    def _select_turns(self, question: str, turns: List[Dict], budget: int) -> List:
+        """관련도/최근성 점수 순으로 예산 안에 들어가는 대화 선택"""
+        question_grams = _char_ngrams(question)
+        scored = []
+        for rank, turn in enumerate(turns):
+            recency = self.recency_decay ** rank
+            turn_grams = _char_ngrams(turn.get('query', ''))
+            union = question_grams | turn_grams
+            relevance = len(question_grams & turn_grams) / len(union) if union else 0.0
+            scored.append((recency + relevance, rank, turn))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        selected = []
+        used = 0
+        # 한 턴이 예산을 독점하지 않도록 답변 길이 상한 설정
+        per_answer_cap = max(budget // 3, 20)
+        for _, rank, turn in scored:
+            query_text = turn.get('query', '')
+            answer = truncate_to_tokens(turn.get('response', '') or '', per_answer_cap)
+            text = f"Q: {query_text} A: {answer}"
+            cost = estimate_tokens(text)
+
+            if used + cost > budget:
+                # 답변을 남은 예산에 맞춰 축약 시도
+                remaining_budget = budget - used - estimate_tokens(f"Q: {query_text} A: ")
+                if remaining_budget < 10:
+                    continue
+                text = f"Q: {query_text} A: {truncate_to_tokens(answer, remaining_budget)}"
+                cost = estimate_tokens(text)
+                if used + cost > budget:
+                    continue
+
+            selected.append((rank, text))
+            used += cost
+
+        return selected
+
+    def _get_summary(self, user_id: str, dropped: List[Dict], budget: int) -> str:
+        """사용자별 누적 요약 반환 (창 밖으로 새로 밀려난 대화만 요약에 추가, 현재 질문과 무관)"""
+        state = self._summary_cache.get(user_id) or {'seen': frozenset(), 'topics': [], 'omitted': 0}
+        turn_ids = [turn.get('id') or turn.get('query') for turn in dropped]
+        new_turns = [turn for turn, turn_id in zip(dropped, turn_ids) if turn_id not in state['seen']]
+
+        if new_turns:
+            topics = [truncate_to_tokens(turn.get('query', ''), 30) for turn in new_turns] + state['topics']
+            omitted = state['omitted'] + max(0, len(topics) - self._MAX_SUMMARY_TOPICS)
+            # 기록 조회 범위를 벗어난 대화는 다시 나타나지 않으므로 현재 밀려난 대화 ID만 기억
+            state = {'seen': frozenset(turn_ids), 'topics': topics[:self._MAX_SUMMARY_TOPICS], 'omitted': omitted}
+            self._summary_cache.set(user_id, state)
+
+        return self._render_summary(state['topics'], state['omitted'], budget)
+
+    @staticmethod
+    def _render_summary(topics: List[str], omitted: int, budget: int) -> str:
+        """주제 목록을 최신순으로 예산까지 나열 ("(외 N건 생략)" 표시도 예산에 포함)"""
+        total = len(topics) + omitted
+        suffix_cost = estimate_tokens(f" (외 {total}건 생략)")
+        included = []
+        used = 0
+        for index, topic in enumerate(topics):
+            cost = estimate_tokens(topic) + 1
+            # 마지막 주제가 아니거나 생략분이 있으면 생략 표시 자리를 남겨둠
+            reserve = suffix_cost if index < len(topics) - 1 or omitted else 0
+            if used + cost + reserve > budget:
+                break
+            included.append(topic)
+            used += cost
+
+        summary = "; ".join(included)
+        if total > len(included) and summary:
+            summary += f" (외 {total - len(included)}건 생략)"
+        return summary
+
+    def clear(self, user_id: str = None):
+        """요약 캐시 삭제"""
+        if user_id is None:
+            self._summary_cache.clear()
+        else:
+            self._summary_cache.pop(user_id, None)
+
+
+# 싱글톤 인스턴스 생성
+context_builder = ContextBuilder()
@@ -0,0 +1,133 @@
+"""
+요청 마감 시간(deadline) 모듈
+
+사용자 요청 하나에 전체 시간 예산을 정하고, contextvars로 하위 단계(LLM 호출, Firestore 조회)에 전달합니다.
+각 단계는 남은 시간을 네트워크 호출의 timeout으로 넘기고, 문서를 읽는 반복문에서는 check_deadline()으로 중간에 멈춥니다.
+timeout을 받지 않는 호출(대시보드 영역 조회 등)은 gather_with_deadline()로 별도 스레드에서 실행하여 마감 시간이 지나면 기다리지 않고 돌아옵니다.
+
+사용 예:
+    with deadline(20):
+        with stage('execute', 0.5):   # 남은 시간의 50%
+            ...
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class DeadlineExceeded(TimeoutError):
+    """마감 시간 초과"""
+
+
+class Deadline:
+    """마감 시각 (상위 마감 시각보다 늦어지지 않음)"""
+
+    __slots__ = ('name', 'expires_at')
+
+    def __init__(self, seconds: float, parent: Optional['Deadline'] = None, name: str = 'request'):
+        self.name = name
+        expires_at = time.monotonic() + max(0.0, seconds)
+        self.expires_at = min(expires_at, parent.expires_at) if parent else expires_at
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self):
+        if self.expired:
+            raise DeadlineExceeded(f"{self.name} 단계 시간 초과")
+
+
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar('current_deadline', default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def time_remaining(default: float = None) -> Optional[float]:
+    """현재 마감 시간까지 남은 초 (마감 시간이 없으면 default)"""
+    active = _current_deadline.get()
+    return active.remaining() if active else default
+
+
+def check_deadline():
+    """마감 시간이 지났으면 DeadlineExceeded (마감 시간이 없으면 아무것도 하지 않음)"""
+    active = _current_deadline.get()
+    if active is not None:
+        active.check()
+
+
+@contextmanager
+def deadline(seconds: Optional[float], name: str = 'request') -> Iterator[Optional[Deadline]]:
+    """전체 시간 예산 설정 (seconds가 없거나 0 이하면 마감 시간 없음, 이미 마감 시간이 있으면 더 이른 쪽 적용)"""
+    parent = _current_deadline.get()
+    if not seconds or seconds <= 0:
+        yield parent
+        return
+    token = _current_deadline.set(Deadline(seconds, parent, name))
+    try:
+        yield _current_deadline.get()
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def stage(name: str, share: float = 1.0) -> Iterator[Optional[Deadline]]:
+    """남은 시간의 share 비율만 쓰는 하위 단계 (마감 시간이 없으면 아무 제한 없음)"""
+    parent = _current_deadline.get()
+    if parent is None:
+        yield None
+        return
+    parent.check()
+    token = _current_deadline.set(Deadline(parent.remaining() * share, parent, name))
+    try:
+        yield _current_deadline.get()
+    finally:
+        _current_deadline.reset(token)
+
+
+def _start(func: Callable, args: Tuple, kwargs: Dict[str, Any], name: str) -> Tuple[threading.Thread, Dict[str, Any]]:
+    """현재 컨텍스트(마감 시간, 추적)를 복사한 daemon 스레드에서 실행 시작"""
+    outcome: Dict[str, Any] = {}
+    context = contextvars.copy_context()
+
+    def target():
+        try:
+            outcome['value'] = context.run(func, *args, **kwargs)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, name=f"deadline-{name}", daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def gather_with_deadline(tasks: Dict[str, Callable[[], Any]], timeout: float = None) -> Tuple[Dict[str, Any], List[str]]:
+    """여러 작업을 동시에 실행하고 마감 시간까지 끝난 결과만 반환
+
+    Returns:
+        (이름 → 결과, 시간 안에 끝나지 않았거나 실패한 이름 목록)
+    """
+    wait = time_remaining(timeout)
+    if wait is not None and timeout is not None:
+        wait = min(wait, timeout)
+    expires_at = None if wait is None else time.monotonic() + wait
+
+    with deadline(wait, name='gather'):
+        started = {name: _start(func, (), {}, name) for name, func in tasks.items()}
+
+    results: Dict[str, Any] = {}
+    missed: List[str] = []
+    for name, (thread, outcome) in started.items():
+        thread.join(None if expires_at is None else max(0.0, expires_at - time.monotonic()))
+        if thread.is_alive() or 'error' in outcome:
+            missed.append(name)
+        else:
+            results[name] = outcome['value']
+    return results, missed
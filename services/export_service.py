@@ -0,0 +1,254 @@
+"""
+데이터 내보내기 모듈
+
+쿼리 결과를 페이지 단위로 읽어 CSV / JSONL / Parquet 파일(EXPORT_DIR)에 바로 기록합니다.
+한 번에 한 페이지만 메모리에 두므로 내보내기 크기와 관계없이 메모리 사용량이 일정합니다.
+세션이 끝나도 남는 파일은 EXPORT_FILE_TTL_MINUTES가 지나면 다음 내보내기 때 정리됩니다.
+"""
+import csv
+import json
+import os
+import tempfile
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config.settings import Config
+
+EXPORT_FORMATS = {
+    'csv': {'label': 'CSV', 'suffix': '.csv', 'mime': 'text/csv'},
+    'jsonl': {'label': 'JSONL', 'suffix': '.jsonl', 'mime': 'application/x-ndjson'},
+    'parquet': {'label': 'Parquet', 'suffix': '.parquet', 'mime': 'application/octet-stream'},
+}
+
+# 용량이 큰 동선 배열 필드
+HEAVY_FIELDS = ['formations', 'distributedFormations']
+
+# 동선 배열 처리 방식
+# - keep: 그대로 포함 (CSV/Parquet에서는 JSON 문자열)
+# - summarize: 프레임 수/멤버 수 요약 컬럼으로 대체
+# - omit: 제외
+FORMATION_MODES = {
+    'summarize': '요약 (프레임 수/멤버 수)',
+    'omit': '제외',
+    'keep': '원본 포함',
+}
+
+
+def available_formats() -> List[str]:
+    """현재 환경에서 사용 가능한 내보내기 형식 (Parquet는 pyarrow 설치 시에만)"""
+    formats = ['csv', 'jsonl']
+    try:
+        import pyarrow  # noqa: F401
+        formats.append('parquet')
+    except ImportError:
+        pass
+    return formats
+
+
+def time_fields(collection_name: str) -> List[str]:
+    """스키마에서 기간 필터에 쓸 수 있는 timestamp 필드 목록 (createdAt이 있으면 맨 앞)"""
+    from services.firebase_service import firebase_service
+    schema = firebase_service.get_database_schema()
+    structure = schema.get('collections', {}).get(collection_name, {}).get('document_structure', {})
+    fields = [field for field, spec in structure.items()
+              if isinstance(spec, dict) and spec.get('type') == 'timestamp']
+    return sorted(fields, key=lambda field: field != 'createdAt')
+
+
+def cleanup_exports(max_age_seconds: float = None) -> int:
+    """EXPORT_DIR에서 보관 시간이 지난 내보내기 파일 삭제
+
+    Returns:
+        삭제한 파일 수
+    """
+    if max_age_seconds is None:
+        max_age_seconds = Config.EXPORT_FILE_TTL_MINUTES * 60
+    if not os.path.isdir(Config.EXPORT_DIR):
+        return 0
+
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(Config.EXPORT_DIR):
+        path = os.path.join(Config.EXPORT_DIR, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass  # 다른 프로세스가 먼저 지운 경우
+    return removed
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _scalar(value: Any) -> Any:
+    """CSV/Parquet 한 칸에 들어갈 값으로 변환 (중첩 값은 JSON 문자열)"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, ensure_ascii=False, default=_json_default)
+    return value
+
+
+def _prepare_row(row: Dict[str, Any], formation_mode: str) -> Dict[str, Any]:
+    """동선 배열 처리 방식에 맞게 행 변환"""
+    if formation_mode == 'keep':
+        return row
+
+    prepared = {key: value for key, value in row.items() if key not in HEAVY_FIELDS}
+    if formation_mode == 'summarize':
+        for field in HEAVY_FIELDS:
+            frames = row.get(field)
+            if not isinstance(frames, list):
+                continue
+            prepared[f'{field}_frames'] = len(frames)
+            prepared[f'{field}_max_members'] = max(
+                (len(frame.get('positions') or []) for frame in frames if isinstance(frame, dict)),
+                default=0)
+    return prepared
+
+
+def _columns(collection_name: str, select: Optional[List[str]], formation_mode: str) -> List[str]:
+    """CSV 컬럼 목록 (선택 필드 또는 스키마 필드 기준)"""
+    if select:
+        fields = list(select)
+    else:
+        from services.firebase_service import firebase_service
+        schema = firebase_service.get_database_schema()
+        structure = schema.get('collections', {}).get(collection_name, {}).get('document_structure', {})
+        fields = [field for field in structure if field != 'documentId']
+
+    columns = ['id']
+    for field in fields:
+        if field in HEAVY_FIELDS:
+            if formation_mode == 'keep':
+                columns.append(field)
+            elif formation_mode == 'summarize':
+                columns.extend([f'{field}_frames', f'{field}_max_members'])
+        elif field not in columns:
+            columns.append(field)
+    return columns
+
+
+class _CSVSink:
+    def __init__(self, path: str, columns: List[str]):
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._writer.writerows({key: _scalar(value) for key, value in row.items()} for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _JSONLSink:
+    def __init__(self, path: str, columns: List[str]):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            self._file.write(json.dumps(row, ensure_ascii=False, default=_json_default))
+            self._file.write('\n')
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetSink:
+    """페이지마다 row group 하나씩 기록하는 Parquet 출력 (모든 컬럼은 문자열로 정규화)"""
+
+    def __init__(self, path: str, columns: List[str]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._columns = columns
+        # 페이지마다 타입이 달라지지 않도록 문자열 스키마로 고정 (숫자/불리언도 문자열)
+        self._schema = pa.schema([(column, pa.string()) for column in columns])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        data = {}
+        for column in self._columns:
+            values = []
+            for row in rows:
+                value = _scalar(row.get(column))
+                values.append(None if value is None else str(value))
+            data[column] = values
+        self._writer.write_table(self._pa.Table.from_pydict(data, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+_SINKS = {'csv': _CSVSink, 'jsonl': _JSONLSink, 'parquet': _ParquetSink}
+
+
+def export_query(collection_name: str, export_format: str = 'csv', filters: List[Dict] = None,
+                 order_by: str = None, select: List[str] = None, formation_mode: str = 'summarize',
+                 page_size: int = None,
+                 progress_callback: Callable[[int, Optional[int]], None] = None) -> Tuple[str, int]:
+    """쿼리 결과를 임시 파일로 내보내기
+
+    Args:
+        collection_name: 컬렉션 이름
+        export_format: 'csv', 'jsonl', 'parquet'
+        filters: 필터 조건
+        order_by: 정렬 필드 (없으면 문서 ID 순)
+        select: 내보낼 필드 목록 (None이면 전체)
+        formation_mode: 동선 배열 처리 방식 ('summarize', 'omit', 'keep')
+        page_size: 한 번에 읽을 문서 수
+        progress_callback: (기록한 행 수, 전체 예상 행 수) 콜백
+
+    Returns:
+        (EXPORT_DIR 안의 파일 경로, 기록한 행 수)
+    """
+    from services.firebase_service import firebase_service
+
+    if export_format not in _SINKS:
+        raise ValueError(f"지원하지 않는 내보내기 형식입니다: {export_format}")
+    if export_format not in available_formats():
+        raise ImportError("Parquet 내보내기에는 pyarrow 패키지가 필요합니다")
+
+    page_size = page_size or Config.EXPORT_PAGE_SIZE
+    total = None
+    if progress_callback is not None:
+        try:
+            total = firebase_service.get_aggregated_data(collection_name, 'count', filters=filters)['result']
+        except Exception:
+            total = None
+
+    if formation_mode == 'omit':
+        if select:
+            select = [field for field in select if field not in HEAVY_FIELDS]
+        else:
+            # 동선 배열을 아예 내려받지 않도록 스키마 필드로 프로젝션
+            select = [column for column in _columns(collection_name, None, 'omit') if column != 'id']
+
+    cleanup_exports()
+    os.makedirs(Config.EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=f'{collection_name}_', suffix=EXPORT_FORMATS[export_format]['suffix'],
+                                dir=Config.EXPORT_DIR)
+    os.close(fd)
+
+    sink = _SINKS[export_format](path, _columns(collection_name, select, formation_mode))
+    written = 0
+    try:
+        for page in firebase_service.paginate_query(collection_name, filters, order_by, page_size, select):
+            sink.write([_prepare_row(row, formation_mode) for row in page])
+            written += len(page)
+            if progress_callback is not None:
+                progress_callback(written, total)
+    except Exception:
+        sink.close()
+        os.remove(path)
+        raise
+    sink.close()
+
+    return path, written
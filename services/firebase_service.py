@@ -2,17 +2,34 @@
 Firebase Firestore 연동 서비스 모듈
 """
 import firebase_admin
+from collections import Counter
 from firebase_admin import credentials, firestore
-from typing import Dict, List, Optional, Any
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Any
 import streamlit as st
 from config.settings import Config
+from services.approximate import approximate_aggregator, is_approximate
+from services.deadline import DeadlineExceeded, gather_with_deadline, time_remaining
+from services.formation_analytics import formation_analytics, parse_derived_field
+from services.history_index import history_index
+from services.live_counters import live_counter_service
+from services.query_cache import query_cache
+from services.shared_cache import shared_cache
+from services.sharded_counter import day_counter_id, query_counter, user_counter_id
+from services.storage_backend import FirestoreBackend, SQLiteBackend, StorageBackend
+from services.tracing import tracer
+from services.user_history import user_history_store
 
 class FirebaseService:
     """Firebase Firestore 연동을 위한 서비스 클래스"""
     
     def __init__(self):
         self.db = None
+        self.backend: Optional[StorageBackend] = None
+        # 대시보드 영역별 마지막 완전한 결과 (마감 시간을 넘긴 영역의 부분 결과로 사용)
+        self._dashboard_snapshots: Dict[str, Dict[str, Any]] = {}
         self._initialize_firebase()
+        self._initialize_backend()
     
     def _initialize_firebase(self):
         """Firebase 초기화"""
@@ -57,6 +74,20 @@ class FirebaseService:
             print("Firebase 기능은 비활성화됩니다.")
             self.db = None
     
+    def _initialize_backend(self):
+        """조회용 저장소 백엔드 초기화 (STORAGE_BACKEND 설정에 따라 Firestore 또는 로컬 SQLite)"""
+        try:
+            if Config.STORAGE_BACKEND == 'sqlite':
+                self.backend = SQLiteBackend(Config.SQLITE_DB_PATH, self.get_database_schema())
+                print(f"로컬 SQLite 백엔드 사용: {Config.SQLITE_DB_PATH}")
+            elif self.db is not None:
+                self.backend = FirestoreBackend(self.db)
+            else:
+                self.backend = None
+        except Exception as e:
+            print(f"저장소 백엔드 초기화 중 오류: {str(e)}")
+            self.backend = FirestoreBackend(self.db) if self.db is not None else None
+    
     def _is_streamlit_cloud(self) -> bool:
         """스트림릿 클라우드에서 실행 중인지 확인"""
         try:
@@ -80,53 +111,168 @@ class FirebaseService:
         """Firebase 연결 상태 확인"""
         return self.db is not None
     
+    def has_backend(self) -> bool:
+        """조회용 저장소 백엔드(Firestore 또는 로컬 SQLite) 사용 가능 여부"""
+        return self.backend is not None
+    
     # === 사용자 데이터 관련 함수 ===
     
+    @tracer.traced('firebase.save_user_query', arguments=['user_id'])
     def save_user_query(self, user_id: str, query: str, response: str) -> bool:
-        """사용자 질문과 응답을 저장"""
+        """사용자 질문과 응답을 저장 (질문 수 카운터와 최근 대화 링 버퍼도 같은 트랜잭션에서 갱신)"""
         if not self.is_connected():
             return False
         
         try:
             doc_ref = self.db.collection('user_queries').document()
-            doc_ref.set({
-                'user_id': user_id,
-                'query': query,
-                'response': response,
-                'timestamp': firestore.SERVER_TIMESTAMP,
-                'created_at': firestore.SERVER_TIMESTAMP
-            })
+            turn = user_history_store.make_turn(doc_ref.id, user_id, query, response)
+            
+            @firestore.transactional
+            def save(transaction):
+                # 트랜잭션은 읽기가 쓰기보다 먼저 와야 하므로 링 버퍼부터 갱신
+                user_history_store.append_in_transaction(transaction, user_id, [turn])
+                transaction.set(doc_ref, {
+                    'user_id': user_id,
+                    'query': query,
+                    'response': response,
+                    'timestamp': firestore.SERVER_TIMESTAMP,
+                    'created_at': firestore.SERVER_TIMESTAMP
+                })
+                query_counter.add_to_batch(transaction, query_counter.query_increments([user_id]))
+            
+            save(self.db.transaction())
+            query_cache.invalidate('user_queries')
+            history_index.add(doc_ref.id, user_id, query, response, turn['timestamp'])
             return True
         except Exception as e:
             st.error(f"❌ 질문 저장 중 오류: {str(e)}")
             return False
     
+    @tracer.traced('firebase.save_user_queries_batch')
+    def save_user_queries_batch(self, records: List[Dict[str, str]], batch_size: int = 500) -> int:
+        """여러 질문/응답을 batch 쓰기로 한꺼번에 저장 (배치 실행용)
+
+        Args:
+            records: [{'user_id', 'query', 'response'}] 목록
+            batch_size: 한 번에 커밋할 문서 수 (Firestore batch 최대 500)
+
+        Returns:
+            저장한 문서 수
+        """
+        if not self.is_connected() or not records:
+            return 0
+
+        def commit(chunk):
+            doc_refs = [self.db.collection('user_queries').document() for _ in chunk]
+            turns_by_user: Dict[str, List[Dict[str, Any]]] = {}
+            for doc_ref, record in zip(doc_refs, chunk):
+                turns_by_user.setdefault(record['user_id'], []).append(user_history_store.make_turn(
+                    doc_ref.id, record['user_id'], record['query'], record['response']))
+            
+            @firestore.transactional
+            def save(transaction):
+                # 단일 저장과 같이 문서/카운터/링 버퍼를 한 트랜잭션으로 저장 (읽기인 링 버퍼부터)
+                user_history_store.append_many_in_transaction(transaction, turns_by_user)
+                for doc_ref, record in zip(doc_refs, chunk):
+                    transaction.set(doc_ref, {
+                        'user_id': record['user_id'],
+                        'query': record['query'],
+                        'response': record['response'],
+                        'timestamp': firestore.SERVER_TIMESTAMP,
+                        'created_at': firestore.SERVER_TIMESTAMP
+                    })
+                # 카운터 증가는 카운터별로 합쳐서 같은 트랜잭션에 포함
+                query_counter.add_to_batch(transaction, query_counter.query_increments(
+                    record['user_id'] for record in chunk))
+            
+            save(self.db.transaction())
+            for turns in turns_by_user.values():
+                history_index.add_many(turns)
+            return len(chunk)
+        
+        saved = 0
+        try:
+            # 문서 쓰기 + 카운터 쓰기(전체/일별/사용자별) + 링 버퍼 쓰기(사용자별)가
+            # 트랜잭션 한도(500)를 넘지 않도록 나눔
+            chunk, counter_ids, user_ids = [], set(), set()
+            for record in records:
+                new_ids = {'total', day_counter_id(), user_counter_id(record['user_id'])} - counter_ids
+                new_users = {record['user_id']} - user_ids
+                writes = len(chunk) + 1 + len(counter_ids) + len(new_ids) + len(user_ids) + len(new_users)
+                if chunk and (len(chunk) >= batch_size or writes > 500):
+                    saved += commit(chunk)
+                    chunk, counter_ids, user_ids = [], set(), set()
+                    new_ids = {'total', day_counter_id(), user_counter_id(record['user_id'])}
+                    new_users = {record['user_id']}
+                chunk.append(record)
+                counter_ids |= new_ids
+                user_ids |= new_users
+            if chunk:
+                saved += commit(chunk)
+            return saved
+        except Exception as e:
+            print(f"질문 일괄 저장 중 오류: {str(e)}")
+            return saved
+        finally:
+            if saved:
+                query_cache.invalidate('user_queries')
+
+    @tracer.traced('firebase.get_user_query_count', arguments=['user_id'])
+    def get_user_query_count(self, user_id: str) -> int:
+        """사용자별 누적 질문 수 (분산 카운터 합산)"""
+        if not self.is_connected():
+            return 0
+        
+        try:
+            return query_counter.read(user_counter_id(user_id)) or 0
+        except Exception as e:
+            print(f"사용자 질문 수 조회 중 오류: {str(e)}")
+            return 0
+    
+    @tracer.traced('firebase.get_user_queries', arguments=['user_id', 'limit'])
     def get_user_queries(self, user_id: str, limit: int = 10) -> List[Dict]:
-        """사용자의 최근 질문들을 가져오기"""
+        """사용자의 최근 질문들을 가져오기 (링 버퍼 문서 1회 읽기, 없으면 인덱스 쿼리 후 링 버퍼 채움)
+        
+        어느 경로든 {'id', 'user_id', 'query', 'response', 'timestamp'} 모양이며,
+        답변은 USER_HISTORY_RESPONSE_CHARS까지 잘린 값입니다 (전체 답변은 user_queries 문서에 있음).
+        """
         if not self.is_connected():
             return []
         
         try:
+            recent = user_history_store.read(user_id, limit)
+            if recent is not None:
+                tracer.current_span().set(doc_count=len(recent), ring_buffer=True)
+                return recent
+            
             query_ref = (self.db.collection('user_queries')
                         .where('user_id', '==', user_id)
                         .order_by('timestamp', direction=firestore.Query.DESCENDING)
-                        .limit(limit))
+                        .limit(max(limit, user_history_store.size)))
             
-            docs = query_ref.stream()
+            docs = query_ref.stream(timeout=time_remaining())
             queries = []
             
             for doc in docs:
                 data = doc.to_dict()
                 data['id'] = doc.id
-                queries.append(data)
+                # 링 버퍼에서 읽은 결과와 같은 모양으로 맞춤
+                queries.append(user_history_store.turn_from_document(user_id, data))
+            
+            try:
+                user_history_store.backfill(user_id, queries[:user_history_store.size])
+            except Exception as e:
+                print(f"최근 대화 기록 채우기 중 오류: {str(e)}")
             
-            return queries
+            tracer.current_span().set(doc_count=len(queries), ring_buffer=False)
+            return queries[:limit]
         except Exception as e:
             st.error(f"❌ 질문 조회 중 오류: {str(e)}")
             return []
     
     # === 비즈니스 데이터 관련 함수 ===
     
+    @tracer.traced('firebase.save_business_data', arguments=['data_type'])
     def save_business_data(self, data_type: str, data: Dict[str, Any]) -> bool:
         """비즈니스 데이터 저장 (가입자 수, 매출 등)"""
         if not self.is_connected():
@@ -140,11 +286,13 @@ class FirebaseService:
                 'timestamp': firestore.SERVER_TIMESTAMP,
                 'created_at': firestore.SERVER_TIMESTAMP
             })
+            query_cache.invalidate('business_data')
             return True
         except Exception as e:
             st.error(f"❌ 비즈니스 데이터 저장 중 오류: {str(e)}")
             return False
     
+    @tracer.traced('firebase.get_business_data', arguments=['data_type', 'limit'])
     def get_business_data(self, data_type: str, limit: int = 10) -> List[Dict]:
         """특정 타입의 비즈니스 데이터 조회"""
         if not self.is_connected():
@@ -156,7 +304,7 @@ class FirebaseService:
                         .order_by('timestamp', direction=firestore.Query.DESCENDING)
                         .limit(limit))
             
-            docs = query_ref.stream()
+            docs = query_ref.stream(timeout=time_remaining())
             business_data = []
             
             for doc in docs:
@@ -171,6 +319,7 @@ class FirebaseService:
     
     # === 비즈니스 데이터 스키마 및 조회 함수 ===
     
+    @tracer.traced('firebase.get_user_count_data')
     def get_user_count_data(self) -> Dict[str, Any]:
         """사용자 수 관련 데이터 조회
         
@@ -183,31 +332,28 @@ class FirebaseService:
                 'last_updated': str      # 마지막 업데이트 시간
             }
         """
-        if not self.is_connected():
+        if not self.has_backend():
             return self._get_mock_user_data()
         
         try:
-            # users 컬렉션에서 데이터 조회
-            users_ref = self.db.collection('users')
-            
+            # users 컬렉션에서 데이터 조회 (문서를 내려받지 않고 개수만 집계)
             # 전체 사용자 수
-            total_users = len(list(users_ref.stream()))
+            total_users = self.backend.count('users')
             
             # 오늘 신규 가입자 (예시)
-            from datetime import datetime, timedelta
             today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            
-            new_today_query = users_ref.where('created_at', '>=', today)
-            new_users_today = len(list(new_today_query.stream()))
+            today_filters = [{'field': 'created_at', 'operator': '>=', 'value': today}]
+            live = live_counter_service.lookup('users', 'count', filters=today_filters)
+            new_users_today = live['result'] if live else self.backend.count('users', today_filters)
             
             # 이번 주 신규 가입자
             week_ago = today - timedelta(days=7)
-            new_week_query = users_ref.where('created_at', '>=', week_ago)
-            new_users_week = len(list(new_week_query.stream()))
+            new_users_week = self.backend.count('users', [
+                {'field': 'created_at', 'operator': '>=', 'value': week_ago}])
             
             # 활성 사용자 (최근 7일 내 활동)
-            active_query = users_ref.where('last_active', '>=', week_ago)
-            active_users = len(list(active_query.stream()))
+            active_users = self.backend.count('users', [
+                {'field': 'last_active', 'operator': '>=', 'value': week_ago}])
             
             return {
                 'total_users': total_users,
@@ -216,10 +362,13 @@ class FirebaseService:
                 'active_users': active_users,
                 'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"사용자 데이터 조회 중 오류: {str(e)}")
             return self._get_mock_user_data()
     
+    @tracer.traced('firebase.get_sales_data')
     def get_sales_data(self) -> Dict[str, Any]:
         """매출 관련 데이터 조회
         
@@ -235,36 +384,36 @@ class FirebaseService:
                 'last_updated': str          # 마지막 업데이트 시간
             }
         """
-        if not self.is_connected():
+        if not self.has_backend():
             return self._get_mock_sales_data()
         
         try:
             # orders 컬렉션에서 데이터 조회
-            orders_ref = self.db.collection('orders')
-            
-            # 전체 주문 조회
-            orders = list(orders_ref.stream())
-            total_sales = sum(order.to_dict().get('amount', 0) for order in orders)
-            order_count = len(orders)
+            # 전체 주문 (금액 필드만 집계)
+            total = self.backend.aggregate('orders', 'sum', 'amount')
+            total_sales = total['result']
+            order_count = self.backend.count('orders')
             
             # 시간별 필터링
-            from datetime import datetime, timedelta
             now = datetime.now()
             today = now.replace(hour=0, minute=0, second=0, microsecond=0)
             week_ago = today - timedelta(days=7)
             month_ago = today - timedelta(days=30)
             
-            # 오늘 매출
-            today_orders = orders_ref.where('created_at', '>=', today)
-            sales_today = sum(order.to_dict().get('amount', 0) for order in today_orders.stream())
+            def sales_since(start):
+                return self.backend.aggregate('orders', 'sum', 'amount', [
+                    {'field': 'created_at', 'operator': '>=', 'value': start}])['result']
+            
+            # 오늘 매출 (실시간 모드면 리스너 카운터 사용)
+            live = live_counter_service.lookup('orders', 'sum', 'amount', [
+                {'field': 'created_at', 'operator': '>=', 'value': today}])
+            sales_today = live['result'] if live else sales_since(today)
             
             # 이번 주 매출
-            week_orders = orders_ref.where('created_at', '>=', week_ago)
-            sales_this_week = sum(order.to_dict().get('amount', 0) for order in week_orders.stream())
+            sales_this_week = sales_since(week_ago)
             
             # 이번 달 매출
-            month_orders = orders_ref.where('created_at', '>=', month_ago)
-            sales_this_month = sum(order.to_dict().get('amount', 0) for order in month_orders.stream())
+            sales_this_month = sales_since(month_ago)
             
             # 평균 주문 금액
             avg_order_value = total_sales / order_count if order_count > 0 else 0
@@ -279,10 +428,13 @@ class FirebaseService:
                 'currency': 'KRW',
                 'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"매출 데이터 조회 중 오류: {str(e)}")
             return self._get_mock_sales_data()
     
+    @tracer.traced('firebase.get_product_analytics')
     def get_product_analytics(self) -> Dict[str, Any]:
         """상품 분석 데이터 조회
         
@@ -295,20 +447,19 @@ class FirebaseService:
                 'last_updated': str              # 마지막 업데이트 시간
             }
         """
-        if not self.is_connected():
+        if not self.has_backend():
             return self._get_mock_product_data()
         
         try:
-            # products 컬렉션에서 데이터 조회
-            products_ref = self.db.collection('products')
-            products = list(products_ref.stream())
+            # products 컬렉션에서 데이터 조회 (필요한 필드만)
+            products = list(self.backend.stream(
+                'products', select=['name', 'sales_count', 'price', 'stock', 'category']))
             
             total_products = len(products)
             
             # 인기 상품 (판매량 기준 상위 5개)
             popular_products = []
-            for product in products:
-                data = product.to_dict()
+            for data in products:
                 popular_products.append({
                     'name': data.get('name', ''),
                     'sales_count': data.get('sales_count', 0),
@@ -319,8 +470,7 @@ class FirebaseService:
             
             # 재고 부족 상품 (재고 10개 미만)
             low_stock_products = []
-            for product in products:
-                data = product.to_dict()
+            for data in products:
                 if data.get('stock', 0) < 10:
                     low_stock_products.append({
                         'name': data.get('name', ''),
@@ -329,7 +479,7 @@ class FirebaseService:
                     })
             
             # 카테고리 목록
-            categories = list(set(product.to_dict().get('category', '') for product in products))
+            categories = list(set(data.get('category', '') for data in products))
             categories = [cat for cat in categories if cat]  # 빈 문자열 제거
             
             return {
@@ -339,26 +489,58 @@ class FirebaseService:
                 'categories': categories,
                 'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"상품 분석 데이터 조회 중 오류: {str(e)}")
             return self._get_mock_product_data()
     
+    @tracer.traced('firebase.get_comprehensive_dashboard_data')
     def get_comprehensive_dashboard_data(self) -> Dict[str, Any]:
         """대시보드용 종합 데이터 조회 (Gemini AI가 분석하기 좋은 형태)
         
         Returns:
-            모든 비즈니스 데이터를 포함한 종합 딕셔너리
+            모든 비즈니스 데이터를 포함한 종합 딕셔너리.
+            마감 시간(DASHBOARD_DEADLINE_SECONDS)을 넘긴 영역은 마지막 결과에 'partial': True를 붙여 반환하며,
+            해당 영역 이름은 summary['partial_sections']에 기록됩니다.
         """
-        return {
-            'users': self.get_user_count_data(),
-            'sales': self.get_sales_data(),
-            'products': self.get_product_analytics(),
+        # 실시간 모드에서는 '오늘' 지표가 리스너로 갱신되므로 공유 스냅샷을 쓰지 않음
+        use_shared = self.has_backend() and not live_counter_service.enabled
+        if use_shared:
+            hit, cached, version = shared_cache.get('dashboard', 'comprehensive')
+            tracer.current_span().set(cache_hit=hit)
+            if hit:
+                return cached
+        
+        # 영역별로 동시에 조회하고, 마감 시간 안에 끝나지 않은 영역은 마지막 결과를 부분 결과로 표시
+        sections, missed = gather_with_deadline({
+            'users': self.get_user_count_data,
+            'sales': self.get_sales_data,
+            'products': self.get_product_analytics
+        }, timeout=Config.DASHBOARD_DEADLINE_SECONDS)
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for name, section in sections.items():
+            self._dashboard_snapshots[name] = section
+        for name in missed:
+            snapshot = self._dashboard_snapshots.get(name)
+            sections[name] = dict(snapshot or {}, partial=True,
+                                  snapshot_at=snapshot.get('last_updated') if snapshot else None)
+        tracer.current_span().set(partial_sections=','.join(missed) or None)
+        
+        data = {
+            'users': sections['users'],
+            'sales': sections['sales'],
+            'products': sections['products'],
             'summary': {
-                'data_source': 'Firebase Firestore',
-                'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'status': 'connected' if self.is_connected() else 'mock_data'
+                'data_source': self.backend.name if self.has_backend() else 'Firebase Firestore',
+                'generated_at': now,
+                'status': 'connected' if self.has_backend() else 'mock_data',
+                'partial_sections': missed
             }
         }
+        if use_shared and not missed:
+            shared_cache.set('dashboard', 'comprehensive', data, Config.SHARED_CACHE_DASHBOARD_TTL, version=version)
+        return data
     
     # === Mock 데이터 함수들 (Firebase 연결이 없을 때 사용) ===
     
@@ -410,8 +592,10 @@ class FirebaseService:
     
     # === 동적 쿼리 생성 및 실행 함수 (Gemini AI용) ===
     
+    @tracer.traced('firebase.execute_dynamic_query', arguments=['collection_name', 'order_by', 'limit'])
     def execute_dynamic_query(self, collection_name: str, filters: List[Dict] = None, 
-                            order_by: str = None, limit: int = None) -> List[Dict]:
+                            order_by: str = None, limit: int = None,
+                            select: List[str] = None) -> List[Dict]:
         """동적으로 Firestore 쿼리를 생성하고 실행
         
         Args:
@@ -419,115 +603,180 @@ class FirebaseService:
             filters: 필터 조건 리스트 [{'field': 'status', 'operator': '==', 'value': 'active'}]
             order_by: 정렬 필드 (예: 'created_at')
             limit: 결과 제한 수
+            select: 가져올 필드 목록 (None이면 전체 필드)
             
         Returns:
             쿼리 결과 리스트
+            
+        참고: 결과는 쿼리 캐시에 저장되며, datetime 필터 값은 캐시 구간 경계로 내림하여 실행됩니다.
         """
-        if not self.is_connected():
+        if not self.has_backend():
             return self._get_mock_query_result(collection_name)
         
         try:
-            # 기본 쿼리 시작
-            query_ref = self.db.collection(collection_name)
-            
-            # 필터 조건 적용
-            if filters:
-                for filter_condition in filters:
-                    field = filter_condition.get('field')
-                    operator = filter_condition.get('operator', '==')
-                    value = filter_condition.get('value')
-                    
-                    if field and value is not None:
-                        query_ref = query_ref.where(field, operator, value)
-            
-            # 정렬 조건 적용
-            if order_by:
-                direction = firestore.Query.DESCENDING  # 기본값
-                if order_by.startswith('-'):
-                    order_by = order_by[1:]  # '-' 제거
-                    direction = firestore.Query.DESCENDING
-                elif order_by.startswith('+'):
-                    order_by = order_by[1:]  # '+' 제거
-                    direction = firestore.Query.ASCENDING
-                
-                query_ref = query_ref.order_by(order_by, direction=direction)
-            
-            # 결과 제한
-            if limit:
-                query_ref = query_ref.limit(limit)
-            
-            # 쿼리 실행
-            docs = query_ref.stream()
-            results = []
-            
-            for doc in docs:
-                data = doc.to_dict()
-                data['id'] = doc.id  # 문서 ID 추가
-                results.append(data)
-            
-            return results
-            
+            filters = query_cache.snap_filters(filters)
+            cache_key = query_cache.make_key('query', collection_name, filters, order_by, limit, select)
+            hit, cached, token = query_cache.get(cache_key)
+            if hit:
+                tracer.current_span().set(cache_hit=True, doc_count=len(cached))
+                # 호출자가 결과를 수정해도 캐시가 오염되지 않도록 복사본 반환
+                return [dict(row) for row in cached]
+            
+            results = list(self.backend.stream(collection_name, filters, order_by, limit, select))
+            tracer.current_span().set(cache_hit=False, doc_count=len(results))
+            query_cache.set(cache_key, results, token)
+            return [dict(row) for row in results]
+            
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"동적 쿼리 실행 중 오류: {str(e)}")
             return self._get_mock_query_result(collection_name)
     
+    @tracer.traced('firebase.stream_query', arguments=['collection_name', 'select'])
+    def stream_query(self, collection_name: str, filters: List[Dict] = None,
+                     order_by: str = None, limit: int = None,
+                     select: List[str] = None) -> Iterator[Dict]:
+        """쿼리 결과를 리스트로 모으지 않고 한 건씩 반환 (대용량 스캔용)
+        
+        저장소 백엔드가 없으면 Mock 결과를 반환하며, 오류는 호출자에게 전달됩니다.
+        """
+        if not self.has_backend():
+            yield from self._get_mock_query_result(collection_name)
+            return
+        
+        yield from self.backend.stream(collection_name, filters, order_by, limit, select)
+    
+    @tracer.traced('firebase.paginate_query', arguments=['collection_name', 'page_size'])
+    def paginate_query(self, collection_name: str, filters: List[Dict] = None,
+                       order_by: str = None, page_size: int = 500,
+                       select: List[str] = None) -> Iterator[List[Dict]]:
+        """쿼리 결과를 page_size 단위 목록으로 반환 (내보내기 등 대용량 처리용)"""
+        if not self.has_backend():
+            yield self._get_mock_query_result(collection_name)
+            return
+        
+        yield from self.backend.paginate(collection_name, filters, order_by, page_size, select)
+    
+    @tracer.traced('firebase.get_documents', arguments=['collection_name'])
+    def get_documents(self, collection_name: str, doc_ids: List[str],
+                      select: List[str] = None) -> Dict[str, Optional[Dict]]:
+        """문서 ID 목록을 한 번의 일괄 조회(get_all)로 가져오기
+        
+        Returns:
+            {문서 ID: 문서 데이터 (없으면 None)}
+        """
+        if not doc_ids:
+            return {}
+        
+        if not self.has_backend():
+            mock_docs = {doc['id']: doc for doc in self._get_mock_query_result(collection_name)}
+            return {doc_id: mock_docs.get(doc_id) for doc_id in doc_ids}
+        
+        tracer.current_span().set(doc_count=len(doc_ids))
+        return self.backend.get_documents(collection_name, doc_ids, select)
+    
+    @tracer.traced('firebase.get_aggregated_data', arguments=['collection_name', 'aggregation_type', 'field'])
     def get_aggregated_data(self, collection_name: str, aggregation_type: str, 
-                          field: str = None, filters: List[Dict] = None) -> Dict[str, Any]:
+                          field: str = None, filters: List[Dict] = None,
+                          approximate: bool = None) -> Dict[str, Any]:
         """집계 데이터 조회 (COUNT, SUM, AVG 등)
         
         Args:
             collection_name: 컬렉션 이름
             aggregation_type: 'count', 'sum', 'avg', 'max', 'min'
             field: 집계할 필드 (count가 아닌 경우 필수)
+                   'formations.movement_distance'처럼 동선 파생 필드도 사용 가능
             filters: 필터 조건
+            approximate: True면 sum/avg를 무작위 표본으로 추정 (None이면 요청의 근사 모드 설정을 따름, count는 항상 정확)
             
         Returns:
-            집계 결과
+            집계 결과 (근사 결과는 'approximate', 'margin', 'ci_low', 'ci_high', 'sample_size' 포함)
         """
-        if not self.is_connected():
+        if not self.has_backend():
             return {'result': 100, 'type': aggregation_type}
         
         try:
-            # 데이터 조회
-            data = self.execute_dynamic_query(collection_name, filters)
+            # '오늘' 구간 집계는 실시간 모드 카운터로 바로 응답 (읽기 없음)
+            live = live_counter_service.lookup(collection_name, aggregation_type, field, filters)
+            if live is not None:
+                tracer.current_span().set(live=True)
+                return live
+            
+            if approximate is None:
+                approximate = is_approximate()
+            approximate = approximate and not (field and parse_derived_field(field))
+            
+            filters = query_cache.snap_filters(filters)
+            cache_key = query_cache.make_key('aggregate', collection_name, filters,
+                                             extra=(aggregation_type.lower(), field, approximate))
+            hit, cached, token = query_cache.get(cache_key)
+            tracer.current_span().set(cache_hit=hit, approximate=approximate)
+            if hit:
+                return dict(cached)
+            
+            # 근사 모드: 표본으로 추정 (컬렉션이 작거나 max/min처럼 추정할 수 없으면 아래에서 정확히 계산)
+            estimate = approximate_aggregator.aggregate(collection_name, aggregation_type, field, filters) \
+                if approximate else None
+            if estimate is not None:
+                tracer.current_span().set(sample_size=estimate['sample_size'])
+                query_cache.set(cache_key, estimate, token)
+                return dict(estimate)
             
             if aggregation_type.lower() == 'count':
-                return {'result': len(data), 'type': 'count'}
-            
-            if not field:
-                raise ValueError(f"{aggregation_type}에는 field 파라미터가 필요합니다")
-            
-            # 숫자 값만 추출
-            values = []
-            for item in data:
-                if field in item and isinstance(item[field], (int, float)):
-                    values.append(item[field])
-            
-            if not values:
-                return {'result': 0, 'type': aggregation_type}
-            
-            # 집계 계산
-            if aggregation_type.lower() == 'sum':
-                result = sum(values)
-            elif aggregation_type.lower() == 'avg':
-                result = sum(values) / len(values)
-            elif aggregation_type.lower() == 'max':
-                result = max(values)
-            elif aggregation_type.lower() == 'min':
-                result = min(values)
+                result = {'result': self.backend.count(collection_name, filters), 'type': 'count'}
             else:
-                result = 0
+                if not field:
+                    raise ValueError(f"{aggregation_type}에는 field 파라미터가 필요합니다")
+                
+                if parse_derived_field(field):
+                    # 동선 파생 지표 (동선 배열만 읽어 벡터 연산으로 계산)
+                    aggregated = formation_analytics.aggregate(collection_name, aggregation_type, field, filters)
+                else:
+                    # 집계 계산 (숫자 값만 대상, 가능한 경우 백엔드에서 처리)
+                    aggregated = self.backend.aggregate(collection_name, aggregation_type, field, filters)
+                if not aggregated['count']:
+                    result = {'result': 0, 'type': aggregation_type}
+                else:
+                    result = {
+                        'result': aggregated['result'],
+                        'type': aggregation_type,
+                        'count': aggregated['count']
+                    }
             
-            return {
-                'result': result,
-                'type': aggregation_type,
-                'count': len(values)
-            }
+            query_cache.set(cache_key, result, token)
+            return dict(result)
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"집계 데이터 조회 중 오류: {str(e)}")
             return {'result': 0, 'type': aggregation_type, 'error': str(e)}
     
+    @tracer.traced('firebase.get_group_counts', arguments=['collection_name', 'field'])
+    def get_group_counts(self, collection_name: str, field: str, filters: List[Dict] = None,
+                         approximate: bool = None) -> Dict[str, Any]:
+        """필드 값별 문서 수 (GROUP BY field COUNT)
+        
+        Args:
+            approximate: True면 무작위 표본으로 추정 (None이면 요청의 근사 모드 설정을 따름)
+            
+        Returns:
+            {'groups': {값: 개수}, 'total': int}, 근사 결과는 'intervals'(값별 신뢰구간), 'unseen_max', 'approximate', 'sample_size' 포함
+        """
+        if approximate is None:
+            approximate = is_approximate()
+        if approximate:
+            estimate = approximate_aggregator.group_counts(collection_name, field, filters)
+            if estimate is not None:
+                tracer.current_span().set(approximate=True, sample_size=estimate['sample_size'])
+                return estimate
+        
+        # 그룹 필드만 스트리밍하여 집계
+        counts = Counter(row[field] for row in self.stream_query(collection_name, filters, select=[field])
+                         if field in row)
+        return {'groups': dict(counts), 'total': sum(counts.values())}
+    
     def get_database_schema(self) -> Dict[str, Any]:
         """데이터베이스 스키마 정보 반환 (Gemini AI가 쿼리 생성 시 참고용)
         
@@ -621,6 +870,7 @@ class FirebaseService:
     
     # === 통계 및 분석 함수 ===
     
+    @tracer.traced('firebase.get_query_statistics')
     def get_query_statistics(self) -> Dict[str, int]:
         """전체 질문 통계 조회"""
         if not self.is_connected():
@@ -630,14 +880,24 @@ class FirebaseService:
             }
         
         try:
-            # 전체 질문 수
-            total_queries = len(list(self.db.collection('user_queries').stream()))
-            
-            # 오늘 질문 수
-            from datetime import datetime
+            # 전체/오늘 질문 수 (분산 카운터 shard 합산, 읽기 수는 컬렉션 크기와 무관)
             today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            today_query_ref = self.db.collection('user_queries').where('timestamp', '>=', today)
-            today_queries = len(list(today_query_ref.stream()))
+            today_filters = [{'field': 'timestamp', 'operator': '>=', 'value': today}]
+            counters = query_counter.read_many(['total', day_counter_id()])
+            total_queries = counters['total']
+            today_queries = counters[day_counter_id()] or 0
+            
+            if total_queries is None or not query_counter.is_seeded():
+                # rebuild 전에는 카운터가 배포 이후 질문만 세므로 서버 측 count 집계로 대체
+                # (maintenance.py --rebuild-counters)
+                backend = FirestoreBackend(self.db)
+                total_queries = backend.count('user_queries')
+                today_queries = backend.count('user_queries', today_filters)
+            
+            # 실시간 모드면 오늘 질문 수는 리스너 카운터 사용
+            live = live_counter_service.lookup('user_queries', 'count', filters=today_filters)
+            if live is not None:
+                today_queries = live['result']
             
             return {
                 'total_queries': total_queries,
@@ -0,0 +1,270 @@
+"""
+동선(formation) 분석 모듈
+
+formations / distributedFormations 배열을 (프레임 × 멤버 × 2) NumPy 배열로 변환하고,
+여러 작품을 한 번에 묶어 이동 거리, 대형 변화 횟수, 퍼짐 정도, 좌우 대칭도를 벡터 연산으로 계산합니다.
+계산된 지표는 '동선 필드.지표' 형식의 파생 필드(예: 'formations.movement_distance')로
+get_aggregated_data에서 집계할 수 있습니다.
+"""
+import warnings
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from config.settings import Config
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 분석 대상 동선 필드
+FORMATION_FIELDS = ['formations', 'distributedFormations']
+
+# 작품별 동선 지표
+FORMATION_METRICS = {
+    'movement_distance': '총 이동 거리',
+    'formation_changes': '대형 변화 횟수',
+    'spread': '평균 퍼짐 정도',
+    'symmetry': '좌우 대칭도',
+    'frame_count': '프레임 수',
+    'member_count': '멤버 수',
+}
+
+
+def parse_derived_field(field: Optional[str]) -> Optional[Tuple[str, str]]:
+    """'formations.movement_distance' 같은 파생 필드를 (동선 필드, 지표)로 분리 (아니면 None)"""
+    if not field or '.' not in field:
+        return None
+    source, metric = field.split('.', 1)
+    if source in FORMATION_FIELDS and metric in FORMATION_METRICS:
+        return source, metric
+    return None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("동선 분석에는 numpy 패키지가 필요합니다")
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def decode_formations(frames: Any) -> "np.ndarray":
+    """동선 배열을 (프레임 F × 멤버 M × 2) float32 배열로 변환
+
+    프레임은 time 순으로 정렬하며, 좌표가 없는 멤버 칸은 NaN으로 채웁니다.
+    """
+    _require_numpy()
+    frames = [frame for frame in (frames or []) if isinstance(frame, dict)]
+    frames.sort(key=lambda frame: _number(frame.get('time')) or 0.0)
+    member_count = max((len(frame.get('positions') or []) for frame in frames), default=0)
+
+    positions = np.full((len(frames), member_count, 2), np.nan, dtype=np.float32)
+    for frame_index, frame in enumerate(frames):
+        for member_index, position in enumerate(frame.get('positions') or []):
+            if not isinstance(position, dict):
+                continue
+            x, y = _number(position.get('x')), _number(position.get('y'))
+            if x is not None and y is not None:
+                positions[frame_index, member_index] = (x, y)
+    return positions
+
+
+def stack_formations(decoded: List["np.ndarray"]) -> "np.ndarray":
+    """작품별 배열을 (작품 N × F × M × 2) 배열로 합침 (짧은 쪽은 NaN으로 채움)"""
+    _require_numpy()
+    frames = max((array.shape[0] for array in decoded), default=0)
+    members = max((array.shape[1] for array in decoded), default=0)
+    batch = np.full((len(decoded), max(frames, 1), max(members, 1), 2), np.nan, dtype=np.float32)
+    for index, array in enumerate(decoded):
+        batch[index, :array.shape[0], :array.shape[1]] = array
+    return batch
+
+
+def compute_metrics(batch: "np.ndarray", move_epsilon: float = None) -> Dict[str, "np.ndarray"]:
+    """(N × F × M × 2) 배열에서 작품별 지표 계산 (각 지표는 길이 N 배열, 데이터 없으면 NaN)
+
+    - movement_distance: 연속 프레임 사이 멤버 이동 거리의 합
+    - formation_changes: 한 명이라도 move_epsilon 넘게 움직인 프레임 전환 수
+    - spread: 프레임별 중심점에서 멤버까지 평균 거리의 평균
+    - symmetry: 중심 세로축 기준 좌우 반전 대형과 원래 대형이 겹치는 정도 (0~1, 1이 완전 대칭)
+    """
+    _require_numpy()
+    move_epsilon = Config.FORMATION_MOVE_EPSILON if move_epsilon is None else move_epsilon
+
+    with warnings.catch_warnings():
+        # 빈 프레임/멤버 칸의 NaN 평균 경고 무시 (결과는 NaN)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+        present = ~np.isnan(batch[..., 0])                      # N, F, M
+        frame_count = present.any(axis=2).sum(axis=1)
+        member_count = present.any(axis=1).sum(axis=1)
+        has_data = frame_count > 0
+
+        step = np.linalg.norm(np.diff(batch, axis=1), axis=-1)  # N, F-1, M
+        movement = np.nansum(step, axis=(1, 2))
+        changes = (np.nan_to_num(step, nan=0.0) > move_epsilon).any(axis=2).sum(axis=1)
+
+        centroid = np.nanmean(batch, axis=2, keepdims=True)     # N, F, 1, 2
+        radius = np.linalg.norm(batch - centroid, axis=-1)      # N, F, M
+        frame_spread = np.nanmean(radius, axis=2)               # N, F
+        spread = np.nanmean(frame_spread, axis=1)
+
+        # 좌우 반전한 각 멤버에서 가장 가까운 원래 멤버까지의 거리
+        mirrored = batch.copy()
+        mirrored[..., 0] = 2 * centroid[..., 0] - batch[..., 0]
+        pair = np.linalg.norm(mirrored[:, :, :, None, :] - batch[:, :, None, :, :], axis=-1)  # N, F, M, M
+        pair = np.where(np.isnan(pair), np.inf, pair)
+        nearest = pair.min(axis=3)
+        nearest[np.isinf(nearest)] = np.nan
+        mismatch = np.nanmean(nearest, axis=2)                  # N, F
+        frame_symmetry = np.where(frame_spread > 0,
+                                  1 - mismatch / np.where(frame_spread > 0, frame_spread, 1), 1.0)
+        frame_symmetry = np.where(np.isnan(frame_spread), np.nan, np.clip(frame_symmetry, 0, 1))
+        symmetry = np.nanmean(frame_symmetry, axis=1)
+
+    def masked(values):
+        return np.where(has_data, values.astype(np.float64), np.nan)
+
+    return {
+        'movement_distance': masked(movement),
+        'formation_changes': masked(changes),
+        'spread': masked(spread),
+        'symmetry': masked(symmetry),
+        'frame_count': masked(frame_count),
+        'member_count': masked(member_count),
+    }
+
+
+def _batches(decoded: List["np.ndarray"], element_budget: int) -> Iterator[List["np.ndarray"]]:
+    """대칭도 계산의 N×F×M×M 중간 배열이 element_budget을 넘지 않도록 작품을 묶음"""
+    batch, frames, members = [], 1, 1
+    for array in decoded:
+        next_frames = max(frames, array.shape[0])
+        next_members = max(members, array.shape[1])
+        if batch and (len(batch) + 1) * next_frames * next_members * next_members > element_budget:
+            yield batch
+            batch, next_frames, next_members = [], max(array.shape[0], 1), max(array.shape[1], 1)
+        batch.append(array)
+        frames, members = next_frames, next_members
+    if batch:
+        yield batch
+
+
+def analyze_formations(frames_list: List[Any], move_epsilon: float = None,
+                       element_budget: int = None) -> Dict[str, "np.ndarray"]:
+    """여러 작품의 동선 배열을 묶음 단위로 분석하여 지표별 길이 N 배열 반환"""
+    _require_numpy()
+    element_budget = element_budget or Config.FORMATION_BATCH_ELEMENTS
+    decoded = [decode_formations(frames) for frames in frames_list]
+
+    parts: Dict[str, List["np.ndarray"]] = {metric: [] for metric in FORMATION_METRICS}
+    for batch in _batches(decoded, element_budget):
+        metrics = compute_metrics(stack_formations(batch), move_epsilon)
+        for metric, values in metrics.items():
+            parts[metric].append(values)
+
+    return {metric: np.concatenate(values) if values else np.empty(0)
+            for metric, values in parts.items()}
+
+
+class FormationAnalyticsService:
+    """컬렉션 단위 동선 지표 계산 서비스"""
+
+    def _firebase(self):
+        from services.firebase_service import firebase_service
+        return firebase_service
+
+    def iter_metrics(self, collection_name: str, field: str = 'formations',
+                     filters: List[Dict] = None, extra_fields: List[str] = None,
+                     chunk_size: int = None) -> Iterator[Dict[str, Any]]:
+        """동선 필드(와 extra_fields)만 스트리밍하여 작품별 지표를 한 건씩 반환 (데이터 없는 작품 제외)"""
+        _require_numpy()
+        chunk_size = chunk_size or Config.FORMATION_CHUNK_SIZE
+        extra_fields = extra_fields or []
+        rows = self._firebase().stream_query(collection_name, filters, select=[field] + extra_fields)
+        for chunk in self._chunks(rows, chunk_size):
+            metrics = analyze_formations([row.get(field) for row in chunk])
+            for index, row in enumerate(chunk):
+                if np.isnan(metrics['frame_count'][index]):
+                    continue
+                item = {'id': row.get('id')}
+                item.update({extra: row.get(extra) for extra in extra_fields})
+                item.update({metric: float(values[index]) for metric, values in metrics.items()})
+                yield item
+
+    @staticmethod
+    def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def aggregate(self, collection_name: str, aggregation_type: str, derived_field: str,
+                  filters: List[Dict] = None) -> Dict[str, Any]:
+        """파생 필드 집계 (StorageBackend.aggregate와 같은 {'result', 'count'} 형식)"""
+        parsed = parse_derived_field(derived_field)
+        if parsed is None:
+            raise ValueError(f"지원하지 않는 동선 지표입니다: {derived_field}")
+        field, metric = parsed
+
+        aggregation_type = aggregation_type.lower()
+        total, count, maximum, minimum = 0.0, 0, None, None
+        for item in self.iter_metrics(collection_name, field, filters):
+            value = item[metric]
+            if np.isnan(value):
+                continue
+            total += value
+            count += 1
+            maximum = value if maximum is None else max(maximum, value)
+            minimum = value if minimum is None else min(minimum, value)
+
+        if not count:
+            return {'result': 0, 'count': 0}
+        if aggregation_type == 'sum':
+            result = total
+        elif aggregation_type in ('avg', 'average'):
+            result = total / count
+        elif aggregation_type == 'max':
+            result = maximum
+        elif aggregation_type == 'min':
+            result = minimum
+        else:
+            raise ValueError(f"지원하지 않는 집계 타입입니다: {aggregation_type}")
+        return {'result': result, 'count': count}
+
+    def summarize(self, collection_name: str, field: str = 'formations',
+                  filters: List[Dict] = None, top_n: int = 5) -> Dict[str, Any]:
+        """지표별 평균과 이동 거리 상위 작품 (한 번의 스캔으로 계산)"""
+        totals = {metric: 0.0 for metric in FORMATION_METRICS}
+        counts = {metric: 0 for metric in FORMATION_METRICS}
+        movements = []
+        top: List[Tuple[float, str, str]] = []
+
+        for item in self.iter_metrics(collection_name, field, filters, extra_fields=['title']):
+            for metric in FORMATION_METRICS:
+                if not np.isnan(item[metric]):
+                    totals[metric] += item[metric]
+                    counts[metric] += 1
+            movements.append(item['movement_distance'])
+            top.append((item['movement_distance'], item['id'], item.get('title') or ''))
+            if len(top) > top_n * 4:
+                top = sorted(top, reverse=True)[:top_n]
+
+        return {
+            'averages': {metric: totals[metric] / counts[metric] if counts[metric] else None
+                         for metric in FORMATION_METRICS},
+            'top': [{'id': doc_id, 'title': title, 'movement_distance': value}
+                    for value, doc_id, title in sorted(top, reverse=True)[:top_n]],
+            'movements': movements,
+            'total': counts['frame_count']
+        }
+
+
+# 싱글톤 인스턴스 생성
+formation_analytics = FormationAnalyticsService()
@@ -1,15 +1,26 @@
 """
 Gemini AI 연동 서비스 모듈
 """
+import threading
 import google.generativeai as genai
 import streamlit as st
+from typing import Any, Dict
 from config.settings import Config
+from services.approximate import approximate_mode, describe_estimate, is_approximate
+from services.deadline import DeadlineExceeded, check_deadline, stage, time_remaining
+from services.rate_limiter import RateLimiter
+from services.shared_cache import shared_cache
+from services.tracing import tracer
 
 class GeminiService:
     """Gemini AI 연동을 위한 서비스 클래스"""
     
     def __init__(self):
         self.model = None
+        # 모든 스레드가 공유하는 분당 요청 수 제한
+        self.rate_limiter = RateLimiter(Config.GEMINI_RPM, Config.GEMINI_BURST)
+        # 스레드별 토큰 사용량 누적 (배치 실행 시 질문별 사용량 기록용)
+        self._usage = threading.local()
         self._initialize_gemini()
     
     def _initialize_gemini(self):
@@ -29,8 +40,55 @@ class GeminiService:
         """Gemini API 연결 상태 확인"""
         return self.model is not None
     
+    def _generate_content(self, prompt: str):
+        """속도 제한을 지켜 generate_content 호출 후 토큰 사용량 누적
+
+        요청 마감 시간이 있으면 속도 제한 대기와 API 호출 모두 남은 시간 안에서만 기다립니다.
+        """
+        with tracer.span('gemini.generate_content', prompt_chars=len(prompt)) as span:
+            with tracer.span('gemini.rate_limit_wait'):
+                if not self.rate_limiter.acquire(timeout=time_remaining()):
+                    raise DeadlineExceeded("Gemini 호출 대기 시간 초과")
+            check_deadline()
+            timeout = time_remaining()
+            try:
+                if timeout is not None:
+                    response = self.model.generate_content(prompt, request_options={'timeout': timeout})
+                else:
+                    response = self.model.generate_content(prompt)
+            except Exception:
+                # API의 timeout 오류는 마감 시간 초과로 바꿔서 전달
+                check_deadline()
+                raise
+            
+            usage = self.get_usage()
+            usage['calls'] += 1
+            metadata = getattr(response, 'usage_metadata', None)
+            if metadata is not None:
+                prompt_tokens = getattr(metadata, 'prompt_token_count', 0) or 0
+                output_tokens = getattr(metadata, 'candidates_token_count', 0) or 0
+                usage['prompt_tokens'] += prompt_tokens
+                usage['output_tokens'] += output_tokens
+                usage['total_tokens'] += getattr(metadata, 'total_token_count', 0) or 0
+                span.set(prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+            return response
+    
+    def reset_usage(self):
+        """현재 스레드의 토큰 사용량 초기화"""
+        self._usage.value = {'calls': 0, 'prompt_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
+    
+    def get_usage(self) -> Dict[str, int]:
+        """현재 스레드에서 reset_usage 이후 누적된 호출 수/토큰 사용량"""
+        if not hasattr(self._usage, 'value'):
+            self.reset_usage()
+        return self._usage.value
+    
     def generate_response(self, prompt: str, context: str = None) -> str:
         """사용자 프롬프트에 대한 AI 응답 생성"""
+        with tracer.trace('gemini.generate_response', has_context=bool(context)):
+            return self._generate_response(prompt, context)
+    
+    def _generate_response(self, prompt: str, context: str = None) -> str:
         if not self.is_connected():
             return "❌ Gemini API가 설정되지 않았습니다. API 키를 확인해주세요."
         
@@ -49,7 +107,7 @@ class GeminiService:
             full_prompt = f"{system_prompt}\n\n사용자 질문: {prompt}"
             
             # Gemini API 호출
-            response = self.model.generate_content(full_prompt)
+            response = self._generate_content(full_prompt)
             return response.text
             
         except Exception as e:
@@ -82,56 +140,81 @@ class GeminiService:
 4. 숫자는 한국어 단위(만원, 명 등)로 표시
 """
             
-            response = self.model.generate_content(analysis_prompt)
+            response = self._generate_content(analysis_prompt)
             return response.text
             
         except Exception as e:
             return f"데이터 분석 중 오류가 발생했습니다: {str(e)}"
     
-    def get_smart_query_response(self, user_question: str) -> str:
+    def get_smart_query_response(self, user_question: str, context: str = None) -> str:
         """사용자 질문을 분석하여 자동으로 데이터를 조회하고 답변 생성
         
         Args:
             user_question: 사용자의 질문
+            context: 이전 대화 맥락 (선택)
             
         Returns:
             데이터 기반 답변
         """
-        try:
-            # Firebase 서비스 import
-            from services.firebase_service import firebase_service
+        return self.get_smart_query_result(user_question, context)['answer']
+    
+    def get_smart_query_result(self, user_question: str, context: str = None,
+                               approximate: bool = False) -> Dict[str, Any]:
+        """get_smart_query_response와 같지만 차트 데이터까지 함께 반환
+        
+        approximate=True면 집계/그룹별 지표를 표본 기반 추정치(신뢰구간 포함)로 빠르게 계산합니다.
+        
+        Returns:
+            {
+                'answer': str,            # 답변
+                'chart': Optional[Dict],  # 차트 데이터 (chart_service 형식)
+                'source': str             # 'fast_path', 'llm', 'error',
+                                          # 마감 시간 초과 시 'partial'(조회 결과만) 또는 'timeout'
+            }
+        """
+        with tracer.trace('gemini.smart_query', question=user_question[:50]):
+            # 이전 대화 맥락이 없는 LLM 답변은 다른 프로세스와 공유
+            answer_key = (' '.join(user_question.split()).lower(), bool(approximate)) if not context else None
+            if answer_key:
+                hit, cached, version = shared_cache.get('llm_answer', answer_key)
+                if hit:
+                    tracer.current_span().set(source=cached['source'], cache_hit=True)
+                    return cached
             
-            # 데이터베이스 스키마 정보 가져오기
-            schema_info = firebase_service.get_database_schema()
+            with approximate_mode(approximate):
+                result = self._smart_query_result(user_question, context)
+            tracer.current_span().set(source=result['source'], approximate=bool(approximate))
+            if answer_key and result['source'] == 'llm':
+                shared_cache.set('llm_answer', answer_key, result, Config.SHARED_CACHE_ANSWER_TTL, version=version)
+            return result
+    
+    def _smart_query_result(self, user_question: str, context: str = None) -> Dict[str, Any]:
+        query_result = None
+        try:
+            from services.intent_router import intent_router
             
-            # Gemini에게 쿼리 생성 요청
-            query_generation_prompt = f"""
-당신은 데이터베이스 전문가입니다. 사용자의 질문을 분석하여 적절한 Firestore 쿼리를 생성하고 실행해주세요.
-
-사용자 질문: "{user_question}"
-
-데이터베이스 스키마:
-{schema_info}
-
-다음 단계로 진행해주세요:
-1. 사용자 질문을 분석하여 필요한 데이터 파악
-2. 적절한 쿼리 전략 결정 (조회, 집계, 정렬 등)
-3. 쿼리 실행 및 결과 분석
-4. 한국어로 자연스럽고 유용한 답변 생성
-
-예시 쿼리 형식:
-- 단순 조회: execute_dynamic_query('collection_name', filters, order_by, limit)
-- 집계 연산: get_aggregated_data('collection_name', 'sum/count/avg', 'field_name', filters)
-
-지금 실제 쿼리를 실행하고 결과를 분석해주세요.
-"""
+            # 알려진 지표 질문은 LLM 호출 없이 바로 답변
+            if Config.INTENT_ROUTER_ENABLED:
+                with tracer.span('smart_query.fast_path') as span:
+                    resolved = intent_router.resolve(user_question)
+                    span.set(matched=bool(resolved))
+                if resolved:
+                    return {'answer': resolved['answer'], 'chart': resolved['chart'], 'source': 'fast_path'}
             
-            # 첫 번째 단계: 쿼리 전략 결정
-            strategy_response = self.model.generate_content(query_generation_prompt)
-            strategy_text = strategy_response.text
+            if not self.is_connected():
+                return {'answer': "❌ Gemini API가 설정되지 않았습니다. API 키를 확인해주세요.",
+                        'chart': None, 'source': 'error'}
             
             # 질문 유형에 따른 데이터 조회 로직
-            query_result = self._execute_smart_query(user_question)
+            with tracer.span('smart_query.execute') as span, stage('execute', Config.DEADLINE_SHARE_EXECUTE):
+                query_result = self._execute_smart_query(user_question)
+                span.set(result_chars=len(query_result or ''))
+            
+            # 이전 대화 맥락 (옵션)
+            context_section = f"\n이전 대화 맥락:\n{context}\n" if context else ""
+            # 근사 모드면 추정치임을 답변에 밝히도록 안내
+            approximate_section = ("\n주의: 위 수치 중 '추정치'로 표시된 값은 전체가 아닌 무작위 표본으로 계산한 근사값입니다. "
+                                   "답변에서 '약'을 붙이고 신뢰구간(±)을 함께 언급해주세요.\n") if is_approximate() else ""
             
             # 결과를 바탕으로 최종 답변 생성
             final_prompt = f"""
@@ -141,7 +224,7 @@ class GeminiService:
 
 데이터 조회 결과:
 {query_result}
-
+{approximate_section}{context_section}
 답변 가이드라인:
 1. 숫자는 한국어 단위로 표시 (예: 1,250명, 125만원)
 2. 구체적이고 유용한 정보 제공
@@ -149,11 +232,25 @@ class GeminiService:
 4. 자연스럽고 친근한 어조
 """
             
-            final_response = self.model.generate_content(final_prompt)
-            return final_response.text
+            with tracer.span('smart_query.final_llm'), stage('final_llm'):
+                final_response = self._generate_content(final_prompt)
+            
+            # 관련 지표가 있으면 차트도 함께 제공
+            with tracer.span('smart_query.chart'):
+                chart = intent_router.candidate_chart(user_question)
+            return {'answer': final_response.text, 'chart': chart, 'source': 'llm'}
             
+        except DeadlineExceeded as e:
+            # 데이터 조회까지 끝났으면 조회 결과만이라도 부분 답변으로 반환
+            tracer.current_span().set(deadline_exceeded=str(e))
+            if query_result:
+                return {'answer': f"⏱️ 답변 생성 시간이 초과되어 데이터 조회 결과만 표시합니다.\n\n{query_result}",
+                        'chart': None, 'source': 'partial'}
+            return {'answer': f"⏱️ 처리 시간이 초과되었습니다. 잠시 후 다시 시도해주세요. ({str(e)})",
+                    'chart': None, 'source': 'timeout'}
         except Exception as e:
-            return f"스마트 쿼리 처리 중 오류가 발생했습니다: {str(e)}"
+            return {'answer': f"스마트 쿼리 처리 중 오류가 발생했습니다: {str(e)}",
+                    'chart': None, 'source': 'error'}
     
     def _execute_smart_query(self, question: str) -> str:
         """질문 유형에 따른 실제 데이터 조회 실행"""
@@ -168,37 +265,43 @@ class GeminiService:
             
             question_lower = question.lower()
             
+            # 스키마 기반 지표 후보가 있으면 해당 데이터를 우선 사용
+            from services.intent_router import intent_router
+            candidate_data = intent_router.describe_candidates(question)
+            if candidate_data:
+                return candidate_data
+            
             # 사용자 수 관련 질문
             if any(word in question for word in ['가입자', '사용자', '회원']):
                 if '오늘' in question:
                     result = firebase_service.get_aggregated_data('users', 'count', 
                         filters=[{'field': 'created_at', 'operator': '>=', 'value': today}])
-                    return f"오늘 신규 가입자: {result['result']}명"
+                    return f"오늘 신규 가입자: {result['result']}명{describe_estimate(result, '명')}"
                 elif '이번 주' in question or '주간' in question:
                     result = firebase_service.get_aggregated_data('users', 'count',
                         filters=[{'field': 'created_at', 'operator': '>=', 'value': week_ago}])
-                    return f"이번 주 신규 가입자: {result['result']}명"
+                    return f"이번 주 신규 가입자: {result['result']}명{describe_estimate(result, '명')}"
                 else:
                     result = firebase_service.get_aggregated_data('users', 'count')
-                    return f"전체 사용자 수: {result['result']}명"
+                    return f"전체 사용자 수: {result['result']}명{describe_estimate(result, '명')}"
             
             # 매출 관련 질문
             elif any(word in question for word in ['매출', '매상', '수익', '금액']):
                 if '오늘' in question:
                     result = firebase_service.get_aggregated_data('orders', 'sum', 'amount',
                         filters=[{'field': 'created_at', 'operator': '>=', 'value': today}])
-                    return f"오늘 매출: {result['result']:,.0f}원"
+                    return f"오늘 매출: {result['result']:,.0f}원{describe_estimate(result, '원')}"
                 elif '이번 주' in question or '주간' in question:
                     result = firebase_service.get_aggregated_data('orders', 'sum', 'amount',
                         filters=[{'field': 'created_at', 'operator': '>=', 'value': week_ago}])
-                    return f"이번 주 매출: {result['result']:,.0f}원"
+                    return f"이번 주 매출: {result['result']:,.0f}원{describe_estimate(result, '원')}"
                 elif '이번 달' in question or '월간' in question:
                     result = firebase_service.get_aggregated_data('orders', 'sum', 'amount',
                         filters=[{'field': 'created_at', 'operator': '>=', 'value': month_ago}])
-                    return f"이번 달 매출: {result['result']:,.0f}원"
+                    return f"이번 달 매출: {result['result']:,.0f}원{describe_estimate(result, '원')}"
                 else:
                     result = firebase_service.get_aggregated_data('orders', 'sum', 'amount')
-                    return f"전체 매출: {result['result']:,.0f}원"
+                    return f"전체 매출: {result['result']:,.0f}원{describe_estimate(result, '원')}"
             
             # 상품 관련 질문
             elif any(word in question for word in ['상품', '제품', '인기', '재고']):
@@ -214,13 +317,15 @@ class GeminiService:
                     return f"재고 부족 상품: {', '.join(products) if products else '없음'}"
                 else:
                     result = firebase_service.get_aggregated_data('products', 'count')
-                    return f"전체 상품 수: {result['result']}개"
+                    return f"전체 상품 수: {result['result']}개{describe_estimate(result, '개')}"
             
             # 기본 대시보드 데이터
             else:
                 dashboard_data = firebase_service.get_comprehensive_dashboard_data()
                 return str(dashboard_data)
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             return f"데이터 조회 중 오류: {str(e)}"
 
@@ -0,0 +1,461 @@
+"""
+과거 질문/답변 검색 색인 모듈
+
+user_queries의 질문과 답변을 로컬 역색인(inverted index)으로 만들어, Firestore나 Gemini를 거치지 않고
+이전 질문을 찾아 답변을 다시 쓸 수 있게 합니다.
+
+- 색인 단위: 한국어는 띄어쓰기 단위 어절에 조사가 붙으므로('가입자는', '가입자를') 어절을 글자 2-gram으로 나눠 색인하여
+  어절 안의 부분 문자열로도 찾을 수 있게 합니다. 한 글자 검색어는 정렬된 어절 목록에서 bisect로 접두어 검색합니다.
+- 갱신: save_user_query가 저장할 때마다 add()로 추가하고, 일정 건수마다 디스크에 저장합니다.
+- 저장 형식: 문서 목록과 2-gram별 문서 번호(차이값 인코딩) 목록을 gzip JSON 파일 하나로 원자적 저장
+- 여러 프로세스: 저장할 때 파일 잠금을 잡고 다른 프로세스가 저장한 파일과 합친 뒤 씁니다
+  (문서 ID 기준으로 상대가 추가한 문서는 가져오고, 디스크에서 사라진 문서는 삭제된 것으로 처리).
+  검색할 때도 파일이 바뀌었으면 일정 간격으로 다시 합칩니다.
+- 보존 기간: maintenance.py 정리 시 remove_older_than()으로 삭제된 질문을 색인에서도 제거합니다.
+"""
+import atexit
+import bisect
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from config.settings import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: 파일 잠금 없이 저장 (프로세스 하나로 실행한다고 가정)
+    fcntl = None
+
+FORMAT_VERSION = 1
+# 검색 시 다른 프로세스가 저장한 파일을 확인하는 최소 간격(초)
+_REFRESH_INTERVAL = 5
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def normalize(text: str) -> str:
+    """검색용 정규화 (전각/반각 통일, 소문자)"""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def words(text: str) -> List[str]:
+    return _WORD_PATTERN.findall(normalize(text))
+
+
+def bigrams(word: str) -> Set[str]:
+    """어절의 글자 2-gram (한 글자 어절은 그대로)"""
+    if len(word) < 2:
+        return {word} if word else set()
+    return {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+def _delta_encode(numbers: List[int]) -> List[int]:
+    previous = 0
+    encoded = []
+    for number in numbers:
+        encoded.append(number - previous)
+        previous = number
+    return encoded
+
+
+def _delta_decode(deltas: List[int]) -> List[int]:
+    total = 0
+    decoded = []
+    for delta in deltas:
+        total += delta
+        decoded.append(total)
+    return decoded
+
+
+class HistoryIndex:
+    """질문/답변 역색인 (문서 번호는 추가된 순서이므로 클수록 최신)"""
+
+    def __init__(self, path: str = None, response_chars: int = None, flush_every: int = None):
+        self.path = Config.HISTORY_INDEX_PATH if path is None else path
+        self.response_chars = response_chars or Config.HISTORY_INDEX_RESPONSE_CHARS
+        self.flush_every = flush_every or Config.HISTORY_INDEX_FLUSH_EVERY
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._dirty = 0
+        # 마지막으로 읽거나 쓴 파일의 (수정 시각, 크기), 마지막 확인 시각
+        self._disk_stamp: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self.docs: List[Dict[str, Any]] = []
+        self._doc_numbers: Dict[str, int] = {}
+        # 검색 결과 확인용 정규화 텍스트 (파일에는 저장하지 않음)
+        self._texts: List[str] = []
+        # 2-gram → 문서 번호 목록 (오름차순)
+        self._postings: Dict[str, List[int]] = {}
+        # 어절 → 문서 번호 목록, 어절 정렬 목록 (접두어 검색용)
+        self._word_postings: Dict[str, List[int]] = {}
+        self._vocabulary: List[str] = []
+        # 삭제된 문서 번호 (검색에서는 건너뛰고, _compact()에서 번호를 다시 매겨 제외)
+        self._deleted: Set[int] = set()
+        # 마지막 저장 이후 이 프로세스에서 추가한 / 삭제한 문서 ID (다른 프로세스 파일과 합칠 때 유지)
+        self._pending: Set[str] = set()
+        self._removed: Set[str] = set()
+
+    @staticmethod
+    def _text(doc: Dict[str, Any]) -> str:
+        return normalize(doc['query']) + '\n' + normalize(doc['response'])
+
+    def __len__(self) -> int:
+        return len(self.docs) - len(self._deleted)
+
+    # === 색인 추가 ===
+
+    def _add(self, doc_id: str, user_id: str, query: str, response: str, timestamp: Any) -> bool:
+        if not doc_id or doc_id in self._doc_numbers:
+            return False
+        number = len(self.docs)
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.isoformat()
+        doc = {
+            'id': doc_id,
+            'user_id': user_id,
+            'query': query or '',
+            'response': (response or '')[:self.response_chars],
+            'timestamp': timestamp
+        }
+        self.docs.append(doc)
+        self._doc_numbers[doc_id] = number
+        self._texts.append(self._text(doc))
+
+        # 검색 결과 확인은 저장된(잘린) 답변으로 하므로 색인도 같은 텍스트로 만듦
+        tokens = set(_WORD_PATTERN.findall(self._texts[number]))
+        grams: Set[str] = set()
+        for token in tokens:
+            postings = self._word_postings.get(token)
+            if postings is None:
+                self._word_postings[token] = [number]
+                bisect.insort(self._vocabulary, token)
+            else:
+                postings.append(number)
+            if len(token) >= 2:
+                grams |= bigrams(token)
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(number)
+        return True
+
+    def add(self, doc_id: str, user_id: str, query: str, response: str, timestamp: Any = None):
+        """질문 하나를 색인에 추가 (flush_every건마다 디스크에 저장)"""
+        with self._lock:
+            self._ensure_loaded()
+            if self._add(doc_id, user_id, query, response, timestamp or datetime.now()):
+                self._pending.add(doc_id)
+                self._dirty += 1
+            if self._dirty >= self.flush_every:
+                self.flush()
+
+    def add_many(self, items: Iterable[Dict[str, Any]]) -> int:
+        """여러 질문을 색인에 추가 (user_queries 문서 dict 목록, 'id' 필요)"""
+        added = 0
+        with self._lock:
+            self._ensure_loaded()
+            for item in items:
+                if self._add(item.get('id'), item.get('user_id'), item.get('query'),
+                             item.get('response'), item.get('timestamp')):
+                    self._pending.add(item['id'])
+                    added += 1
+            self._dirty += added
+            if self._dirty >= self.flush_every:
+                self.flush()
+        return added
+
+    def _delete(self, number: int):
+        self._deleted.add(number)
+        self._doc_numbers.pop(self.docs[number]['id'], None)
+
+    def remove_older_than(self, cutoff: datetime) -> int:
+        """cutoff보다 오래된 질문을 색인에서 제거하고 저장 (보존 기간 정리 후 호출)
+
+        Returns:
+            제거한 문서 수
+        """
+        if cutoff.tzinfo is None:
+            cutoff = cutoff.astimezone()
+        removed = 0
+        with self._lock:
+            self._ensure_loaded()
+            for number, doc in enumerate(self.docs):
+                if number in self._deleted or not doc.get('timestamp'):
+                    continue
+                try:
+                    timestamp = datetime.fromisoformat(str(doc['timestamp']))
+                except ValueError:
+                    continue
+                if timestamp.tzinfo is None:
+                    timestamp = timestamp.astimezone()  # 시간대 없는 값은 서버 로컬 시각
+                if timestamp < cutoff:
+                    self._delete(number)
+                    self._removed.add(doc['id'])
+                    removed += 1
+            if removed:
+                self._dirty += removed
+                self.flush()
+        return removed
+
+    # === 검색 ===
+
+    def _prefix_numbers(self, prefix: str) -> Set[int]:
+        """접두어로 시작하는 어절들의 문서 번호 합집합 (정렬된 어절 목록에서 bisect)"""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + '\U0010ffff')
+        numbers: Set[int] = set()
+        for token in self._vocabulary[start:end]:
+            numbers.update(self._word_postings[token])
+        return numbers
+
+    @staticmethod
+    def _contains(postings: List[int], number: int) -> bool:
+        position = bisect.bisect_left(postings, number)
+        return position < len(postings) and postings[position] == number
+
+    def search(self, text: str, user_id: str = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """검색어를 모두 포함하는 과거 질문 (최신순)
+
+        두 글자 이상 검색어는 어절 안의 부분 문자열(접두어 포함)로, 한 글자 검색어는 어절 접두어로 찾습니다.
+        가장 짧은 문서 번호 목록을 최신 문서부터 훑으며 나머지 목록은 bisect로 확인하므로,
+        결과 limit개를 채우면 전체 후보를 만들지 않고 멈춥니다.
+        """
+        terms = words(text)
+        if not terms:
+            return []
+
+        with self._lock:
+            self._ensure_loaded()
+            self._refresh()
+            lists: List[List[int]] = []
+            sets: List[Set[int]] = []
+            for term in set(terms):
+                if len(term) < 2:
+                    numbers = self._prefix_numbers(term)
+                    if not numbers:
+                        return []
+                    sets.append(numbers)
+                    continue
+                for gram in bigrams(term):
+                    postings = self._postings.get(gram)
+                    if not postings:
+                        return []
+                    lists.append(postings)
+
+            lists.sort(key=len)
+            sets.sort(key=len)
+            if lists and (not sets or len(lists[0]) <= len(sets[0])):
+                driver, lists = reversed(lists[0]), lists[1:]
+            else:
+                driver, sets = sorted(sets[0], reverse=True), sets[1:]
+
+            results = []
+            for number in driver:
+                if number in self._deleted:
+                    continue
+                if not all(number in numbers for numbers in sets):
+                    continue
+                if not all(self._contains(postings, number) for postings in lists):
+                    continue
+                doc = self.docs[number]
+                if user_id and doc['user_id'] != user_id:
+                    continue
+                # 2-gram이 모두 있어도 이어져 있지 않을 수 있으므로 실제로 포함하는지 확인
+                text = self._texts[number]
+                if all(term in text for term in terms):
+                    results.append(dict(doc))
+                    if len(results) >= limit:
+                        break
+            return results
+
+    # === 저장/불러오기 ===
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            info = os.stat(self.path)
+        except OSError:
+            return None
+        return info.st_mtime_ns, info.st_size
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path and os.path.exists(self.path):
+            try:
+                stamp = self._stat()
+                self._load()
+                self._disk_stamp = stamp
+            except Exception as e:
+                print(f"검색 색인 불러오기 중 오류 (새로 만듭니다): {str(e)}")
+                self._reset()
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, Any]]:
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            data = json.load(file)
+        return data if data.get('version') == FORMAT_VERSION else None
+
+    def _load(self):
+        data = self._read(self.path)
+        if data is None:
+            return
+        self._deleted = set()
+        self.docs = data['docs']
+        self._doc_numbers = {doc['id']: number for number, doc in enumerate(self.docs)}
+        self._texts = [self._text(doc) for doc in self.docs]
+        self._postings = {gram: _delta_decode(deltas) for gram, deltas in data['postings'].items()}
+        self._word_postings = {token: _delta_decode(deltas) for token, deltas in data['words'].items()}
+        self._vocabulary = sorted(self._word_postings)
+
+    def _merge_disk(self) -> bool:
+        """다른 프로세스가 저장한 파일과 합침 (파일이 마지막으로 본 것과 같으면 아무것도 하지 않음)
+
+        Returns:
+            파일을 읽었는지 여부
+        """
+        stamp = self._stat()
+        if stamp is None or stamp == self._disk_stamp:
+            return False
+        data = self._read(self.path)
+        self._disk_stamp = stamp
+        if data is None:
+            return False
+
+        disk_ids = set()
+        for doc in data['docs']:
+            disk_ids.add(doc['id'])
+            # 이 프로세스가 지웠지만 아직 저장하지 않은 문서는 다시 가져오지 않음
+            if doc['id'] not in self._doc_numbers and doc['id'] not in self._removed:
+                self._add(doc['id'], doc.get('user_id'), doc.get('query'), doc.get('response'), doc.get('timestamp'))
+        # 이 프로세스가 아직 저장하지 않은 문서가 아닌데 파일에 없으면 다른 프로세스(정리 작업)가 지운 문서
+        for number, doc in enumerate(self.docs):
+            if number not in self._deleted and doc['id'] not in disk_ids and doc['id'] not in self._pending:
+                self._delete(number)
+        self._compact()
+        return True
+
+    def _refresh(self):
+        """검색 전에 다른 프로세스의 변경 사항 반영 (_REFRESH_INTERVAL초마다 파일 상태만 확인)"""
+        now = time.monotonic()
+        if not self.path or now - self._checked_at < _REFRESH_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            self._merge_disk()
+        except Exception as e:
+            print(f"검색 색인 갱신 중 오류: {str(e)}")
+
+    def _file_lock(self):
+        """프로세스 간 저장 잠금 파일 (fcntl이 없으면 None)"""
+        if fcntl is None:
+            return None
+        handle = open(self.path + '.lock', 'a')
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _compact(self):
+        """삭제된 문서를 메모리 색인에서 빼고 번호를 다시 매김 (장시간 실행 중에도 삭제분이 남지 않도록)"""
+        if not self._deleted:
+            return
+        renumber: Dict[int, int] = {}
+        docs = []
+        texts = []
+        for number, doc in enumerate(self.docs):
+            if number not in self._deleted:
+                renumber[number] = len(docs)
+                docs.append(doc)
+                texts.append(self._texts[number])
+        postings = {}
+        for gram, numbers in self._postings.items():
+            kept = [renumber[n] for n in numbers if n in renumber]
+            if kept:
+                postings[gram] = kept
+        word_postings = {}
+        for token, numbers in self._word_postings.items():
+            kept = [renumber[n] for n in numbers if n in renumber]
+            if kept:
+                word_postings[token] = kept
+        self.docs = docs
+        self._texts = texts
+        self._doc_numbers = {doc['id']: number for number, doc in enumerate(docs)}
+        self._postings = postings
+        self._word_postings = word_postings
+        self._vocabulary = sorted(word_postings)
+        self._deleted = set()
+
+    def _serialize(self) -> Dict[str, Any]:
+        """저장용 dict 생성 (삭제된 문서는 먼저 _compact()로 제외)"""
+        self._compact()
+        return {
+            'version': FORMAT_VERSION,
+            'saved_at': time.time(),
+            'docs': self.docs,
+            'postings': {gram: _delta_encode(numbers) for gram, numbers in self._postings.items()},
+            'words': {token: _delta_encode(numbers) for token, numbers in self._word_postings.items()},
+        }
+
+    def flush(self, merge: bool = True):
+        """변경 사항을 디스크에 저장
+
+        파일 잠금을 잡은 상태에서 다른 프로세스가 저장한 내용과 합친 뒤,
+        임시 파일에 쓰고 교체하여 원자적으로 저장합니다. merge=False면 현재 내용으로 덮어씁니다.
+        """
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            lock_handle = None
+            try:
+                directory = os.path.dirname(self.path) or '.'
+                os.makedirs(directory, exist_ok=True)
+                lock_handle = self._file_lock()
+                if merge:
+                    self._merge_disk()
+                data = self._serialize()
+                fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as file:
+                    file.write(json.dumps(data, ensure_ascii=False, separators=(',', ':'),
+                                          default=str).encode('utf-8'))
+                os.replace(temp_path, self.path)
+                self._disk_stamp = self._stat()
+                self._pending.clear()
+                self._removed.clear()
+                self._dirty = 0
+            except Exception as e:
+                print(f"검색 색인 저장 중 오류: {str(e)}")
+            finally:
+                if lock_handle is not None:
+                    lock_handle.close()  # 파일을 닫으면 잠금도 풀림
+
+    def rebuild(self, source_collection: str = 'user_queries') -> int:
+        """Firestore의 질문 문서 전체를 오래된 순으로 다시 색인 (색인 파일이 없을 때 1회 작업)"""
+        from firebase_admin import firestore
+        from services.firebase_service import firebase_service
+        if not firebase_service.is_connected():
+            return 0
+
+        query = (firebase_service.db.collection(source_collection)
+                 .select(['user_id', 'query', 'response', 'timestamp'])
+                 .order_by('timestamp', direction=firestore.Query.ASCENDING))
+        with self._lock:
+            self._loaded = True
+            self._reset()
+            self._dirty = 1
+            for doc in query.stream():
+                data = doc.to_dict() or {}
+                self._add(doc.id, data.get('user_id'), data.get('query'),
+                          data.get('response'), data.get('timestamp'))
+            # Firestore 전체로 만든 색인이 기준이므로 기존 파일과 합치지 않고 덮어씀
+            self.flush(merge=False)
+            return len(self.docs)
+
+
+# 싱글톤 인스턴스 생성
+history_index = HistoryIndex()
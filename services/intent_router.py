@@ -0,0 +1,827 @@
+"""
+질문 의도 라우팅 모듈
+
+스키마의 common_queries / business_metrics로부터 다중 패턴 매칭 오토마톤(Aho-Corasick)을 만들고,
+확실하게 알려진 지표 질문은 LLM 호출 없이 바로 계산하여 템플릿 답변을 반환합니다.
+"""
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import Config
+from services import chart_service
+from services.approximate import is_approximate
+from services.live_counters import live_counter_service
+from services.query_cache import query_cache
+
+
+class AhoCorasick:
+    """다중 패턴 문자열 매칭 오토마톤"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, Any]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, payload: Any):
+        """패턴과 매칭 시 반환할 payload 등록"""
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((pattern, payload))
+        self._built = False
+
+    def build(self):
+        """실패 링크 계산 (BFS)"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        while queue:
+            current = queue.popleft()
+            for ch, next_state in self._goto[current].items():
+                queue.append(next_state)
+                fallback = self._fail[current]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+        self._built = True
+
+    def find_all(self, text: str) -> List[Tuple[str, Any]]:
+        """텍스트에서 매칭된 (패턴, payload) 목록 반환"""
+        if not self._built:
+            self.build()
+
+        matches = []
+        state = 0
+        for ch in text:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            if self._output[state]:
+                matches.extend(self._output[state])
+        return matches
+
+
+def normalize_question(text: str) -> str:
+    """매칭용 정규화 (소문자, 공백 제거)"""
+    return "".join(text.lower().split())
+
+
+# === 패턴 그룹 정의 ===
+
+USER_ENTITY = ['사용자', '회원', '유저', '가입자', '이용자']
+PREMIUM_ENTITY = ['프리미엄', '스토어', '판매중', '유료']
+UGC_ENTITY = ['ugc', '유저생성', '사용자생성', '생성한', '만든', '일반동선']
+PERFORMANCE_ENTITY = ['동선표', '동선', '작품', '퍼포먼스']
+COMPLETED_WORDS = ['완료', '완성', '미완료', '미완성']
+HEADCOUNT_WORDS = ['인원수', '인원', '멤버수', '명짜리']
+TREND_WORDS = ['추이', '추세', '트렌드', '일별', '날짜별', '그래프', '차트', '변화']
+FORMATION_WORDS = ['복잡도', '복잡한', '이동거리', '이동량', '대형변화', '동선변화', '퍼짐', '대칭']
+
+# LLM의 해석/추론이 필요한 질문은 빠른 경로에서 제외
+LLM_REQUIRED_WORDS = ['왜', '이유', '원인', '추천', '예측', '비교', '분석', '전략',
+                      '어떻게', '제안', '인사이트', '개선', '전망', '요약']
+
+TIME_WINDOWS = {
+    'today': ['오늘', '금일'],
+    'this_week': ['이번주', '이번한주', '주간', '금주'],
+    'this_month': ['이번달', '월간', '금월'],
+    'last_7_days': ['최근7일', '최근일주일', '지난7일', '일주일간', '지난주동안']
+}
+
+WINDOW_LABELS = {
+    'today': '오늘',
+    'this_week': '이번 주',
+    'this_month': '이번 달',
+    'last_7_days': '최근 7일'
+}
+
+CONSENT_FIELDS = {
+    'marketingAgree': '마케팅',
+    'pushNotificationAgree': '푸시 알림',
+    'eventNotificationAgree': '이벤트 알림',
+    'shareNotificationAgree': '공유 알림',
+    'privacyAgree': '개인정보',
+    'termsAgree': '약관'
+}
+
+# 지표 카탈로그
+# - collection: 대상 컬렉션 (스키마에 없으면 등록하지 않음)
+# - schema_phrases: 스키마의 common_queries / business_metrics 문구 (존재하는 문구만 패턴으로 등록)
+# - required: 모두 매칭되어야 후보가 되는 동의어 그룹들
+# - bonus: 매칭 시 점수를 더하는 동의어 그룹들
+# - kind: 계산 방식, time_field: 기간 필터 필드
+# - match_phrases: False이면 스키마 문구는 등록 여부 판단에만 쓰고 매칭 패턴으로는 쓰지 않음
+METRIC_CATALOG: Dict[str, Dict[str, Any]] = {
+    'user_count': {
+        'collection': 'User_V2',
+        'schema_phrases': ['총 사용자 수', '신규 가입자 수 (일/주/월)'],
+        'required': [USER_ENTITY],
+        'bonus': [['신규', '가입', '총', '전체', '누적']],
+        'kind': 'count',
+        'time_field': 'createdAt',
+        'label': '사용자',
+    },
+    'user_active': {
+        'collection': 'User_V2',
+        'schema_phrases': ['활성 사용자 수'],
+        'required': [USER_ENTITY + ['접속자'], ['활성', '접속', '활동', 'mau', 'dau', 'wau']],
+        'kind': 'count',
+        'time_field': 'lastActiveAt',
+        'default_window': 'last_7_days',
+        'label': '활성 사용자',
+    },
+    'user_by_provider': {
+        'collection': 'User_V2',
+        'schema_phrases': ['인증 공급자별 사용자 분포'],
+        'required': [['공급자', '로그인', '인증', 'provider', '가입경로', '소셜']],
+        'bonus': [USER_ENTITY],
+        'kind': 'group',
+        'field': 'provider',
+        'time_field': 'createdAt',
+        'label': '인증 공급자별 사용자 분포',
+        'unit': '명',
+    },
+    'user_by_gender': {
+        'collection': 'User_V2',
+        'schema_phrases': ['성별 사용자 분포'],
+        'required': [['성별', '남녀', '남성', '여성']],
+        'bonus': [USER_ENTITY],
+        'kind': 'group',
+        'field': 'gender',
+        'time_field': 'createdAt',
+        'value_labels': {'M': '남성', 'F': '여성', 'O': '기타'},
+        'label': '성별 사용자 분포',
+        'unit': '명',
+    },
+    'user_by_consent': {
+        'collection': 'User_V2',
+        'schema_phrases': ['동의 상태별 사용자 수'],
+        'required': [['동의', '수신']],
+        'bonus': [USER_ENTITY],
+        'kind': 'consent',
+        'time_field': 'createdAt',
+        'label': '동의 상태별 사용자 수',
+    },
+    'premium_count': {
+        'collection': 'PREMIUM_PERFORMANCE_V2',
+        'schema_phrases': ['프리미엄 동선표 총 개수', '총 프리미엄 동선표 수'],
+        'required': [PREMIUM_ENTITY, PERFORMANCE_ENTITY],
+        'kind': 'count',
+        'time_field': 'createdAt',
+        'label': '프리미엄 동선표',
+        'unit': '개',
+    },
+    'premium_completed': {
+        'collection': 'PREMIUM_PERFORMANCE_V2',
+        'schema_phrases': ['완료된 프리미엄 동선표 수'],
+        'required': [PREMIUM_ENTITY, PERFORMANCE_ENTITY, COMPLETED_WORDS],
+        'kind': 'group',
+        'field': 'isCompleted',
+        'time_field': 'createdAt',
+        'value_labels': {True: '완료', False: '미완료'},
+        'label': '프리미엄 동선표 완료 현황',
+        'unit': '개',
+    },
+    'premium_official': {
+        'collection': 'PREMIUM_PERFORMANCE_V2',
+        'schema_phrases': ['공식/비공식 동선표 비율'],
+        'required': [PERFORMANCE_ENTITY, ['공식', '비공식', '오피셜']],
+        'bonus': [PREMIUM_ENTITY],
+        'kind': 'group',
+        'field': 'isOfficial',
+        'time_field': 'createdAt',
+        'value_labels': {True: '공식', False: '비공식'},
+        'label': '공식/비공식 동선표 비율',
+        'unit': '개',
+    },
+    'premium_boy_group': {
+        'collection': 'PREMIUM_PERFORMANCE_V2',
+        'schema_phrases': ['보이그룹/걸그룹 동선표 분포'],
+        'required': [['보이그룹', '걸그룹', '남돌', '여돌', '남자아이돌', '여자아이돌']],
+        'bonus': [PREMIUM_ENTITY, PERFORMANCE_ENTITY],
+        'kind': 'group',
+        'field': 'isBoyGroup',
+        'time_field': 'createdAt',
+        'value_labels': {True: '보이그룹', False: '걸그룹'},
+        'label': '보이그룹/걸그룹 동선표 분포',
+        'unit': '개',
+    },
+    'premium_headcount': {
+        'collection': 'PREMIUM_PERFORMANCE_V2',
+        'schema_phrases': ['인원수별 동선표 분포'],
+        'required': [PREMIUM_ENTITY, HEADCOUNT_WORDS],
+        'bonus': [PERFORMANCE_ENTITY],
+        'kind': 'group',
+        'field': 'headCount',
+        'time_field': 'createdAt',
+        'value_suffix': '인',
+        'label': '인원수별 프리미엄 동선표 분포',
+        'unit': '개',
+    },
+    'premium_price': {
+        'collection': 'PREMIUM_PERFORMANCE_V2',
+        'schema_phrases': ['가격대별 동선표 분포'],
+        'required': [['가격', '판매가', '가격대', '단가']],
+        'bonus': [PREMIUM_ENTITY, PERFORMANCE_ENTITY],
+        'kind': 'price',
+        'field': 'price',
+        'time_field': 'createdAt',
+        'label': '가격대별 동선표 분포',
+    },
+    'ugc_count': {
+        'collection': 'PERFORMANCE_V2',
+        'schema_phrases': ['UGC 동선표 총 개수', '총 UGC 동선표 수'],
+        'required': [UGC_ENTITY, PERFORMANCE_ENTITY],
+        'kind': 'count',
+        'time_field': 'createdAt',
+        'label': 'UGC 동선표',
+        'unit': '개',
+    },
+    'ugc_completed': {
+        'collection': 'PERFORMANCE_V2',
+        'schema_phrases': ['완료된/미완료 동선표 비율', '완료된 UGC 동선표 수'],
+        'required': [UGC_ENTITY, PERFORMANCE_ENTITY, COMPLETED_WORDS],
+        'kind': 'group',
+        'field': 'isCompleted',
+        'time_field': 'createdAt',
+        'value_labels': {True: '완료', False: '미완료'},
+        'label': 'UGC 동선표 완료 현황',
+        'unit': '개',
+    },
+    'ugc_headcount': {
+        'collection': 'PERFORMANCE_V2',
+        'schema_phrases': ['인원수별 동선표 분포'],
+        'required': [UGC_ENTITY, HEADCOUNT_WORDS],
+        'bonus': [PERFORMANCE_ENTITY],
+        'kind': 'group',
+        'field': 'headCount',
+        'time_field': 'createdAt',
+        'value_suffix': '인',
+        'label': '인원수별 UGC 동선표 분포',
+        'unit': '개',
+    },
+    'ugc_per_user': {
+        'collection': 'PERFORMANCE_V2',
+        'schema_phrases': ['사용자별 생성 동선표 수'],
+        'required': [PERFORMANCE_ENTITY, ['사용자별', '유저별', '회원별', '인당', '작성자별', '사용자당', '유저당']],
+        'bonus': [UGC_ENTITY],
+        'kind': 'top_users',
+        'field': 'createdUserId',
+        'time_field': 'createdAt',
+        'label': '사용자별 생성 동선표 수 (상위 5명)',
+    },
+    'ugc_creators': {
+        'collection': 'PERFORMANCE_V2',
+        'schema_phrases': ['사용자별 생성 동선표 수'],
+        'required': [PERFORMANCE_ENTITY, ['작성자수', '만든사람', '만든사용자수', '만든유저수',
+                                          '생성자수', '창작자', '제작자수', '고유사용자']],
+        'bonus': [UGC_ENTITY],
+        'kind': 'distinct',
+        'match_phrases': False,
+        'sketch': 'ugc_creators',
+        'time_field': 'createdAt',
+        'label': '동선표를 만든 고유 사용자',
+        'unit': '명',
+    },
+    'premium_price_quantile': {
+        'collection': 'PREMIUM_PERFORMANCE_V2',
+        'schema_phrases': ['가격대별 동선표 분포'],
+        'required': [['가격', '판매가', '단가'], ['중앙값', '중간값', 'median', '백분위', '분위', '퍼센타일']],
+        'bonus': [PREMIUM_ENTITY, PERFORMANCE_ENTITY],
+        'kind': 'quantile',
+        'match_phrases': False,
+        'sketch': 'premium_price',
+        'time_field': 'createdAt',
+        'label': '프리미엄 동선표 가격 분위수',
+        'unit': '원',
+    },
+    'user_signup_trend': {
+        'collection': 'User_V2',
+        'schema_phrases': ['신규 가입자 수 (일/주/월)'],
+        'required': [USER_ENTITY, TREND_WORDS],
+        'bonus': [['신규', '가입']],
+        'kind': 'trend',
+        'time_field': 'createdAt',
+        'label': '일별 신규 가입자 추이',
+        'unit': '명',
+    },
+    'ugc_trend': {
+        'collection': 'PERFORMANCE_V2',
+        'schema_phrases': ['최근 생성된 동선표 추이'],
+        'required': [PERFORMANCE_ENTITY, TREND_WORDS],
+        'bonus': [UGC_ENTITY, ['최근', '생성']],
+        'kind': 'trend',
+        'time_field': 'createdAt',
+        'label': '일별 UGC 동선표 생성 추이',
+        'unit': '개',
+    },
+    'ugc_formation': {
+        'collection': 'PERFORMANCE_V2',
+        'schema_phrases': ['동선 복잡도 (이동 거리/대형 변화 수)'],
+        'required': [PERFORMANCE_ENTITY, FORMATION_WORDS],
+        'bonus': [UGC_ENTITY, ['대형', '복잡', '횟수']],
+        'kind': 'formation',
+        'match_phrases': False,
+        'field': 'formations',
+        'time_field': 'createdAt',
+        'label': 'UGC 동선 복잡도',
+    },
+    'premium_formation': {
+        'collection': 'PREMIUM_PERFORMANCE_V2',
+        'schema_phrases': ['동선 복잡도 (이동 거리/대형 변화 수)'],
+        'required': [PREMIUM_ENTITY, FORMATION_WORDS],
+        'bonus': [PERFORMANCE_ENTITY, ['대형', '복잡', '횟수']],
+        'kind': 'formation',
+        'match_phrases': False,
+        'field': 'formations',
+        'time_field': 'createdAt',
+        'label': '프리미엄 동선 복잡도',
+    },
+    'ugc_recent': {
+        'collection': 'PERFORMANCE_V2',
+        'schema_phrases': ['최근 생성된 동선표'],
+        'required': [PERFORMANCE_ENTITY, ['최근', '최신', '새로생성', '방금']],
+        'bonus': [UGC_ENTITY],
+        'kind': 'recent',
+        'time_field': 'createdAt',
+        'label': '최근 생성된 동선표',
+    },
+}
+
+
+class IntentRouter:
+    """알려진 지표 질문을 LLM 없이 처리하는 결정적 라우터"""
+
+    def __init__(self, schema: Dict[str, Any] = None, metric_ttl: int = None):
+        self._schema = schema
+        self._automaton: Optional[AhoCorasick] = None
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+        self.metric_ttl = metric_ttl if metric_ttl is not None else Config.INTENT_METRIC_TTL
+
+    # === 오토마톤 구성 ===
+
+    def _load_schema(self) -> Dict[str, Any]:
+        if self._schema is None:
+            from services.firebase_service import firebase_service
+            self._schema = firebase_service.get_database_schema()
+        return self._schema
+
+    def _schema_phrases(self, schema: Dict[str, Any]) -> set:
+        """스키마의 common_queries / business_metrics 문구 수집"""
+        phrases = set()
+        for collection in schema.get('collections', {}).values():
+            phrases.update(collection.get('common_queries', []))
+        for metric_list in schema.get('business_metrics', {}).values():
+            phrases.update(metric_list)
+        return phrases
+
+    def _build(self):
+        """스키마 기반으로 지표 카탈로그를 필터링하고 오토마톤 생성"""
+        schema = self._load_schema()
+        collections = schema.get('collections', {})
+        phrases = self._schema_phrases(schema)
+
+        automaton = AhoCorasick()
+        metrics = {}
+        for key, metric in METRIC_CATALOG.items():
+            matched_phrases = [p for p in metric['schema_phrases'] if p in phrases]
+            if metric['collection'] not in collections or not matched_phrases:
+                continue
+
+            metrics[key] = metric
+            for group_index, group in enumerate(metric['required']):
+                for word in group:
+                    automaton.add(normalize_question(word), ('required', key, group_index))
+            for group_index, group in enumerate(metric.get('bonus', [])):
+                for word in group:
+                    automaton.add(normalize_question(word), ('bonus', key, group_index))
+            # 스키마 문구 자체가 질문에 포함되면 강한 신호로 취급
+            if not metric.get('match_phrases', True):
+                continue
+            for phrase in matched_phrases:
+                automaton.add(normalize_question(phrase.split('(')[0]), ('phrase', key, 0))
+
+        for window, words in TIME_WINDOWS.items():
+            for word in words:
+                automaton.add(word, ('window', window, 0))
+        for word in LLM_REQUIRED_WORDS:
+            automaton.add(word, ('llm', None, 0))
+
+        automaton.build()
+        self._metrics = metrics
+        self._automaton = automaton
+
+    # === 매칭 ===
+
+    def _score(self, question: str) -> Tuple[List[Tuple[int, str]], set, bool]:
+        """질문을 스캔하여 (점수, 지표) 후보 목록, 기간 집합, LLM 필요 여부 반환"""
+        if self._automaton is None:
+            self._build()
+
+        required_hits: Dict[str, set] = {}
+        bonus_hits: Dict[str, set] = {}
+        phrase_hits: set = set()
+        windows = set()
+        needs_llm = False
+
+        for _, (kind, key, group_index) in self._automaton.find_all(normalize_question(question)):
+            if kind == 'required':
+                required_hits.setdefault(key, set()).add(group_index)
+            elif kind == 'bonus':
+                bonus_hits.setdefault(key, set()).add(group_index)
+            elif kind == 'phrase':
+                phrase_hits.add(key)
+            elif kind == 'window':
+                windows.add(key)
+            elif kind == 'llm':
+                needs_llm = True
+
+        candidates = []
+        for key, metric in self._metrics.items():
+            hits = required_hits.get(key, set())
+            if len(hits) < len(metric['required']) and key not in phrase_hits:
+                continue
+            score = len(metric['required']) + len(bonus_hits.get(key, set()))
+            if key in phrase_hits:
+                score += 2
+            candidates.append((score, key))
+
+        candidates.sort(key=lambda item: -item[0])
+        return candidates, windows, needs_llm
+
+    def get_metric(self, metric_key: str) -> Optional[Dict[str, Any]]:
+        """지표 정의 조회 (스키마에 없는 지표는 None)"""
+        if self._automaton is None:
+            self._build()
+        return self._metrics.get(metric_key)
+
+    def match(self, question: str) -> Optional[Dict[str, Any]]:
+        """확실하게 매칭되는 지표 의도 반환 (모호하면 None)"""
+        try:
+            candidates, windows, needs_llm = self._score(question)
+        except Exception as e:
+            print(f"의도 매칭 중 오류: {str(e)}")
+            return None
+
+        if needs_llm or not candidates or len(windows) > 1:
+            return None
+        if len(candidates) > 1 and candidates[0][0] == candidates[1][0]:
+            return None
+
+        key = candidates[0][1]
+        metric = self._metrics[key]
+        window = next(iter(windows), None) or metric.get('default_window')
+        return {'metric': key, 'window': window, 'score': candidates[0][0]}
+
+    def candidates(self, question: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """확신도와 관계없이 상위 후보 의도 목록 반환 (LLM 보조 데이터용)"""
+        try:
+            candidates, windows, _ = self._score(question)
+        except Exception as e:
+            print(f"의도 매칭 중 오류: {str(e)}")
+            return []
+
+        window = next(iter(windows), None) if len(windows) == 1 else None
+        results = []
+        for score, key in candidates[:limit]:
+            metric = self._metrics[key]
+            results.append({
+                'metric': key,
+                'window': window or metric.get('default_window'),
+                'score': score
+            })
+        return results
+
+    # === 지표 계산 ===
+
+    @staticmethod
+    def window_start(window: Optional[str], now: datetime = None) -> Optional[datetime]:
+        """기간 이름을 시작 시각으로 변환 (query_patterns.time_filters 기준)"""
+        if not window:
+            return None
+        now = now or datetime.now()
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if window == 'today':
+            return today_start
+        if window == 'this_week':
+            return today_start - timedelta(days=today_start.weekday())
+        if window == 'this_month':
+            return today_start.replace(day=1)
+        if window == 'last_7_days':
+            return today_start - timedelta(days=7)
+        return None
+
+    def compute(self, intent: Dict[str, Any]) -> Dict[str, Any]:
+        """의도에 해당하는 지표 계산 (TTL 동안 결과 재사용)
+
+        결과는 지표 컬렉션 키로 query_cache에 저장하므로, 해당 컬렉션에 쓰기가 있으면
+        다른 쿼리 결과와 함께 (다른 프로세스에서도) 무효화됩니다.
+        """
+        metric = self._metrics[intent['metric']]
+        if (intent.get('window') == 'today' and metric['kind'] == 'count'
+                and live_counter_service.covers(metric['collection'], metric.get('time_field'))):
+            # 실시간 카운터가 있으면 TTL 캐시 없이 항상 최신 값 사용 (읽기 비용 없음)
+            return self._compute_metric(metric, 'today')
+
+        cache_key = query_cache.make_key('intent', metric['collection'],
+                                         extra=(intent['metric'], intent.get('window'), is_approximate()))
+        hit, cached, token = query_cache.get(cache_key)
+        if hit:
+            return cached
+
+        result = self._compute_metric(metric, intent.get('window'))
+        query_cache.set(cache_key, result, token, ttl=self.metric_ttl)
+        return result
+
+    def _compute_metric(self, metric: Dict[str, Any], window: Optional[str]) -> Dict[str, Any]:
+        from services.firebase_service import firebase_service
+
+        collection = metric['collection']
+        filters = []
+        start = self.window_start(window)
+        if start is not None:
+            filters.append({'field': metric['time_field'], 'operator': '>=', 'value': start})
+
+        kind = metric['kind']
+        if kind == 'count':
+            result = firebase_service.get_aggregated_data(collection, 'count', filters=filters)
+            return {'value': result.get('result', 0)}
+
+        if kind in ('distinct', 'quantile'):
+            # 일별 스케치 롤업을 병합하여 수 KB 상태로 계산
+            from services.sketch_rollups import sketch_rollup_service
+            if kind == 'distinct':
+                return {'value': sketch_rollup_service.distinct_count(metric['sketch'], start),
+                        'error': sketch_rollup_service.distinct_error(metric['sketch'])}
+            return sketch_rollup_service.quantiles(metric['sketch'], [0.25, 0.5, 0.75, 0.9], start)
+
+        if kind == 'formation':
+            # 동선 배열만 스트리밍하여 작품 묶음 단위 벡터 연산으로 계산
+            from services.formation_analytics import formation_analytics
+            summary = formation_analytics.summarize(collection, metric['field'], filters)
+            summary['histogram'] = chart_service.histogram(summary.pop('movements'), Config.CHART_MAX_BARS)
+            return summary
+
+        if kind == 'trend':
+            # 시각 필드만 스트리밍하여 일별 개수로 집계 (메모리는 일 수에 비례)
+            timestamps = (row.get(metric['time_field']) for row in firebase_service.stream_query(
+                collection, filters, select=[metric['time_field']]))
+            series = chart_service.daily_counts(timestamps)
+            return {'series': [(day.isoformat(), count) for day, count in series],
+                    'total': sum(count for _, count in series)}
+
+        if kind == 'recent':
+            rows = firebase_service.execute_dynamic_query(
+                collection, filters, order_by=f"-{metric['time_field']}", limit=5)
+            return {'rows': [{'title': row.get('title', ''), 'artist': row.get('artist', ''),
+                              'createdAt': row.get('createdAt')} for row in rows]}
+
+        if kind == 'top_users':
+            # 외래 키 집계 후 상위 사용자만 User_V2와 일괄 조인
+            from services.join_engine import join_engine
+            top = join_engine.count_by_foreign_key(
+                collection, metric['field'], filters=filters, target_fields=['nickname'], top_n=5)
+            return {'rows': [{'id': item['id'], 'count': item['count'],
+                              'nickname': (item['user'] or {}).get('nickname')} for item in top]}
+
+        if kind == 'group':
+            return firebase_service.get_group_counts(collection, metric['field'], filters)
+
+        if kind == 'consent':
+            # 동의 필드만 스트리밍하여 집계 (동선 배열 등 큰 필드는 내려받지 않음)
+            counts = Counter()
+            total = 0
+            for row in firebase_service.stream_query(collection, filters, select=list(CONSENT_FIELDS)):
+                total += 1
+                counts.update(field for field in CONSENT_FIELDS if row.get(field) is True)
+            return {'groups': {field: counts[field] for field in CONSENT_FIELDS}, 'total': total}
+
+        if kind == 'price':
+            # 가격 필드만 스트리밍
+            prices = [row['price'] for row in firebase_service.stream_query(collection, filters, select=[metric['field']])
+                      if isinstance(row.get('price'), (int, float))]
+            buckets = Counter()
+            for price in prices:
+                lower = int(price // 10000) * 10000
+                buckets[lower] += 1
+            return {
+                'buckets': dict(sorted(buckets.items())),
+                'histogram': chart_service.histogram(prices, Config.CHART_MAX_BARS),
+                'avg': sum(prices) / len(prices) if prices else 0,
+                'min': min(prices) if prices else 0,
+                'max': max(prices) if prices else 0,
+                'total': len(prices)
+            }
+
+        return {}
+
+    # === 템플릿 답변 ===
+
+    def render(self, intent: Dict[str, Any], result: Dict[str, Any]) -> str:
+        """계산 결과를 한국어 템플릿 답변으로 변환"""
+        metric = self._metrics[intent['metric']]
+        window_label = WINDOW_LABELS.get(intent.get('window'))
+        prefix = f"{window_label} " if window_label else ""
+        kind = metric['kind']
+
+        if kind == 'count':
+            unit = metric.get('unit', '명')
+            if intent['metric'] == 'user_count':
+                label = '신규 가입자' if window_label else '전체 사용자'
+            elif intent['metric'] == 'user_active':
+                label = metric['label']
+            else:
+                label = f"새로 생성된 {metric['label']}" if window_label else f"전체 {metric['label']}"
+            return f"📊 {prefix}{label} 수는 **{result['value']:,}{unit}**입니다."
+
+        if kind == 'distinct':
+            return (f"📊 {prefix}{metric['label']} 수는 약 **{result['value']:,}{metric['unit']}**입니다. "
+                    f"(HyperLogLog 추정치, 오차 약 ±{result['error'] * 100:.1f}%)")
+
+        if kind == 'quantile':
+            quantiles = result.get('quantiles', {})
+            if not result.get('count'):
+                return f"📊 {prefix}{metric['label']}: 해당 데이터가 없습니다."
+            names = {0.25: '하위 25%', 0.5: '중앙값', 0.75: '상위 25%', 0.9: '상위 10%'}
+            lines = [f"- {names.get(q, f'{q * 100:.0f}%')}: {value:,.0f}{metric['unit']}"
+                     for q, value in quantiles.items() if value is not None]
+            return (f"📊 {prefix}{metric['label']} (약 {result['count']:,}개 기준 추정치)\n"
+                    + "\n".join(lines))
+
+        if kind == 'top_users':
+            rows = result.get('rows', [])
+            if not rows:
+                return f"📊 {prefix}{metric['label']}: 해당 데이터가 없습니다."
+            lines = [f"- {row['nickname'] or row['id']}: {row['count']:,}개" for row in rows]
+            return f"📊 {prefix}{metric['label']}\n" + "\n".join(lines)
+
+        if kind in ('group', 'consent'):
+            groups = result.get('groups', {})
+            total = result.get('total', 0)
+            if not groups:
+                return f"📊 {prefix}{metric['label']}: 해당 데이터가 없습니다."
+
+            unit = metric.get('unit', '명')
+            labels = metric.get('value_labels', {})
+            suffix = metric.get('value_suffix', '')
+            lines = []
+            ordered = sorted(groups.items(), key=lambda item: -item[1])
+            if kind == 'consent':
+                lines = [f"- {CONSENT_FIELDS[field]} 동의: {count:,}명 "
+                         f"({count / total * 100:.1f}%)" if total else f"- {CONSENT_FIELDS[field]} 동의: {count:,}명"
+                         for field, count in ordered]
+                header = f"📊 {prefix}{metric['label']} (전체 {total:,}명 기준)"
+            else:
+                intervals = result.get('intervals', {})
+                for value, count in ordered:
+                    name = labels.get(value, f"{value}{suffix}")
+                    share = count / total * 100 if total else 0
+                    interval = (f" ({intervals[value][0]:,}~{intervals[value][1]:,})"
+                                if value in intervals else "")
+                    lines.append(f"- {name}: {count:,}{unit}{interval} ({share:.1f}%)")
+                header = f"📊 {prefix}{metric['label']} (총 {total:,}{unit})"
+                if result.get('approximate'):
+                    header = (f"📊 {prefix}{metric['label']} (총 약 {total:,}{unit}, "
+                              f"표본 {result['sample_size']:,}개 기준 추정치, "
+                              f"{result['confidence'] * 100:.0f}% 신뢰구간)")
+                    lines.append(f"- 표본에 없는 값: 각각 최대 약 {result['unseen_max']:,}{unit}")
+            return header + "\n" + "\n".join(lines)
+
+        if kind == 'price':
+            if not result.get('total'):
+                return f"📊 {prefix}{metric['label']}: 해당 데이터가 없습니다."
+            lines = [f"- {lower:,}원 ~ {lower + 9999:,}원: {count:,}개"
+                     for lower, count in result['buckets'].items()]
+            return (f"📊 {prefix}{metric['label']} (총 {result['total']:,}개)\n"
+                    f"평균 {result['avg']:,.0f}원, 최저 {result['min']:,.0f}원, 최고 {result['max']:,.0f}원\n"
+                    + "\n".join(lines))
+
+        if kind == 'trend':
+            series = result.get('series', [])
+            if not series:
+                return f"📈 {prefix}{metric['label']}: 해당 데이터가 없습니다."
+            unit = metric.get('unit', '명')
+            peak_day, peak = max(series, key=lambda item: item[1])
+            average = result['total'] / len(series)
+            return (f"📈 {prefix}{metric['label']} ({series[0][0]} ~ {series[-1][0]}, {len(series):,}일)\n"
+                    f"- 합계: {result['total']:,}{unit}\n"
+                    f"- 일평균: {average:,.1f}{unit}\n"
+                    f"- 최대: {peak:,}{unit} ({peak_day})")
+
+        if kind == 'recent':
+            rows = result.get('rows', [])
+            if not rows:
+                return f"📊 {prefix}{metric['label']}: 해당 데이터가 없습니다."
+            lines = [f"- {row['title']} ({row['artist']})" for row in rows]
+            return f"📊 {prefix}{metric['label']}\n" + "\n".join(lines)
+
+        if kind == 'formation':
+            if not result.get('total'):
+                return f"📊 {prefix}{metric['label']}: 해당 데이터가 없습니다."
+            averages = result['averages']
+            lines = [
+                f"- 평균 총 이동 거리: {averages['movement_distance']:,.1f}",
+                f"- 평균 대형 변화 횟수: {averages['formation_changes']:,.1f}회",
+                f"- 평균 퍼짐 정도: {averages['spread']:,.2f}",
+                f"- 평균 좌우 대칭도: {averages['symmetry']:.2f} (1이 완전 대칭)",
+            ]
+            top = [f"  - {row['title'] or row['id']}: {row['movement_distance']:,.1f}" for row in result['top']]
+            return (f"📊 {prefix}{metric['label']} (동선이 있는 작품 {result['total']:,}개 기준)\n"
+                    + "\n".join(lines) + "\n- 이동 거리 상위 작품\n" + "\n".join(top))
+
+        return ""
+
+    # === 차트 ===
+
+    def chart(self, intent: Dict[str, Any], result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """계산 결과를 차트 데이터로 변환 (차트가 의미 없는 지표는 None)"""
+        metric = self._metrics[intent['metric']]
+        window_label = WINDOW_LABELS.get(intent.get('window'))
+        title = f"{window_label} {metric['label']}" if window_label else metric['label']
+        kind = metric['kind']
+
+        if kind == 'trend':
+            series = [(datetime.fromisoformat(day).date(), count) for day, count in result.get('series', [])]
+            return chart_service.time_series_chart(series, title, metric.get('unit', '명'))
+
+        if kind == 'group':
+            labels = dict(metric.get('value_labels', {}))
+            suffix = metric.get('value_suffix', '')
+            if suffix:
+                labels.update({value: f"{value}{suffix}" for value in result.get('groups', {})})
+            return chart_service.distribution_chart(result.get('groups', {}), title,
+                                                    metric.get('unit', '명'), labels)
+
+        if kind == 'consent':
+            groups = {CONSENT_FIELDS[field]: count for field, count in result.get('groups', {}).items()}
+            return chart_service.distribution_chart(groups, title, '명')
+
+        if kind == 'top_users':
+            groups = {row['nickname'] or row['id']: row['count'] for row in result.get('rows', [])}
+            return chart_service.distribution_chart(groups, title, '개')
+
+        if kind in ('price', 'formation'):
+            return chart_service.histogram_chart(result.get('histogram') or [], title, '개',
+                                                 '가격 구간(원)' if kind == 'price' else '총 이동 거리 구간')
+
+        return None
+
+    def resolve(self, question: str) -> Optional[Dict[str, Any]]:
+        """확실한 지표 질문이면 {'answer', 'chart', 'intent'} 반환, 아니면 None"""
+        intent = self.match(question)
+        if intent is None:
+            return None
+
+        try:
+            result = self.compute(intent)
+            return {
+                'answer': self.render(intent, result),
+                'chart': self.chart(intent, result),
+                'intent': intent
+            }
+        except Exception as e:
+            print(f"빠른 경로 지표 계산 중 오류: {str(e)}")
+            return None
+
+    def candidate_chart(self, question: str) -> Optional[Dict[str, Any]]:
+        """가장 유력한 후보 지표의 차트 (LLM 경로 답변 보조용)"""
+        for intent in self.candidates(question, limit=1):
+            try:
+                return self.chart(intent, self.compute(intent))
+            except Exception as e:
+                print(f"후보 차트 생성 중 오류: {str(e)}")
+        return None
+
+    def describe_candidates(self, question: str) -> Optional[str]:
+        """후보 지표들을 계산하여 LLM 참고 데이터로 사용할 문자열 반환"""
+        intents = self.candidates(question)
+        if not intents:
+            return None
+
+        sections = []
+        for intent in intents:
+            try:
+                sections.append(self.render(intent, self.compute(intent)))
+            except Exception as e:
+                print(f"후보 지표 계산 중 오류: {str(e)}")
+        return "\n\n".join(sections) if sections else None
+
+
+# 싱글톤 인스턴스 생성
+intent_router = IntentRouter()
@@ -0,0 +1,134 @@
+"""
+컬렉션 간 조인 엔진 모듈
+
+PERFORMANCE_V2.createdUserId 같은 외래 키를 User_V2 문서와 연결할 때
+사용자마다 쿼리를 보내지 않고(N+1), 청크 단위 get_all 일괄 조회와 LRU 캐시로 해결합니다.
+"""
+import copy
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+from config.settings import Config
+from services.lru_cache import LRUCache
+
+_MISSING = object()
+
+
+class JoinEngine:
+    """배치 조회 기반 조인 헬퍼"""
+
+    def __init__(self, batch_size: int = None, cache_size: int = None, cache_ttl: int = None):
+        self.batch_size = batch_size or Config.JOIN_BATCH_SIZE
+        self.cache_ttl = cache_ttl if cache_ttl is not None else Config.JOIN_CACHE_TTL
+        # (컬렉션, 문서 ID, 필드 튜플) -> (만료 시각, 문서 데이터) (없는 문서는 None으로 캐시)
+        self._cache = LRUCache(cache_size or Config.JOIN_CACHE_SIZE)
+
+    def _firebase(self):
+        from services.firebase_service import firebase_service
+        return firebase_service
+
+    def fetch_documents(self, collection_name: str, doc_ids: List[str],
+                        fields: List[str] = None) -> Dict[str, Optional[Dict]]:
+        """문서 ID 목록을 캐시 우선, 나머지는 청크 단위 get_all로 조회
+
+        반환하는 문서는 캐시와 공유하지 않는 복사본이므로 호출자가 수정해도 됩니다.
+
+        Returns:
+            {문서 ID: 문서 데이터 (없으면 None)}
+        """
+        field_key = tuple(sorted(fields)) if fields else None
+        results: Dict[str, Optional[Dict]] = {}
+        missing = []
+
+        for doc_id in dict.fromkeys(doc_ids):  # 순서 유지 중복 제거
+            cache_key = (collection_name, doc_id, field_key)
+            # contains()와 get() 사이에 항목이 밀려날 수 있으므로 한 번의 get으로 확인
+            cached = self._cache.get(cache_key, _MISSING)
+            if cached is not _MISSING and time.time() < cached[0]:
+                results[doc_id] = copy.deepcopy(cached[1])
+            else:
+                missing.append(doc_id)
+
+        firebase_service = self._firebase()
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            try:
+                fetched = firebase_service.get_documents(collection_name, chunk, fields)
+            except Exception as e:
+                # 일시적 오류를 '없는 문서'로 캐시하지 않도록 이번 결과에만 None으로 채움
+                print(f"문서 일괄 조회 중 오류: {str(e)}")
+                results.update((doc_id, None) for doc_id in chunk)
+                continue
+            expires_at = time.time() + self.cache_ttl
+            for doc_id in chunk:
+                data = fetched.get(doc_id)
+                if self.cache_ttl > 0:
+                    self._cache.set((collection_name, doc_id, field_key), (expires_at, data))
+                results[doc_id] = copy.deepcopy(data)
+
+        return results
+
+    def join(self, collection_name: str, foreign_key: str,
+             target_collection: str = 'User_V2', filters: List[Dict] = None,
+             fields: List[str] = None, target_fields: List[str] = None,
+             alias: str = 'user') -> Iterator[Dict[str, Any]]:
+        """왼쪽 컬렉션을 스캔하면서 외래 키를 대상 컬렉션 문서와 연결하여 한 건씩 반환
+
+        Args:
+            collection_name: 스캔할 컬렉션 (예: 'PERFORMANCE_V2')
+            foreign_key: 외래 키 필드 (예: 'createdUserId', 'lastActivatedUserId')
+            target_collection: 참조 대상 컬렉션 (기본: 'User_V2')
+            filters: 왼쪽 컬렉션 필터 조건
+            fields: 왼쪽 컬렉션에서 가져올 필드 (외래 키는 자동 포함)
+            target_fields: 대상 문서에서 가져올 필드
+            alias: 조인된 문서를 담을 키 이름
+
+        Yields:
+            왼쪽 문서 + {alias: 대상 문서 또는 None}
+        """
+        projection = None
+        if fields:
+            projection = list(dict.fromkeys(list(fields) + [foreign_key]))
+
+        rows = self._firebase().stream_query(collection_name, filters, select=projection)
+
+        buffer: List[Dict] = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= self.batch_size:
+                yield from self._resolve_chunk(buffer, foreign_key, target_collection, target_fields, alias)
+                buffer = []
+        if buffer:
+            yield from self._resolve_chunk(buffer, foreign_key, target_collection, target_fields, alias)
+
+    def _resolve_chunk(self, rows: List[Dict], foreign_key: str, target_collection: str,
+                       target_fields: Optional[List[str]], alias: str) -> Iterator[Dict[str, Any]]:
+        """청크 내 외래 키를 한 번에 조회하여 행에 붙임"""
+        keys = [row[foreign_key] for row in rows if row.get(foreign_key)]
+        targets = self.fetch_documents(target_collection, keys, target_fields)
+        for row in rows:
+            row[alias] = targets.get(row.get(foreign_key))
+            yield row
+
+    def count_by_foreign_key(self, collection_name: str, foreign_key: str,
+                             target_collection: str = 'User_V2', filters: List[Dict] = None,
+                             target_fields: List[str] = None, top_n: int = 10) -> List[Dict[str, Any]]:
+        """외래 키별 문서 수를 세고 상위 항목만 대상 문서와 연결 (예: 사용자별 생성 동선표 수)
+
+        Returns:
+            [{'id': 외래 키 값, 'count': 문서 수, 'user': 대상 문서}, ...] (많은 순)
+        """
+        rows = self._firebase().stream_query(collection_name, filters, select=[foreign_key])
+        counts = Counter(row.get(foreign_key) for row in rows if row.get(foreign_key))
+        top = counts.most_common(top_n)
+
+        targets = self.fetch_documents(target_collection, [key for key, _ in top], target_fields)
+        return [{'id': key, 'count': count, 'user': targets.get(key)} for key, count in top]
+
+    def clear_cache(self):
+        """조회 캐시 비우기"""
+        self._cache.clear()
+
+
+# 싱글톤 인스턴스 생성
+join_engine = JoinEngine()
@@ -0,0 +1,227 @@
+"""
+실시간 카운터 모듈
+
+LIVE_MODE가 켜져 있으면 '오늘' 구간 쿼리(예: User_V2.createdAt >= 오늘 0시)에 Firestore
+on_snapshot 리스너를 붙이고, 문서 변경 이벤트로 개수/합계를 메모리에서 증분 갱신합니다.
+'오늘' 지표는 요청마다 컬렉션을 다시 읽지 않고 이 카운터 값을 사용합니다.
+날짜가 바뀌면 리스너를 새 구간으로 다시 붙입니다.
+"""
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+from config.settings import Config
+
+# 실시간으로 유지할 '오늘' 구간 정의
+# - collection / time_field: 리스너를 붙일 컬렉션과 시간 필드
+# - sum_fields: 개수 외에 합계/평균을 유지할 숫자 필드
+LIVE_SPECS: List[Dict[str, Any]] = [
+    {'collection': 'User_V2', 'time_field': 'createdAt', 'sum_fields': []},
+    {'collection': 'PERFORMANCE_V2', 'time_field': 'createdAt', 'sum_fields': ['headCount']},
+    {'collection': 'PREMIUM_PERFORMANCE_V2', 'time_field': 'createdAt', 'sum_fields': ['price']},
+    {'collection': 'user_queries', 'time_field': 'timestamp', 'sum_fields': []},
+    {'collection': 'users', 'time_field': 'created_at', 'sum_fields': []},
+    {'collection': 'orders', 'time_field': 'created_at', 'sum_fields': ['amount']},
+]
+
+
+def _day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day)
+
+
+def _numeric(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+class LiveWindow:
+    """하나의 '오늘' 구간 쿼리에 대한 리스너와 증분 카운터"""
+
+    def __init__(self, collection_name: str, time_field: str, sum_fields: List[str]):
+        self.collection_name = collection_name
+        self.time_field = time_field
+        self.sum_fields = list(sum_fields)
+        self.day: Optional[date] = None
+        self._watch = None
+        # attach마다 증가 (해제된 이전 리스너가 늦게 보낸 이벤트를 버리기 위해 사용)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        # 문서 ID -> 합계 필드 값 (수정/삭제 시 이전 값을 빼기 위해 보관)
+        self._docs: Dict[str, Tuple[Optional[float], ...]] = {}
+        self._sums = {field: 0.0 for field in self.sum_fields}
+        self._sum_counts = {field: 0 for field in self.sum_fields}
+        self._ready.clear()
+
+    def attach(self, backend, day: date):
+        """day 0시 이후 문서에 리스너 연결"""
+        self.detach()
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self.day = day
+            self._reset()
+        query = backend.build_query(self.collection_name, [
+            {'field': self.time_field, 'operator': '>=', 'value': _day_start(day)}])
+        self._watch = query.on_snapshot(
+            lambda docs, changes, read_time: self._on_snapshot(generation, changes))
+
+    def detach(self):
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception as e:
+                print(f"실시간 리스너 해제 중 오류: {str(e)}")
+            self._watch = None
+
+    def _apply(self, values: Tuple[Optional[float], ...], sign: int):
+        for field, value in zip(self.sum_fields, values):
+            if value is not None:
+                self._sums[field] += sign * value
+                self._sum_counts[field] += sign
+
+    def _on_snapshot(self, generation: int, changes):
+        """문서 변경 이벤트로 카운터 증분 갱신 (리스너 스레드에서 호출)
+
+        unsubscribe 전에 이미 전달된 이전 리스너의 이벤트는 generation이 달라 무시합니다.
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+            for change in changes:
+                doc_id = change.document.id
+                old = self._docs.pop(doc_id, None)
+                if old is not None:
+                    self._apply(old, -1)
+                if change.type.name == 'REMOVED':
+                    continue
+                data = change.document.to_dict() or {}
+                values = tuple(_numeric(data.get(field)) for field in self.sum_fields)
+                self._docs[doc_id] = values
+                self._apply(values, 1)
+            self._ready.set()
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set() and self.day == date.today()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """현재 개수/합계 (문서 수가 곧 개수)"""
+        with self._lock:
+            return {
+                'count': len(self._docs),
+                'sums': dict(self._sums),
+                'sum_counts': dict(self._sum_counts)
+            }
+
+
+class LiveCounterService:
+    """'오늘' 지표용 실시간 카운터 관리 서비스"""
+
+    def __init__(self):
+        self.enabled = Config.LIVE_MODE
+        self._windows: Dict[Tuple[str, str], LiveWindow] = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self) -> bool:
+        """리스너 연결 (Firestore 백엔드에서만, 여러 번 호출해도 한 번만 연결)"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if self._started:
+                return True
+
+            from services.firebase_service import firebase_service
+            from services.storage_backend import FirestoreBackend
+            backend = firebase_service.backend
+            if not isinstance(backend, FirestoreBackend):
+                # 로컬 SQLite 등에는 변경 알림이 없으므로 실시간 모드를 사용하지 않음
+                self.enabled = False
+                return False
+
+            today = date.today()
+            for spec in LIVE_SPECS:
+                window = LiveWindow(spec['collection'], spec['time_field'], spec['sum_fields'])
+                try:
+                    window.attach(backend, today)
+                except Exception as e:
+                    print(f"실시간 리스너 연결 중 오류 ({spec['collection']}): {str(e)}")
+                    continue
+                self._windows[(spec['collection'], spec['time_field'])] = window
+            self._backend = backend
+            self._started = True
+            return True
+
+    def stop(self):
+        """모든 리스너 해제"""
+        with self._lock:
+            for window in self._windows.values():
+                window.detach()
+            self._windows.clear()
+            self._started = False
+
+    def _window(self, collection_name: str, time_field: str) -> Optional[LiveWindow]:
+        """준비된 오늘 구간 반환 (날짜가 바뀌었으면 새 구간으로 다시 연결)"""
+        if not self.start():
+            return None
+        window = self._windows.get((collection_name, time_field))
+        if window is None:
+            return None
+
+        today = date.today()
+        if window.day != today:
+            with self._lock:
+                if window.day != today:
+                    try:
+                        window.attach(self._backend, today)
+                    except Exception as e:
+                        print(f"실시간 리스너 재연결 중 오류 ({collection_name}): {str(e)}")
+                        return None
+        return window if window.is_ready() else None
+
+    def covers(self, collection_name: str, time_field: str) -> bool:
+        """해당 컬렉션/시간 필드의 오늘 구간을 실시간으로 유지 중인지 여부"""
+        return self._window(collection_name, time_field) is not None
+
+    def lookup(self, collection_name: str, aggregation_type: str, field: str = None,
+               filters: List[Dict] = None) -> Optional[Dict[str, Any]]:
+        """'시간 필드 >= 오늘 0시' 단일 필터 집계를 실시간 카운터로 응답
+
+        Returns:
+            get_aggregated_data와 같은 형식의 결과, 카운터로 답할 수 없으면 None
+        """
+        if not self.enabled or not filters or len(filters) != 1:
+            return None
+
+        condition = filters[0]
+        if condition.get('operator') != '>=' or condition.get('value') != _day_start(date.today()):
+            return None
+
+        window = self._window(collection_name, condition.get('field'))
+        if window is None:
+            return None
+
+        aggregation_type = aggregation_type.lower()
+        state = window.snapshot()
+        if aggregation_type == 'count':
+            return {'result': state['count'], 'type': 'count', 'live': True}
+
+        if field not in state['sums'] or aggregation_type not in ('sum', 'avg'):
+            return None
+        count = state['sum_counts'][field]
+        if not count:
+            return {'result': 0, 'type': aggregation_type, 'live': True}
+        total = state['sums'][field]
+        return {
+            'result': total if aggregation_type == 'sum' else total / count,
+            'type': aggregation_type,
+            'count': count,
+            'live': True
+        }
+
+
+# 싱글톤 인스턴스 생성
+live_counter_service = LiveCounterService()
@@ -0,0 +1,62 @@
+"""
+스레드 안전 LRU 캐시 모듈
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """크기 제한이 있는 스레드 안전 LRU 캐시"""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """값 조회 (조회 시 최근 사용으로 갱신)"""
+        with self._lock:
+            value = self._data.get(key, self._MISSING)
+            if value is self._MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def contains(self, key: Hashable) -> bool:
+        """키 존재 여부 확인 (최근 사용 순서는 바꾸지 않음)"""
+        with self._lock:
+            return key in self._data
+
+    def set(self, key: Hashable, value: Any):
+        """값 저장 (크기를 넘으면 가장 오래된 항목부터 제거)"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Optional[Any]:
+        """항목 제거"""
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        """전체 삭제"""
+        with self._lock:
+            self._data.clear()
+
+    def keys(self):
+        """현재 키 목록 (복사본)"""
+        with self._lock:
+            return list(self._data.keys())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,163 @@
+"""
+쿼리 결과 캐시 모듈
+
+(컬렉션, 정렬된 필터, 정렬, 제한, 프로젝션)을 정규화한 키로 execute_dynamic_query /
+get_aggregated_data 결과를 메모리에 캐시합니다. datetime.now()로 만든 상대 시간 필터도
+같은 시간 구간(예: 5분) 안에서는 같은 키가 되도록 구간 경계로 내림합니다.
+메모리에 없으면 프로세스 간 공유 캐시(shared_cache)를 2단계로 확인합니다.
+get()이 돌려주는 토큰을 set()에 넘기면, 계산하는 동안 무효화된 결과는 (이 프로세스든 다른 프로세스든) 저장하지 않습니다.
+"""
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from config.settings import Config
+from services.lru_cache import LRUCache
+from services.shared_cache import shared_cache
+
+# 여러 컬렉션에서 만든 결과를 담는 공유 캐시 네임스페이스 (어느 컬렉션이 무효화되어도 함께 무효화)
+DERIVED_NAMESPACES = ('dashboard', 'llm_answer')
+
+
+def snap_datetime(value: datetime, granularity: int) -> datetime:
+    """datetime을 granularity(초) 경계로 내림
+
+    자정(오늘 시작, 주 시작 등)처럼 이미 경계인 값은 그대로 유지됩니다.
+    """
+    if granularity <= 1:
+        return value.replace(microsecond=0)
+    midnight = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    seconds = int((value - midnight).total_seconds())
+    return midnight + timedelta(seconds=seconds - seconds % granularity)
+
+
+def _canonical_value(value: Any) -> Hashable:
+    """필터 값을 해시 가능한 정규형으로 변환"""
+    if isinstance(value, datetime):
+        return ('ts', value.isoformat())
+    if isinstance(value, date):
+        return ('date', value.isoformat())
+    if isinstance(value, (list, tuple, set)):
+        return ('list', tuple(sorted((_canonical_value(item) for item in value), key=repr)))
+    if isinstance(value, dict):
+        return ('map', tuple(sorted((key, _canonical_value(item)) for key, item in value.items())))
+    return (type(value).__name__, value)
+
+
+class QueryCache:
+    """컬렉션별 TTL과 LRU 크기 제한이 있는 쿼리 결과 캐시"""
+
+    def __init__(self, maxsize: int = None, default_ttl: int = None,
+                 collection_ttls: Dict[str, int] = None, snap_seconds: int = None):
+        self.enabled = Config.QUERY_CACHE_ENABLED
+        self.default_ttl = default_ttl if default_ttl is not None else Config.QUERY_CACHE_TTL
+        self.collection_ttls = collection_ttls if collection_ttls is not None else Config.QUERY_CACHE_COLLECTION_TTLS
+        self.snap_seconds = snap_seconds if snap_seconds is not None else Config.QUERY_CACHE_SNAP_SECONDS
+        # 키 -> (만료 시각, 값)
+        # 키의 두 번째 값이 컬렉션이므로 무효화는 현재 키를 훑어서 처리 (별도 색인을 두면 LRU/TTL로
+        # 밀려난 키가 색인에 계속 남음, 항목 수는 QUERY_CACHE_SIZE로 제한되어 있음)
+        self._entries = LRUCache(maxsize or Config.QUERY_CACHE_SIZE)
+        # 무효화 세대 (전체, 컬렉션별) - 계산 중에 무효화된 결과를 메모리 캐시에 넣지 않기 위해 사용
+        self._generation = 0
+        self._collection_generations: Dict[str, int] = {}
+
+    def snap_filters(self, filters: Optional[List[Dict]]) -> Optional[List[Dict]]:
+        """필터의 datetime 값을 구간 경계로 내림 (실제 쿼리도 이 값으로 실행해야 결과가 키와 일치)"""
+        if not filters:
+            return filters
+        snapped = []
+        for filter_condition in filters:
+            value = filter_condition.get('value')
+            if isinstance(value, datetime):
+                filter_condition = dict(filter_condition, value=snap_datetime(value, self.snap_seconds))
+            snapped.append(filter_condition)
+        return snapped
+
+    @staticmethod
+    def make_key(kind: str, collection_name: str, filters: Optional[List[Dict]] = None,
+                 order_by: str = None, limit: int = None, select: List[str] = None,
+                 extra: Tuple = ()) -> Tuple:
+        """정규화된 캐시 키 생성 (필터 순서, 정렬 접두사 생략 여부와 무관)"""
+        canonical_filters = tuple(sorted(
+            (f.get('field'), f.get('operator', '=='), _canonical_value(f.get('value')))
+            for f in (filters or [])
+            if f.get('field') and f.get('value') is not None
+        ))
+        if order_by and not order_by.startswith(('-', '+')):
+            order_by = f"-{order_by}"  # 접두사가 없으면 내림차순
+        projection = tuple(sorted(select)) if select else None
+        return (kind, collection_name, canonical_filters, order_by, limit, projection, extra)
+
+    def _local_generation(self, collection_name: str) -> Tuple[int, int]:
+        return self._generation, self._collection_generations.get(collection_name, 0)
+
+    def get(self, key: Tuple) -> Tuple[bool, Any, Optional[Tuple]]:
+        """(적중 여부, 값, 토큰) 반환
+
+        적중하지 않아 값을 계산했다면 set(key, value, token)으로 저장합니다.
+        """
+        if not self.enabled:
+            return False, None, None
+        token_generation = self._local_generation(key[1])
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if time.time() < expires_at:
+                return True, value, None
+            self._entries.pop(key)
+
+        # 다른 프로세스가 계산한 결과 확인 (적중하면 메모리 캐시에도 저장)
+        hit, value, version = shared_cache.get(key[1], key)
+        if hit:
+            self._set_local(key, value)
+        return hit, value, (token_generation, version)
+
+    def _ttl(self, collection_name: str) -> int:
+        return self.collection_ttls.get(collection_name, self.default_ttl)
+
+    def _set_local(self, key: Tuple, value: Any, ttl: int = None):
+        ttl = ttl if ttl is not None else self._ttl(key[1])
+        if ttl <= 0:
+            return
+        self._entries.set(key, (time.time() + ttl, value))
+
+    def set(self, key: Tuple, value: Any, token: Tuple = None, ttl: int = None):
+        """값 저장 (token은 계산 전에 get()이 돌려준 값, ttl이 없으면 키의 컬렉션 TTL 적용)"""
+        if not self.enabled:
+            return
+        ttl = ttl if ttl is not None else self._ttl(key[1])
+        generation, version = token if token else (None, None)
+        if generation is None or generation == self._local_generation(key[1]):
+            self._set_local(key, value, ttl)
+        shared_cache.set(key[1], key, value, ttl, version=version)
+
+    def invalidate(self, collection_name: str = None):
+        """컬렉션(또는 전체) 캐시 무효화 (공유 캐시는 버전을 올려 다른 프로세스에도 반영)
+
+        대시보드/LLM 답변처럼 여러 컬렉션에서 만든 공유 캐시 항목(DERIVED_NAMESPACES)도 함께 무효화합니다.
+        """
+        if collection_name is None:
+            self._generation += 1
+            self._entries.clear()
+            shared_cache.clear()
+            return
+
+        self._collection_generations[collection_name] = self._collection_generations.get(collection_name, 0) + 1
+        shared_cache.invalidate(collection_name)
+        for namespace in DERIVED_NAMESPACES:
+            shared_cache.invalidate(namespace)
+        for key in self._entries.keys():
+            if key[1] == collection_name:
+                self._entries.pop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """캐시 통계"""
+        return {
+            'entries': len(self._entries),
+            'hits': self._entries.hits,
+            'misses': self._entries.misses,
+            'shared': shared_cache.stats()
+        }
+
+
+# 싱글톤 인스턴스 생성
+query_cache = QueryCache()
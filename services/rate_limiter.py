@@ -0,0 +1,45 @@
+"""
+토큰 버킷 속도 제한 모듈
+
+여러 스레드가 같은 API 할당량(분당 요청 수)을 나눠 쓰도록 요청 전에 토큰을 하나씩 가져갑니다.
+"""
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """스레드 안전 토큰 버킷 (분당 rate_per_minute개, 최대 burst개까지 연속 허용)"""
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """토큰을 하나 가져올 때까지 대기 (timeout 초 안에 못 가져오면 False)"""
+        if self.rate <= 0:
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
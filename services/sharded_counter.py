@@ -0,0 +1,134 @@
+"""
+분산(sharded) 카운터 모듈
+
+질문 수 통계를 컬렉션 전체 스캔 없이 얻기 위해, 질문을 저장할 때 같은 batch 안에서
+전체/일별/사용자별 카운터를 증가시킵니다. 카운터 하나는 여러 shard 문서로 나뉘어 있어
+동시에 많은 쓰기가 몰려도 문서당 쓰기 제한에 걸리지 않으며, 읽을 때는 shard 값을 합산합니다.
+
+문서 구조:
+    query_counters/{카운터 ID}/shards/{0..N-1} = {'count': 정수}
+    카운터 ID: 'total', 'day_2025-01-01'(서버 로컬 날짜), 'user_{user_id}'
+    query_counters/_meta = {'rebuilt_at': ..., 'total': 정수}  (rebuild() 완료 표시)
+
+카운터 도입 전부터 있던 질문은 배포 후 `python maintenance.py --rebuild-counters`를 한 번 실행해야 반영됩니다.
+그 전까지 get_query_statistics()는 서버 측 count 집계를 사용합니다.
+"""
+import random
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+from firebase_admin import firestore
+from config.settings import Config
+
+COUNTER_COLLECTION = 'query_counters'
+META_DOCUMENT = '_meta'
+
+
+def day_counter_id(day: date = None) -> str:
+    return f"day_{(day or date.today()).isoformat()}"
+
+
+def user_counter_id(user_id: str) -> str:
+    return f"user_{user_id}"
+
+
+class ShardedCounter:
+    """Firestore 분산 카운터 (쓰기는 임의 shard 하나, 읽기는 모든 shard 합산)"""
+
+    def __init__(self, collection_name: str = COUNTER_COLLECTION, num_shards: int = None):
+        self.collection_name = collection_name
+        self.num_shards = max(1, num_shards or Config.QUERY_COUNTER_SHARDS)
+        # rebuild() 완료 여부 (한 번 확인되면 다시 읽지 않음)
+        self._seeded = False
+
+    def _db(self):
+        from services.firebase_service import firebase_service
+        return firebase_service.db
+
+    def _shard_ref(self, db, counter_id: str, shard: int):
+        return (db.collection(self.collection_name).document(counter_id)
+                .collection('shards').document(str(shard)))
+
+    @staticmethod
+    def query_increments(user_ids: Iterable[str], day: date = None) -> Counter:
+        """질문 저장 시 증가시킬 카운터별 증가량 (같은 카운터는 하나로 합침)"""
+        increments = Counter()
+        for user_id in user_ids:
+            increments['total'] += 1
+            increments[day_counter_id(day)] += 1
+            if user_id:
+                increments[user_counter_id(user_id)] += 1
+        return increments
+
+    def add_to_batch(self, batch, increments: Dict[str, int]):
+        """batch에 카운터 증가 쓰기 추가 (카운터마다 임의 shard 하나에 Increment)"""
+        db = self._db()
+        for counter_id, amount in increments.items():
+            shard = random.randrange(self.num_shards)
+            batch.set(self._shard_ref(db, counter_id, shard),
+                      {'count': firestore.Increment(amount)}, merge=True)
+
+    def read_many(self, counter_ids: List[str]) -> Dict[str, Optional[int]]:
+        """여러 카운터를 get_all 한 번으로 읽어 합산 (shard가 하나도 없으면 None)"""
+        db = self._db()
+        refs = [self._shard_ref(db, counter_id, shard)
+                for counter_id in counter_ids for shard in range(self.num_shards)]
+
+        totals: Dict[str, Optional[int]] = {counter_id: None for counter_id in counter_ids}
+        for snapshot in db.get_all(refs):
+            if not snapshot.exists:
+                continue
+            counter_id = snapshot.reference.parent.parent.id
+            totals[counter_id] = (totals[counter_id] or 0) + (snapshot.to_dict() or {}).get('count', 0)
+        return totals
+
+    def read(self, counter_id: str) -> Optional[int]:
+        return self.read_many([counter_id])[counter_id]
+
+    def is_seeded(self) -> bool:
+        """rebuild()로 기존 질문이 카운터에 반영되었는지 여부 (아니면 카운터는 배포 이후 질문만 셈)"""
+        if not self._seeded:
+            self._seeded = self._db().collection(self.collection_name).document(META_DOCUMENT).get().exists
+        return self._seeded
+
+    def rebuild(self, source_collection: str = 'user_queries', batch_size: int = 400) -> int:
+        """기존 질문 문서를 한 번 스캔하여 카운터를 다시 계산 (배포 시 1회 실행)
+
+        기존 shard 값은 shard 0에 덮어쓰고 나머지 shard는 0으로 초기화합니다.
+        스캔과 덮어쓰기 사이에 저장된 질문은 빠질 수 있으므로 트래픽이 적을 때 실행합니다.
+        일별 카운터는 질문 저장 시(date.today())와 같이 서버 로컬 날짜 기준입니다.
+        """
+        db = self._db()
+        counts = Counter()
+        query = db.collection(source_collection).select(['user_id', 'timestamp'])
+        for doc in query.stream():
+            data = doc.to_dict() or {}
+            timestamp = data.get('timestamp')
+            day = None
+            if isinstance(timestamp, datetime):
+                # Firestore timestamp(UTC)를 서버 로컬 날짜로 변환
+                day = (timestamp.astimezone() if timestamp.tzinfo else timestamp).date()
+            counts['total'] += 1
+            if day is not None:
+                counts[day_counter_id(day)] += 1
+            if data.get('user_id'):
+                counts[user_counter_id(data['user_id'])] += 1
+
+        items = list(counts.items())
+        per_batch = max(1, batch_size // self.num_shards)
+        for start in range(0, len(items), per_batch):
+            batch = db.batch()
+            for counter_id, count in items[start:start + per_batch]:
+                for shard in range(self.num_shards):
+                    batch.set(self._shard_ref(db, counter_id, shard), {'count': count if shard == 0 else 0})
+            batch.commit()
+        db.collection(self.collection_name).document(META_DOCUMENT).set({
+            'rebuilt_at': firestore.SERVER_TIMESTAMP,
+            'total': counts['total']
+        })
+        self._seeded = True
+        return counts['total']
+
+
+# 싱글톤 인스턴스 생성
+query_counter = ShardedCounter()
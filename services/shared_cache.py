@@ -0,0 +1,206 @@
+"""
+프로세스 간 공유 캐시 모듈
+
+여러 Streamlit 프로세스가 같은 서버에서 실행될 때, 한 프로세스가 계산한 집계 결과/대시보드/LLM 답변을
+로컬 SQLite 파일(WAL 모드) 하나로 다른 프로세스와 공유합니다. 프로세스 메모리 캐시(QueryCache) 뒤의 2단계 캐시로 쓰입니다.
+
+- 쓰기: 한 항목은 INSERT OR REPLACE 한 번(트랜잭션)으로 원자적으로 저장되어, 읽는 쪽은 반쯤 쓴 값을 보지 않습니다.
+- 만료: 항목마다 TTL, 전체 크기가 SHARED_CACHE_MAX_MB를 넘으면 오래 사용하지 않은 항목부터 삭제합니다.
+- 버전 키: 네임스페이스(컬렉션, 'dashboard' 등)마다 버전 번호가 있어, invalidate()는 버전만 올리고
+  모든 프로세스가 이전 버전 항목을 더 이상 읽지 않게 됩니다. SHARED_CACHE_VERSION을 바꾸면 배포 전체 캐시가 바뀝니다.
+  get()은 조회 시점의 버전을 함께 돌려주고, 계산 후 set()에 그 버전을 넘기면 계산 중에 무효화된 결과는 저장하지 않습니다.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+from config.settings import Config
+
+FORMAT_VERSION = 1
+# 마지막 사용 시각은 이 간격(초)보다 오래됐을 때만 갱신 (읽기마다 쓰기를 만들지 않도록)
+_TOUCH_INTERVAL = 30
+
+
+class SharedCache:
+    """SQLite 파일 기반 프로세스 간 캐시"""
+
+    def __init__(self, path: str = None, max_bytes: int = None, enabled: bool = None, version: str = None):
+        self.enabled = Config.SHARED_CACHE_ENABLED if enabled is None else enabled
+        self.path = path or Config.SHARED_CACHE_PATH
+        self.max_bytes = max_bytes or Config.SHARED_CACHE_MAX_MB * 1024 * 1024
+        self.version = f"{FORMAT_VERSION}:{Config.SHARED_CACHE_VERSION if version is None else version}"
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.enabled:
+            try:
+                self._initialize()
+            except Exception as e:
+                print(f"공유 캐시 초기화 중 오류 (비활성화합니다): {str(e)}")
+                self.enabled = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """스레드별 연결 (sqlite3 연결은 스레드 간에 공유하지 않음)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _initialize(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_entries_namespace ON entries (namespace, version)")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS namespaces (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )""")
+
+    def make_key(self, namespace: str, key: Hashable) -> str:
+        """(배포 버전, 네임스페이스, 키)의 해시 (키는 repr이 프로세스 간에 같은 튜플/문자열이어야 함)"""
+        return hashlib.sha1(repr((self.version, namespace, key)).encode('utf-8')).hexdigest()
+
+    def get(self, namespace: str, key: Hashable) -> Tuple[bool, Any, Optional[int]]:
+        """(적중 여부, 값, 조회 시점의 네임스페이스 버전) 반환. 네임스페이스 버전이 바뀐 항목은 없는 것으로 취급
+
+        적중하지 않았을 때 값을 계산했다면 set(..., version=버전)으로 저장해야
+        계산하는 동안 다른 프로세스가 무효화한 결과가 새 버전으로 저장되지 않습니다.
+        """
+        if not self.enabled:
+            return False, None, None
+        cache_key = self.make_key(namespace, key)
+        now = time.time()
+        try:
+            connection = self._connection()
+            row = connection.execute("""
+                SELECT COALESCE((SELECT version FROM namespaces WHERE name = ?), 0), e.value, e.accessed_at
+                FROM (SELECT 1) LEFT JOIN entries e
+                    ON e.key = ? AND e.expires_at > ?
+                    AND e.version = COALESCE((SELECT version FROM namespaces WHERE name = e.namespace), 0)
+            """, (namespace, cache_key, now)).fetchone()
+            version, data, accessed_at = row
+            if data is None:
+                self.misses += 1
+                return False, None, version
+            if now - accessed_at > _TOUCH_INTERVAL:
+                connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, cache_key))
+            self.hits += 1
+            return True, pickle.loads(data), version
+        except Exception as e:
+            print(f"공유 캐시 조회 중 오류: {str(e)}")
+            return False, None, None
+
+    def set(self, namespace: str, key: Hashable, value: Any, ttl: int, version: int = None):
+        """값 저장 (ttl초 후 만료)
+
+        version을 주면 (get()이 돌려준 계산 시작 시점 버전) 그 사이 무효화되었을 때 저장하지 않습니다.
+        """
+        if not self.enabled or ttl <= 0:
+            return
+        cache_key = self.make_key(namespace, key)
+        now = time.time()
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(data) > self.max_bytes // 10:
+                return  # 한 항목이 전체 크기의 10%를 넘으면 저장하지 않음
+            connection = self._connection()
+            # 현재 버전이 계산 시작 시점 버전과 다르면 아무 행도 넣지 않음 (version이 없으면 현재 버전으로 저장)
+            connection.execute("""
+                INSERT OR REPLACE INTO entries (key, namespace, version, value, size, expires_at, accessed_at)
+                SELECT ?, ?, current.version, ?, ?, ?, ?
+                FROM (SELECT COALESCE((SELECT version FROM namespaces WHERE name = ?), 0) AS version) current
+                WHERE ? IS NULL OR current.version = ?
+            """, (cache_key, namespace, sqlite3.Binary(data), len(data), now + ttl, now,
+                  namespace, version, version))
+            with self._lock:
+                self._writes += 1
+                should_evict = self._writes % 50 == 0
+            if should_evict:
+                self.evict()
+        except Exception as e:
+            print(f"공유 캐시 저장 중 오류: {str(e)}")
+
+    def invalidate(self, namespace: str):
+        """네임스페이스 버전을 올려 모든 프로세스에서 기존 항목을 무효화 (실제 삭제는 evict()에서)"""
+        if not self.enabled:
+            return
+        try:
+            self._connection().execute("""
+                INSERT INTO namespaces (name, version) VALUES (?, 1)
+                ON CONFLICT(name) DO UPDATE SET version = version + 1
+            """, (namespace,))
+        except Exception as e:
+            print(f"공유 캐시 무효화 중 오류: {str(e)}")
+
+    def clear(self):
+        """모든 항목 삭제"""
+        if not self.enabled:
+            return
+        try:
+            self._connection().execute("DELETE FROM entries")
+        except Exception as e:
+            print(f"공유 캐시 삭제 중 오류: {str(e)}")
+
+    def evict(self):
+        """만료/이전 버전 항목을 지우고, 전체 크기가 한도를 넘으면 오래 사용하지 않은 항목부터 삭제"""
+        if not self.enabled:
+            return
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("""
+                    DELETE FROM entries WHERE expires_at <= ? OR version <> COALESCE(
+                        (SELECT version FROM namespaces WHERE name = entries.namespace), 0)
+                """, (time.time(),))
+                total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self.max_bytes:
+                    # 한도의 80%까지 줄임
+                    excess = total - int(self.max_bytes * 0.8)
+                    rows = connection.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+                    victims = []
+                    for key, size in rows:
+                        if excess <= 0:
+                            break
+                        victims.append((key,))
+                        excess -= size
+                    connection.executemany("DELETE FROM entries WHERE key = ?", victims)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            print(f"공유 캐시 정리 중 오류: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """공유 캐시 통계 (적중/실패는 현재 프로세스 기준)"""
+        if not self.enabled:
+            return {'entries': 0, 'bytes': 0, 'hits': 0, 'misses': 0}
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'entries': entries, 'bytes': size, 'hits': self.hits, 'misses': self.misses}
+
+
+# 싱글톤 인스턴스 생성
+shared_cache = SharedCache()
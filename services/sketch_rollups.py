@@ -0,0 +1,224 @@
+"""
+스케치 롤업 모듈
+
+일별로 HyperLogLog/KLL 스케치를 만들어 'metric_rollups' 컬렉션에 직렬화하여 저장하고,
+기간 질문("이번 달 고유 작성자 수", "가격 중앙값")은 일별 스케치를 병합하여 답합니다.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from services.lru_cache import LRUCache
+from services.sketches import HyperLogLog, KLLSketch, sketch_from_dict
+
+ROLLUP_COLLECTION = 'metric_rollups'
+
+# 스케치 정의
+# - collection / time_field: 일별로 나눌 컬렉션과 시간 필드
+# - field: 스케치에 넣을 필드 ('id'는 문서 ID)
+# - type: 'hll'(고유값 개수) 또는 'kll'(분위수)
+SKETCH_SPECS: Dict[str, Dict[str, str]] = {
+    'new_users': {'collection': 'User_V2', 'time_field': 'createdAt', 'field': 'id', 'type': 'hll'},
+    'ugc_creators': {'collection': 'PERFORMANCE_V2', 'time_field': 'createdAt',
+                     'field': 'createdUserId', 'type': 'hll'},
+    'premium_price': {'collection': 'PREMIUM_PERFORMANCE_V2', 'time_field': 'createdAt',
+                      'field': 'price', 'type': 'kll'},
+}
+
+
+def _new_sketch(sketch_type: str):
+    return HyperLogLog() if sketch_type == 'hll' else KLLSketch()
+
+
+class SketchRollupService:
+    """일별 스케치 롤업 생성/병합 서비스
+
+    지난 날짜의 롤업은 한 번 만들면 바뀌지 않으므로 Firestore와 메모리에 캐시하고,
+    오늘 날짜는 당일 데이터만 스캔하여 즉석에서 만듭니다.
+    롤업이 없는 지난 날짜는 요청된 스케치만, 빠진 기간 전체를 한 번 스캔하여 날짜별로 나눠 만듭니다.
+    """
+
+    def __init__(self, cache_size: int = 512):
+        # (스케치 이름, 날짜 문자열) -> 직렬화된 스케치 dict
+        self._day_cache = LRUCache(cache_size)
+
+    def _firebase(self):
+        from services.firebase_service import firebase_service
+        return firebase_service
+
+    @staticmethod
+    def _doc_id(day: date) -> str:
+        return f"sketches_{day.isoformat()}"
+
+    def build_day(self, day: date, names: List[str] = None) -> Dict[str, Any]:
+        """특정 날짜(UTC)의 스케치 생성 (같은 컬렉션/시간 필드는 한 번만 스캔)"""
+        return self.build_days([day], names)[day]
+
+    def build_days(self, days: List[date], names: List[str] = None) -> Dict[date, Dict[str, Any]]:
+        """여러 날짜(UTC)의 스케치를 첫날~마지막 날 구간 한 번 스캔으로 생성
+
+        Returns:
+            {날짜: {스케치 이름: 스케치}} (요청한 날짜만)
+        """
+        names = names or list(SKETCH_SPECS)
+        first, last = min(days), max(days)
+        # 날짜 경계는 UTC 시각으로 지정 (문서 날짜도 UTC 기준으로 나눔)
+        start = datetime(first.year, first.month, first.day, tzinfo=timezone.utc)
+        end = datetime(last.year, last.month, last.day, tzinfo=timezone.utc) + timedelta(days=1)
+
+        # (컬렉션, 시간 필드)별로 묶어서 한 번씩만 스캔
+        groups: Dict[tuple, List[str]] = {}
+        for name in names:
+            spec = SKETCH_SPECS[name]
+            groups.setdefault((spec['collection'], spec['time_field']), []).append(name)
+
+        sketches = {day: {name: _new_sketch(SKETCH_SPECS[name]['type']) for name in names} for day in days}
+        firebase_service = self._firebase()
+        for (collection, time_field), group_names in groups.items():
+            fields = [SKETCH_SPECS[name]['field'] for name in group_names if SKETCH_SPECS[name]['field'] != 'id']
+            filters = [
+                {'field': time_field, 'operator': '>=', 'value': start},
+                {'field': time_field, 'operator': '<', 'value': end}
+            ]
+            rows = firebase_service.stream_query(collection, filters, select=list(dict.fromkeys(fields + [time_field])))
+            for row in rows:
+                day_sketches = sketches.get(self._row_day(row.get(time_field)))
+                if day_sketches is None:
+                    continue  # 구간 안이지만 요청하지 않은 날짜
+                for name in group_names:
+                    self._add_row(day_sketches[name], SKETCH_SPECS[name], row)
+
+        return sketches
+
+    @staticmethod
+    def _row_day(value: Any) -> Optional[date]:
+        """시각의 UTC 날짜 (시간대 없는 시각은 Firestore 필터와 같이 UTC로 해석)"""
+        if not isinstance(value, datetime):
+            return None
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+
+    def build_full(self, name: str, start: datetime = None):
+        """롤업 없이 (선택적 시작 시각부터) 전체 스캔으로 스케치 생성 (메모리 사용은 스케치 크기로 고정)"""
+        spec = SKETCH_SPECS[name]
+        filters = []
+        if start is not None:
+            filters.append({'field': spec['time_field'], 'operator': '>=', 'value': start})
+        sketch = _new_sketch(spec['type'])
+        select = [spec['field']] if spec['field'] != 'id' else [spec['time_field']]
+        for row in self._firebase().stream_query(spec['collection'], filters, select=select):
+            self._add_row(sketch, spec, row)
+        return sketch
+
+    @staticmethod
+    def _add_row(sketch, spec: Dict[str, str], row: Dict[str, Any]):
+        value = row.get(spec['field'])
+        if spec['type'] == 'hll':
+            if value:
+                sketch.add(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            sketch.add(value)
+
+    def store_day(self, day: date, sketches: Dict[str, Any]) -> bool:
+        """일별 스케치를 롤업 문서에 저장"""
+        serialized = {name: sketch.to_dict() for name, sketch in sketches.items()}
+        for name, data in serialized.items():
+            self._day_cache.set((name, day.isoformat()), data)
+
+        firebase_service = self._firebase()
+        if not firebase_service.has_backend():
+            return False
+
+        try:
+            firebase_service.backend.set_document(ROLLUP_COLLECTION, self._doc_id(day), {
+                'date': day.isoformat(),
+                'sketches': serialized,
+                'updated_at': datetime.now()
+            }, merge=True)
+            return True
+        except Exception as e:
+            print(f"스케치 롤업 저장 중 오류: {str(e)}")
+            return False
+
+    def get_window_sketch(self, name: str, start: datetime, end: datetime = None):
+        """기간 내 일별 스케치를 병합하여 반환
+
+        날짜는 모두 UTC 기준이므로 '지난 날짜'는 항상 이미 끝난 UTC 날짜입니다.
+        (서버 현지 날짜를 쓰면 아직 끝나지 않은 UTC 날짜가 지난 날짜로 저장되어 이후 문서가 빠짐)
+
+        Args:
+            name: SKETCH_SPECS의 스케치 이름
+            start: 기간 시작 시각 (UTC 일 단위로 내림)
+            end: 기간 끝 시각 (기본: 현재)
+        """
+        spec = SKETCH_SPECS[name]
+        today = datetime.now(timezone.utc).date()
+        start_day = self._row_day(start)
+        end_day = self._row_day(end) if end else today
+        days = [start_day + timedelta(days=offset)
+                for offset in range((end_day - start_day).days + 1)]
+
+        merged = _new_sketch(spec['type'])
+        past_days = [day for day in days if day < today]
+
+        # 메모리 캐시에 없는 지난 날짜만 get_all 한 번으로 조회
+        missing = [day for day in past_days if not self._day_cache.contains((name, day.isoformat()))]
+        if missing:
+            self._load_days(missing)
+
+        # 롤업이 없는 날짜는 요청된 스케치만 한 번의 구간 스캔으로 생성 후 저장 (최초 1회)
+        built = {}
+        unbuilt = [day for day in past_days if not self._day_cache.contains((name, day.isoformat()))]
+        if unbuilt:
+            for day, sketches in self.build_days(unbuilt, [name]).items():
+                self.store_day(day, sketches)
+                built[day] = sketches[name]
+
+        for day in past_days:
+            if day in built:
+                merged.merge(built[day])
+                continue
+            data = self._day_cache.get((name, day.isoformat()))
+            if data is not None:
+                merged.merge(sketch_from_dict(data))
+
+        if today in days:
+            merged.merge(self.build_day(today, [name])[name])
+
+        return merged
+
+    def _load_days(self, days: List[date]):
+        """롤업 문서를 일괄 조회하여 메모리 캐시에 채움"""
+        firebase_service = self._firebase()
+        if not firebase_service.has_backend():
+            return
+
+        try:
+            docs = firebase_service.get_documents(ROLLUP_COLLECTION, [self._doc_id(day) for day in days])
+        except Exception as e:
+            print(f"스케치 롤업 조회 중 오류: {str(e)}")
+            return
+
+        for day in days:
+            doc = docs.get(self._doc_id(day))
+            if not doc:
+                continue
+            for name, data in (doc.get('sketches') or {}).items():
+                self._day_cache.set((name, day.isoformat()), data)
+
+    def distinct_count(self, name: str, start: datetime = None) -> int:
+        """고유값 개수 추정 (start가 없으면 전체 스캔)"""
+        sketch = self.get_window_sketch(name, start) if start else self.build_full(name)
+        return sketch.count()
+
+    def distinct_error(self, name: str) -> float:
+        """고유값 개수 추정의 상대 표준 오차 (HyperLogLog precision으로 결정)"""
+        return _new_sketch(SKETCH_SPECS[name]['type']).standard_error
+
+    def quantiles(self, name: str, qs: List[float], start: datetime = None) -> Dict[str, Any]:
+        """분위수 추정 (start가 없으면 전체 스캔)"""
+        sketch = self.get_window_sketch(name, start) if start else self.build_full(name)
+        return {'quantiles': dict(zip(qs, sketch.quantiles(qs))), 'count': sketch.n}
+
+
+# 싱글톤 인스턴스 생성
+sketch_rollup_service = SketchRollupService()
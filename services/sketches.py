@@ -0,0 +1,211 @@
+"""
+확률적 스케치 모듈
+
+HyperLogLog(고유값 개수)와 KLL(분위수) 스케치를 제공합니다.
+두 스케치 모두 병합 가능하며 dict로 직렬화하여 Firestore 롤업 문서에 저장할 수 있습니다.
+"""
+import base64
+import hashlib
+import math
+import random
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def _hash64(value: Any) -> int:
+    """값을 64비트 정수 해시로 변환"""
+    data = str(value).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """고유값 개수 추정용 HyperLogLog 스케치
+
+    precision=12이면 레지스터 4,096개(4KB)로 표준 오차 약 1.6%입니다.
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision은 4~16 사이여야 합니다")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, value: Any):
+        """값 추가"""
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        # 남은 비트에서 선행 0의 개수 + 1
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[Any]):
+        """여러 값 추가"""
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """다른 스케치를 병합 (레지스터별 최댓값)"""
+        if other.precision != self.precision:
+            raise ValueError("precision이 다른 HyperLogLog는 병합할 수 없습니다")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    @property
+    def standard_error(self) -> float:
+        """상대 표준 오차 (1.04 / √m)"""
+        return 1.04 / math.sqrt(self.m)
+
+    def count(self) -> int:
+        """고유값 개수 추정"""
+        if self.m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / self.m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[self.m]
+
+        estimate = alpha * self.m * self.m / sum(2.0 ** -register for register in self.registers)
+
+        # 작은 범위 보정 (Linear Counting)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """직렬화"""
+        return {
+            'type': 'hll',
+            'precision': self.precision,
+            'registers': base64.b64encode(bytes(self.registers)).decode('ascii')
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'HyperLogLog':
+        """역직렬화"""
+        sketch = cls(data['precision'])
+        sketch.registers = bytearray(base64.b64decode(data['registers']))
+        return sketch
+
+
+class KLLSketch:
+    """분위수 추정용 KLL 스케치
+
+    k=200이면 순위 오차 약 1.3%로 중앙값/백분위수를 수 KB 상태로 계산합니다.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.compactors: List[List[float]] = [[]]
+        self._random = random.Random(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(int(math.ceil(self.k * (2.0 / 3.0) ** depth)), 2)
+
+    def _size(self) -> int:
+        return sum(len(compactor) for compactor in self.compactors)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def add(self, value: float):
+        """값 추가"""
+        self.compactors[0].append(float(value))
+        self.n += 1
+        if self._size() >= self._max_size():
+            self._compress()
+
+    def update(self, values: Iterable[float]):
+        """여러 값 추가"""
+        for value in values:
+            self.add(value)
+
+    def _compress(self):
+        """용량을 넘은 레벨을 절반으로 압축하여 상위 레벨로 올림"""
+        while self._size() >= self._max_size():
+            for level in range(len(self.compactors)):
+                if len(self.compactors[level]) >= self._capacity(level):
+                    if level + 1 >= len(self.compactors):
+                        self.compactors.append([])
+                    items = sorted(self.compactors[level])
+                    # 홀수 개면 마지막 하나는 현재 레벨에 남김
+                    leftover = [items.pop()] if len(items) % 2 else []
+                    offset = self._random.randint(0, 1)
+                    self.compactors[level + 1].extend(items[offset::2])
+                    self.compactors[level] = leftover
+                    break
+            else:
+                return
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """다른 스케치를 병합"""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _weighted_items(self) -> List:
+        items = []
+        for level, compactor in enumerate(self.compactors):
+            weight = 1 << level
+            items.extend((value, weight) for value in compactor)
+        items.sort(key=lambda item: item[0])
+        return items
+
+    def quantile(self, q: float) -> Optional[float]:
+        """q 분위수 추정 (0 <= q <= 1)"""
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs: List[float]) -> List[Optional[float]]:
+        """여러 분위수를 한 번에 추정"""
+        items = self._weighted_items()
+        if not items:
+            return [None for _ in qs]
+
+        total_weight = sum(weight for _, weight in items)
+        results = []
+        for q in qs:
+            target = q * total_weight
+            cumulative = 0
+            value = items[-1][0]
+            for item_value, weight in items:
+                cumulative += weight
+                if cumulative >= target:
+                    value = item_value
+                    break
+            results.append(value)
+        return results
+
+    def to_dict(self) -> Dict[str, Any]:
+        """직렬화"""
+        return {
+            'type': 'kll',
+            'k': self.k,
+            'n': self.n,
+            # Firestore는 중첩 배열을 저장할 수 없으므로 레벨별 map으로 저장
+            'compactors': {str(level): list(compactor) for level, compactor in enumerate(self.compactors)}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'KLLSketch':
+        """역직렬화"""
+        sketch = cls(data['k'])
+        sketch.n = data['n']
+        levels = data.get('compactors') or {}
+        sketch.compactors = [list(levels[key]) for key in sorted(levels, key=int)] or [[]]
+        return sketch
+
+
+def sketch_from_dict(data: Dict[str, Any]):
+    """직렬화된 dict의 type에 맞는 스케치 복원"""
+    if data.get('type') == 'hll':
+        return HyperLogLog.from_dict(data)
+    if data.get('type') == 'kll':
+        return KLLSketch.from_dict(data)
+    raise ValueError(f"알 수 없는 스케치 타입: {data.get('type')}")
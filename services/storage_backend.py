@@ -0,0 +1,560 @@
+"""
+저장소 백엔드 모듈
+
+FirebaseService의 조회 함수들이 공통으로 사용하는 저장소 인터페이스와
+Firestore 백엔드, 로컬 분석/부하 테스트용 SQLite 백엔드를 제공합니다.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from services.deadline import DeadlineExceeded, check_deadline, time_remaining
+
+
+def parse_order_by(order_by: str) -> Tuple[str, bool]:
+    """정렬 문자열을 (필드, 내림차순 여부)로 변환
+
+    '-field'는 내림차순, '+field'는 오름차순이며 접두사가 없으면 기존 동작대로 내림차순입니다.
+    """
+    if order_by.startswith('-'):
+        return order_by[1:], True
+    if order_by.startswith('+'):
+        return order_by[1:], False
+    return order_by, True
+
+
+class StorageBackend:
+    """저장소 백엔드 인터페이스
+
+    filters는 [{'field': ..., 'operator': ..., 'value': ...}] 형식,
+    order_by는 '-field' / '+field' 형식입니다.
+    """
+
+    name = 'base'
+
+    def stream(self, collection_name: str, filters: List[Dict] = None, order_by: str = None,
+               limit: int = None, select: List[str] = None) -> Iterator[Dict]:
+        """조건에 맞는 문서를 한 건씩 반환 (문서 ID는 'id' 키)"""
+        raise NotImplementedError
+
+    def paginate(self, collection_name: str, filters: List[Dict] = None, order_by: str = None,
+                 page_size: int = 500, select: List[str] = None) -> Iterator[List[Dict]]:
+        """조건에 맞는 문서를 page_size 단위 목록으로 반환 (대용량 내보내기용)"""
+        page = []
+        for row in self.stream(collection_name, filters, order_by, select=select):
+            page.append(row)
+            if len(page) >= page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def get_documents(self, collection_name: str, doc_ids: List[str],
+                      select: List[str] = None) -> Dict[str, Optional[Dict]]:
+        """문서 ID 목록 일괄 조회 ({문서 ID: 문서 또는 None})"""
+        raise NotImplementedError
+
+    def set_document(self, collection_name: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        """문서 저장"""
+        raise NotImplementedError
+
+    def count(self, collection_name: str, filters: List[Dict] = None) -> int:
+        """조건에 맞는 문서 수"""
+        return sum(1 for _ in self.stream(collection_name, filters, select=['__name__']))
+
+    def sample(self, collection_name: str, size: int, partitions: int = 10,
+               select: List[str] = None) -> List[Dict]:
+        """컬렉션 전체에서 무작위 표본 최대 size개 (기본 구현은 전체를 한 번 읽는 저수지 표본)"""
+        reservoir: List[Dict] = []
+        for index, row in enumerate(self.stream(collection_name, select=select)):
+            if index < size:
+                reservoir.append(row)
+            else:
+                slot = random.randint(0, index)
+                if slot < size:
+                    reservoir[slot] = row
+        return reservoir
+
+    def aggregate(self, collection_name: str, aggregation_type: str, field: str,
+                  filters: List[Dict] = None) -> Dict[str, Any]:
+        """숫자 필드 집계 ('sum', 'avg', 'max', 'min')
+
+        Returns:
+            {'result': 값, 'count': 집계에 사용된 값 개수}
+        """
+        total = 0
+        count = 0
+        maximum = None
+        minimum = None
+        for row in self.stream(collection_name, filters, select=[field]):
+            value = row.get(field)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            total += value
+            count += 1
+            maximum = value if maximum is None else max(maximum, value)
+            minimum = value if minimum is None else min(minimum, value)
+
+        if not count:
+            return {'result': 0, 'count': 0}
+
+        aggregation_type = aggregation_type.lower()
+        if aggregation_type == 'sum':
+            result = total
+        elif aggregation_type == 'avg':
+            result = total / count
+        elif aggregation_type == 'max':
+            result = maximum
+        elif aggregation_type == 'min':
+            result = minimum
+        else:
+            result = 0
+        return {'result': result, 'count': count}
+
+
+class FirestoreBackend(StorageBackend):
+    """Firestore 백엔드"""
+
+    name = 'Firebase Firestore'
+
+    def __init__(self, db):
+        self.db = db
+
+    def build_query(self, collection_name: str, filters: List[Dict] = None,
+                    order_by: str = None, limit: int = None, select: List[str] = None):
+        """필터/정렬/제한/프로젝션 조건으로 Firestore 쿼리 객체 생성"""
+        from firebase_admin import firestore
+
+        # 기본 쿼리 시작
+        query_ref = self.db.collection(collection_name)
+
+        # 필터 조건 적용
+        if filters:
+            for filter_condition in filters:
+                field = filter_condition.get('field')
+                operator = filter_condition.get('operator', '==')
+                value = filter_condition.get('value')
+
+                if field and value is not None:
+                    query_ref = query_ref.where(field, operator, value)
+
+        # 정렬 조건 적용
+        if order_by:
+            field, descending = parse_order_by(order_by)
+            direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+            query_ref = query_ref.order_by(field, direction=direction)
+
+        # 결과 제한
+        if limit:
+            query_ref = query_ref.limit(limit)
+
+        # 필요한 필드만 가져오기
+        if select:
+            query_ref = query_ref.select(select)
+
+        return query_ref
+
+    def stream(self, collection_name: str, filters: List[Dict] = None, order_by: str = None,
+               limit: int = None, select: List[str] = None) -> Iterator[Dict]:
+        query_ref = self.build_query(collection_name, filters, order_by, limit, select)
+        # 요청 마감 시간이 있으면 RPC timeout으로 넘기고, 문서를 읽는 중에도 확인
+        try:
+            for doc in query_ref.stream(timeout=time_remaining()):
+                check_deadline()
+                data = doc.to_dict() or {}
+                data['id'] = doc.id  # 문서 ID 추가
+                yield data
+        except Exception:
+            # RPC timeout 오류는 마감 시간 초과로 바꿔서 전달
+            check_deadline()
+            raise
+
+    def paginate(self, collection_name: str, filters: List[Dict] = None, order_by: str = None,
+                 page_size: int = 500, select: List[str] = None) -> Iterator[List[Dict]]:
+        """커서(start_after) 기반 페이지 조회 - 긴 스트림 하나 대신 짧은 쿼리를 반복"""
+        order_by = order_by or '+__name__'
+        order_field, _ = parse_order_by(order_by)
+        if select and order_field != '__name__' and order_field not in select:
+            # 커서 위치 계산을 위해 정렬 필드는 프로젝션에 포함
+            select = list(select) + [order_field]
+
+        query_ref = self.build_query(collection_name, filters, order_by, page_size, select)
+        cursor = None
+        while True:
+            page_query = query_ref.start_after(cursor) if cursor is not None else query_ref
+            check_deadline()
+            snapshots = list(page_query.stream(timeout=time_remaining()))
+            if not snapshots:
+                return
+
+            page = []
+            if not all(self._is_auto_id(doc.id) for doc in snapshots):
+                return super().sample(collection_name, size, partitions, select)
+            for doc in snapshots:
+                data = doc.to_dict() or {}
+                data['id'] = doc.id
+                page.append(data)
+            yield page
+
+            if len(snapshots) < page_size:
+                return
+            cursor = snapshots[-1]
+
+    def get_documents(self, collection_name: str, doc_ids: List[str],
+                      select: List[str] = None) -> Dict[str, Optional[Dict]]:
+        if not doc_ids:
+            return {}
+        collection_ref = self.db.collection(collection_name)
+        refs = [collection_ref.document(doc_id) for doc_id in doc_ids]
+        results = {doc_id: None for doc_id in doc_ids}
+        for snapshot in self.db.get_all(refs, field_paths=select, timeout=time_remaining()):
+            if snapshot.exists:
+                data = snapshot.to_dict() or {}
+                data['id'] = snapshot.id
+                results[snapshot.id] = data
+        return results
+
+    def set_document(self, collection_name: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        self.db.collection(collection_name).document(doc_id).set(data, merge=merge)
+
+    def count(self, collection_name: str, filters: List[Dict] = None) -> int:
+        query_ref = self.build_query(collection_name, filters)
+        try:
+            # 서버 측 COUNT 집계 (문서를 내려받지 않음)
+            result = query_ref.count(alias='count').get(timeout=time_remaining())
+            return int(result[0][0].value)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            check_deadline()
+            # 구버전 클라이언트는 ID만 스트리밍하여 개수 계산
+            return sum(1 for _ in query_ref.select(['__name__']).stream(timeout=time_remaining()))
+
+    # 자동 생성 문서 ID 문자 (ID는 이 문자들로 균등하게 만들어지므로 ID 구간도 균등한 표본이 됨)
+    _ID_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+    _AUTO_ID_LENGTH = 20
+
+    @classmethod
+    def _is_auto_id(cls, doc_id: str) -> bool:
+        return len(doc_id) == cls._AUTO_ID_LENGTH and all(char in cls._ID_ALPHABET for char in doc_id)
+
+    def sample(self, collection_name: str, size: int, partitions: int = 10,
+               select: List[str] = None) -> List[Dict]:
+        """무작위 문서 ID 구간 표본
+
+        임의의 ID 위치 partitions곳에서 ID 순으로 size/partitions개씩 읽습니다.
+        (끝에 닿으면 처음부터 이어서 읽음) 전체를 읽지 않고 size개만 읽습니다.
+
+        문서 ID가 자동 생성 ID(20자 무작위)일 때만 ID 구간이 무작위 표본이 됩니다.
+        직접 지정한 ID(순번, 사용자 ID 등)는 ID 순으로 비슷한 문서가 모여 있어 구간 표본이 치우치므로,
+        읽은 ID가 자동 생성 ID 형식이 아니면 전체를 읽는 저수지 표본으로 대신합니다.
+        """
+        collection_ref = self.db.collection(collection_name)
+        per_partition = max(1, -(-size // max(1, partitions)))
+        base_query = collection_ref.order_by('__name__')
+        if select:
+            base_query = base_query.select(select)
+
+        rows: Dict[str, Dict] = {}
+        for _ in range(max(1, partitions)):
+            check_deadline()
+            pivot = ''.join(random.choice(self._ID_ALPHABET) for _ in range(20))
+            query_ref = base_query.where('__name__', '>=', collection_ref.document(pivot)).limit(per_partition)
+            snapshots = list(query_ref.stream(timeout=time_remaining()))
+            if len(snapshots) < per_partition:
+                snapshots += list(base_query.limit(per_partition - len(snapshots)).stream(timeout=time_remaining()))
+            if not all(self._is_auto_id(doc.id) for doc in snapshots):
+                return super().sample(collection_name, size, partitions, select)
+            for doc in snapshots:
+                data = doc.to_dict() or {}
+                data['id'] = doc.id
+                rows[doc.id] = data
+        return list(rows.values())
+
+
+def _deep_merge(base: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """중첩 dict를 재귀적으로 병합 (updates 값 우선)"""
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _deep_merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+class SQLiteBackend(StorageBackend):
+    """로컬 SQLite 백엔드
+
+    컬렉션마다 (id, data JSON) 테이블을 만들고, 스키마의 indexes 목록으로
+    json_extract 표현식 인덱스를 생성하여 필터/정렬을 인덱스 SQL로 변환합니다.
+    timestamp 필드는 UTC 기준 ISO 문자열로 저장하여 문자열 비교가 시간 순서와 일치하도록 합니다.
+    """
+
+    name = 'Local SQLite'
+
+    _COMPARISON_OPERATORS = {'==': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+    _CHUNK_SIZE = 500
+
+    def __init__(self, db_path: str, schema: Dict[str, Any] = None):
+        self.db_path = db_path
+        self.schema = schema or {}
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._lock = threading.RLock()
+        self._tables = set()
+
+        # 스키마에 정의된 timestamp 필드 (조회 시 datetime으로 복원)
+        self._timestamp_fields: Dict[str, set] = {}
+        for collection_name, collection in self.schema.get('collections', {}).items():
+            structure = collection.get('document_structure', {})
+            self._timestamp_fields[collection_name] = {
+                field for field, spec in structure.items()
+                if isinstance(spec, dict) and spec.get('type') == 'timestamp'
+            }
+            self._ensure_table(collection_name)
+
+    # === 테이블/인덱스 관리 ===
+
+    @staticmethod
+    def _quote(identifier: str) -> str:
+        return '"' + identifier.replace('"', '""') + '"'
+
+    @staticmethod
+    def _json_path(field: str) -> str:
+        # 점 표기법 중첩 필드 지원 (예: 'teams.role')
+        return '$.' + '.'.join('"' + part.replace('"', '') + '"' for part in field.split('.'))
+
+    def _field_expr(self, field: str) -> str:
+        if field in ('id', '__name__'):
+            return 'id'
+        return f"json_extract(data, '{self._json_path(field)}')"
+
+    def _ensure_table(self, collection_name: str):
+        if collection_name in self._tables:
+            return
+        table = self._quote(collection_name)
+        with self._lock:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            indexes = self.schema.get('collections', {}).get(collection_name, {}).get('indexes', [])
+            for field in indexes:
+                index_name = self._quote(f"idx_{collection_name}_{field}")
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({self._field_expr(field)})")
+            self._conn.commit()
+        self._tables.add(collection_name)
+
+    # === 값 변환 ===
+
+    @staticmethod
+    def _to_storage(value: Any) -> Any:
+        """Python 값을 SQLite 비교/저장용 값으로 변환"""
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            return value.isoformat(timespec='microseconds')
+        if isinstance(value, dict):
+            return {key: SQLiteBackend._to_storage(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [SQLiteBackend._to_storage(item) for item in value]
+        return value
+
+    def _from_storage(self, collection_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """timestamp 필드를 datetime으로 복원"""
+        for field in self._timestamp_fields.get(collection_name, ()):
+            value = data.get(field)
+            if isinstance(value, str):
+                try:
+                    data[field] = datetime.fromisoformat(value)
+                except ValueError:
+                    pass
+        return data
+
+    # === SQL 변환 ===
+
+    def _where_clause(self, filters: List[Dict] = None) -> Tuple[str, List[Any]]:
+        """필터 dict 목록을 WHERE 절과 파라미터로 변환"""
+        clauses = []
+        params: List[Any] = []
+        for filter_condition in filters or []:
+            field = filter_condition.get('field')
+            operator = filter_condition.get('operator', '==')
+            value = filter_condition.get('value')
+            if not field or value is None:
+                continue
+
+            expr = self._field_expr(field)
+            if operator in self._COMPARISON_OPERATORS:
+                clauses.append(f"{expr} {self._COMPARISON_OPERATORS[operator]} ?")
+                params.append(self._to_storage(value))
+            elif operator in ('in', 'not-in'):
+                values = [self._to_storage(item) for item in value]
+                if not values:
+                    clauses.append('0' if operator == 'in' else '1')
+                    continue
+                placeholders = ', '.join('?' for _ in values)
+                keyword = 'IN' if operator == 'in' else 'NOT IN'
+                clauses.append(f"{expr} {keyword} ({placeholders})")
+                params.extend(values)
+            elif operator in ('array-contains', 'array-contains-any'):
+                values = value if operator == 'array-contains-any' else [value]
+                values = [self._to_storage(item) for item in values]
+                placeholders = ', '.join('?' for _ in values)
+                clauses.append(
+                    f"EXISTS (SELECT 1 FROM json_each(data, '{self._json_path(field)}') "
+                    f"WHERE json_each.value IN ({placeholders}))")
+                params.extend(values)
+            else:
+                raise ValueError(f"지원하지 않는 연산자입니다: {operator}")
+
+        where = (' WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        return where, params
+
+    # === 조회/저장 ===
+
+    def stream(self, collection_name: str, filters: List[Dict] = None, order_by: str = None,
+               limit: int = None, select: List[str] = None) -> Iterator[Dict]:
+        self._ensure_table(collection_name)
+        where, params = self._where_clause(filters)
+        sql = f"SELECT id, data FROM {self._quote(collection_name)}{where}"
+        if order_by:
+            field, descending = parse_order_by(order_by)
+            sql += f" ORDER BY {self._field_expr(field)} {'DESC' if descending else 'ASC'}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+
+        # 결과 전체를 메모리에 올리지 않도록 청크 단위로 가져오기
+        while True:
+            check_deadline()
+            with self._lock:
+                rows = cursor.fetchmany(self._CHUNK_SIZE)
+            if not rows:
+                break
+            for doc_id, raw in rows:
+                data = json.loads(raw)
+                if select:
+                    data = {field: data[field] for field in select if field in data}
+                data['id'] = doc_id
+                yield self._from_storage(collection_name, data)
+
+    def get_documents(self, collection_name: str, doc_ids: List[str],
+                      select: List[str] = None) -> Dict[str, Optional[Dict]]:
+        self._ensure_table(collection_name)
+        results: Dict[str, Optional[Dict]] = {doc_id: None for doc_id in doc_ids}
+        for start in range(0, len(doc_ids), self._CHUNK_SIZE):
+            chunk = doc_ids[start:start + self._CHUNK_SIZE]
+            placeholders = ', '.join('?' for _ in chunk)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, data FROM {self._quote(collection_name)} WHERE id IN ({placeholders})",
+                    chunk).fetchall()
+            for doc_id, raw in rows:
+                data = json.loads(raw)
+                if select:
+                    data = {field: data[field] for field in select if field in data}
+                data['id'] = doc_id
+                results[doc_id] = self._from_storage(collection_name, data)
+        return results
+
+    def set_document(self, collection_name: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        self._ensure_table(collection_name)
+        with self._lock:
+            if merge:
+                existing = self._conn.execute(
+                    f"SELECT data FROM {self._quote(collection_name)} WHERE id = ?", (doc_id,)).fetchone()
+                if existing:
+                    # Firestore set(merge=True)와 같이 중첩 map도 필드 단위로 병합
+                    data = _deep_merge(json.loads(existing[0]), self._to_storage(data))
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self._quote(collection_name)} (id, data) VALUES (?, ?)",
+                (doc_id, json.dumps(self._to_storage(data), ensure_ascii=False)))
+            self._conn.commit()
+
+    def upsert_documents(self, collection_name: str, documents: List[Dict[str, Any]]) -> int:
+        """문서 목록 일괄 저장 (각 문서의 'id' 키를 문서 ID로 사용)
+
+        Returns:
+            저장한 문서 수
+        """
+        self._ensure_table(collection_name)
+        rows = []
+        for document in documents:
+            data = dict(document)
+            doc_id = str(data.pop('id'))
+            rows.append((doc_id, json.dumps(self._to_storage(data), ensure_ascii=False)))
+
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self._quote(collection_name)} (id, data) VALUES (?, ?)", rows)
+            self._conn.commit()
+        return len(rows)
+
+    def import_from(self, source: StorageBackend, collection_name: str, batch_size: int = 500) -> int:
+        """다른 백엔드(예: Firestore)의 컬렉션을 로컬로 복사
+
+        Returns:
+            복사한 문서 수
+        """
+        copied = 0
+        batch = []
+        for document in source.stream(collection_name):
+            batch.append(document)
+            if len(batch) >= batch_size:
+                copied += self.upsert_documents(collection_name, batch)
+                batch = []
+        if batch:
+            copied += self.upsert_documents(collection_name, batch)
+        return copied
+
+    def count(self, collection_name: str, filters: List[Dict] = None) -> int:
+        self._ensure_table(collection_name)
+        where, params = self._where_clause(filters)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT COUNT(*) FROM {self._quote(collection_name)}{where}", params).fetchone()
+        return int(row[0])
+
+    def sample(self, collection_name: str, size: int, partitions: int = 10,
+               select: List[str] = None) -> List[Dict]:
+        """SQLite 안에서 무작위 정렬 후 size개 (문서를 Python으로 모두 가져오지 않음)"""
+        self._ensure_table(collection_name)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, data FROM {self._quote(collection_name)} ORDER BY RANDOM() LIMIT ?",
+                (int(size),)).fetchall()
+        results = []
+        for doc_id, raw in rows:
+            data = json.loads(raw)
+            if select:
+                data = {field: data[field] for field in select if field in data}
+            data['id'] = doc_id
+            results.append(self._from_storage(collection_name, data))
+        return results
+
+    def aggregate(self, collection_name: str, aggregation_type: str, field: str,
+                  filters: List[Dict] = None) -> Dict[str, Any]:
+        functions = {'sum': 'SUM', 'avg': 'AVG', 'max': 'MAX', 'min': 'MIN'}
+        function = functions.get(aggregation_type.lower())
+        if function is None:
+            return {'result': 0, 'count': 0}
+
+        self._ensure_table(collection_name)
+        where, params = self._where_clause(filters)
+        expr = self._field_expr(field)
+        # 숫자 값만 집계 (불리언은 json에서 true/false 타입이므로 제외됨)
+        numeric = f"json_type(data, '{self._json_path(field)}') IN ('integer', 'real')"
+        where = f"{where} AND {numeric}" if where else f" WHERE {numeric}"
+        with self._lock:
+            result, count = self._conn.execute(
+                f"SELECT {function}({expr}), COUNT({expr}) FROM {self._quote(collection_name)}{where}",
+                params).fetchone()
+        return {'result': result or 0, 'count': count}
@@ -0,0 +1,261 @@
+"""
+단계별 추적(tracing) 모듈
+
+질문 하나를 처리하는 동안 스키마 로드, LLM 호출, Firestore 조회 같은 단계를 중첩 span으로 기록합니다.
+각 span에는 스레드 ID와 속성(문서 수, 토큰 수, 캐시 적중 등)이 붙으며,
+기록은 Chrome trace-event JSON(chrome://tracing, Perfetto)으로 내보내거나 화면의 단계별 막대(waterfall)로 볼 수 있습니다.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from config.settings import Config
+
+
+class Span:
+    """하나의 처리 단계"""
+
+    __slots__ = ('name', 'parent', 'depth', 'start', 'end', 'thread_id', 'thread_name', 'attributes')
+
+    def __init__(self, name: str, parent: Optional['Span'], attributes: Dict[str, Any]):
+        thread = threading.current_thread()
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.thread_id = threading.get_ident()
+        self.thread_name = thread.name
+        self.attributes = dict(attributes)
+
+    def set(self, **attributes):
+        """속성 추가 (예: span.set(doc_count=120, cache_hit=False))"""
+        self.attributes.update(attributes)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+
+class _NullSpan:
+    """추적 중이 아닐 때 사용하는 아무 일도 하지 않는 span"""
+
+    def set(self, **attributes):
+        pass
+
+    def finish(self):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """요청 하나에 대한 span 모음"""
+
+    def __init__(self, name: str, attributes: Dict[str, Any] = None):
+        self.name = name
+        self.started_at = datetime.now()
+        self._origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self.root = self.add(name, None, attributes or {})
+
+    def add(self, name: str, parent: Optional[Span], attributes: Dict[str, Any]) -> Span:
+        span = Span(name, parent, attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def waterfall(self) -> List[Dict[str, Any]]:
+        """화면 표시용 단계 목록 (시작 순, 시작/끝은 요청 시작 기준 ms)"""
+        rows = []
+        for span in sorted(self.spans, key=lambda item: item.start):
+            start_ms = (span.start - self._origin) * 1000
+            rows.append({
+                'name': span.name,
+                'depth': span.depth,
+                'start_ms': round(start_ms, 2),
+                'end_ms': round(start_ms + span.duration_ms, 2),
+                'duration_ms': round(span.duration_ms, 2),
+                'thread': span.thread_name,
+                'attributes': span.attributes,
+            })
+        return rows
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Chrome trace-event 형식 (완료 이벤트 'X', 시간 단위 µs)"""
+        pid = os.getpid()
+        origin_us = self.started_at.timestamp() * 1_000_000
+        events = []
+        threads = {}
+        for span in self.spans:
+            threads[span.thread_id] = span.thread_name
+            events.append({
+                'name': span.name,
+                'cat': span.name.split('.')[0],
+                'ph': 'X',
+                'ts': round(origin_us + (span.start - self._origin) * 1_000_000, 1),
+                'dur': round(span.duration_ms * 1000, 1),
+                'pid': pid,
+                'tid': span.thread_id,
+                'args': {key: _jsonable(value) for key, value in span.attributes.items()},
+            })
+        for thread_id, thread_name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id,
+                           'args': {'name': thread_name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path: str) -> str:
+        """Chrome trace-event JSON 파일로 저장"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_chrome(), file, ensure_ascii=False)
+        return path
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar('current_trace', default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('current_span', default=None)
+
+
+class Tracer:
+    """추적 시작/단계 기록 관리"""
+
+    def __init__(self, enabled: bool = None, history: int = None, export_dir: str = None):
+        self.enabled = Config.TRACE_ENABLED if enabled is None else enabled
+        self.export_dir = Config.TRACE_EXPORT_DIR if export_dir is None else export_dir
+        # 최근 완료된 추적 (디버그 화면용)
+        self.recent: deque = deque(maxlen=history or Config.TRACE_HISTORY)
+
+    def current_trace(self) -> Optional[Trace]:
+        return _current_trace.get()
+
+    def current_span(self):
+        """현재 span (추적 중이 아니면 아무 일도 하지 않는 span)"""
+        return _current_span.get() or _NULL_SPAN
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Optional[Trace]]:
+        """요청 단위 추적 시작 (이미 추적 중이면 하위 단계로 기록)"""
+        existing = _current_trace.get()
+        if not self.enabled or existing is not None:
+            with self.span(name, **attributes):
+                yield existing
+            return
+
+        trace = Trace(name, attributes)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(trace.root)
+        try:
+            yield trace
+        except Exception as e:
+            trace.root.set(error=str(e))
+            raise
+        finally:
+            trace.root.finish()
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            self.recent.append(trace)
+            if self.export_dir:
+                self._export(trace)
+
+    def _export(self, trace: Trace):
+        filename = f"trace_{trace.started_at.strftime('%Y%m%d_%H%M%S_%f')}.json"
+        try:
+            trace.export(os.path.join(self.export_dir, filename))
+        except Exception as e:
+            print(f"추적 파일 저장 중 오류: {str(e)}")
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """현재 추적 안에 단계 기록 (추적 중이 아니면 아무것도 기록하지 않음)"""
+        trace = _current_trace.get()
+        if trace is None:
+            yield _NULL_SPAN
+            return
+
+        span = trace.add(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=str(e))
+            raise
+        finally:
+            span.finish()
+            _current_span.reset(token)
+
+    def traced(self, name: str = None, arguments: List[str] = None) -> Callable:
+        """함수 전체를 하나의 단계로 기록하는 데코레이터
+
+        arguments에 적은 인자 값은 span 속성으로 기록합니다.
+        제너레이터 함수는 반환한 항목 수를 items 속성으로 기록하며, 소비가 끝날 때 단계가 닫힙니다.
+        """
+        def decorator(func: Callable) -> Callable:
+            span_name = name or func.__qualname__
+            signature = inspect.signature(func)
+
+            def argument_attributes(args, kwargs) -> Dict[str, Any]:
+                if not arguments:
+                    return {}
+                bound = signature.bind_partial(*args, **kwargs).arguments
+                return {key: bound[key] for key in arguments if bound.get(key) is not None}
+
+            if inspect.isgeneratorfunction(func):
+                @functools.wraps(func)
+                def generator_wrapper(*args, **kwargs):
+                    trace = _current_trace.get()
+                    if trace is None:
+                        yield from func(*args, **kwargs)
+                        return
+                    # 제너레이터는 다른 시점/컨텍스트에서 소비될 수 있으므로 현재 span으로 설정하지 않음
+                    span = trace.add(span_name, _current_span.get(), argument_attributes(args, kwargs))
+                    items = 0
+                    try:
+                        for item in func(*args, **kwargs):
+                            items += 1
+                            yield item
+                    except Exception as e:
+                        span.set(error=str(e))
+                        raise
+                    finally:
+                        span.set(items=items)
+                        span.finish()
+                return generator_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    return func(*args, **kwargs)
+                with self.span(span_name, **argument_attributes(args, kwargs)):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+# 싱글톤 인스턴스 생성
+tracer = Tracer()
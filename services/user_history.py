@@ -0,0 +1,157 @@
+"""
+사용자별 최근 대화 기록 모듈
+
+user_history/{user_id} 문서 하나에 최근 N개 대화를 링 버퍼(오래된 것부터 밀려남)로 보관하여,
+사이드바와 대화 맥락 조회를 user_queries 인덱스 쿼리 대신 문서 1회 읽기로 처리합니다.
+user_queries 원본은 보존 기간이 지나면 compact()로 보관(archive) 또는 삭제합니다.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from firebase_admin import firestore
+from config.settings import Config
+from services.deadline import time_remaining
+
+HISTORY_COLLECTION = 'user_history'
+
+
+class UserHistoryStore:
+    """사용자별 링 버퍼 문서 관리"""
+
+    def __init__(self, size: int = None, response_chars: int = None):
+        self.size = size or Config.USER_HISTORY_SIZE
+        self.response_chars = response_chars or Config.USER_HISTORY_RESPONSE_CHARS
+
+    def _db(self):
+        from services.firebase_service import firebase_service
+        return firebase_service.db
+
+    def _ref(self, db, user_id: str):
+        return db.collection(HISTORY_COLLECTION).document(user_id)
+
+    def make_turn(self, doc_id: str, user_id: str, query: str, response: str) -> Dict[str, Any]:
+        """링 버퍼에 넣을 대화 항목 (배열 안에는 SERVER_TIMESTAMP를 쓸 수 없어 현재 시각 사용)"""
+        return {
+            'id': doc_id,
+            'user_id': user_id,
+            'query': query,
+            'response': (response or '')[:self.response_chars],
+            'timestamp': datetime.now(timezone.utc)
+        }
+
+    def _merge(self, existing: List[Dict[str, Any]], new_turns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """ID 기준으로 합치고 시각 순으로 정렬하여 최근 size개만 남김 (오래된 것부터)"""
+        by_id = {turn.get('id'): turn for turn in existing}
+        by_id.update({turn.get('id'): turn for turn in new_turns})
+        epoch = datetime.min.replace(tzinfo=timezone.utc)
+        ordered = sorted(by_id.values(), key=lambda turn: turn.get('timestamp') or epoch)
+        return ordered[-self.size:]
+
+    def turn_from_document(self, user_id: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        """user_queries 문서를 링 버퍼 항목과 같은 모양으로 변환 (답변은 response_chars까지)"""
+        return {
+            'id': item.get('id'),
+            'user_id': user_id,
+            'query': item.get('query', ''),
+            'response': (item.get('response') or '')[:self.response_chars],
+            'timestamp': item.get('timestamp')
+        }
+
+    def _write(self, transaction, ref, new_turns: List[Dict[str, Any]], complete: bool = None):
+        """트랜잭션 안에서 링 버퍼 읽기 → 합치기 → 쓰기"""
+        self._set(transaction, ref, ref.get(transaction=transaction), new_turns, complete)
+
+    def _set(self, transaction, ref, snapshot, new_turns: List[Dict[str, Any]], complete: bool = None):
+        """읽어 둔 링 버퍼 문서에 새 대화를 합쳐서 쓰기"""
+        data = snapshot.to_dict() if snapshot.exists else {}
+        transaction.set(ref, {
+            'turns': self._merge(data.get('turns') or [], new_turns),
+            # 처음 만드는 문서는 이전 기록을 아직 모르므로 미완성으로 표시 (backfill 시 완성)
+            'complete': data.get('complete', False) if complete is None else complete,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        })
+
+    def append_in_transaction(self, transaction, user_id: str, turns: List[Dict[str, Any]]):
+        """질문 문서 저장과 같은 트랜잭션 안에서 링 버퍼에 대화 추가"""
+        self._write(transaction, self._ref(self._db(), user_id), turns)
+
+    def append_many_in_transaction(self, transaction, turns_by_user: Dict[str, List[Dict[str, Any]]]):
+        """여러 사용자의 링 버퍼를 같은 트랜잭션 안에서 갱신 (일괄 저장용)
+
+        트랜잭션은 모든 읽기가 쓰기보다 먼저 와야 하므로 링 버퍼 문서를 get_all로 한꺼번에 읽은 뒤 씁니다.
+        """
+        db = self._db()
+        refs = {user_id: self._ref(db, user_id) for user_id in turns_by_user}
+        snapshots = {snapshot.id: snapshot for snapshot in db.get_all(list(refs.values()), transaction=transaction)}
+        for user_id, turns in turns_by_user.items():
+            self._set(transaction, refs[user_id], snapshots[user_id], turns)
+
+    def read(self, user_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """최근 limit개 대화 (최신순). 링 버퍼만으로 답할 수 없으면 None"""
+        if limit > self.size:
+            return None
+        snapshot = self._ref(self._db(), user_id).get(timeout=time_remaining())
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict() or {}
+        turns = data.get('turns') or []
+        if len(turns) < limit and not data.get('complete'):
+            return None
+        return list(reversed(turns))[:limit]
+
+    def backfill(self, user_id: str, queries: List[Dict[str, Any]]):
+        """user_queries 조회 결과(최신 size개)로 링 버퍼를 채우고 완성으로 표시"""
+        db = self._db()
+        ref = self._ref(db, user_id)
+        turns = [self.turn_from_document(user_id, item) for item in queries]
+
+        @firestore.transactional
+        def update(transaction):
+            self._write(transaction, ref, turns, complete=True)
+
+        update(db.transaction())
+
+    def compact(self, max_age_days: int = None, archive: bool = False, batch_size: int = 400,
+                dry_run: bool = False) -> int:
+        """보존 기간이 지난 user_queries 문서를 batch 단위로 보관/삭제
+
+        Args:
+            max_age_days: 보존 기간 (일)
+            archive: True면 QUERY_ARCHIVE_COLLECTION에 복사한 뒤 삭제
+            batch_size: 한 번에 처리할 문서 수 (보관 시 문서당 쓰기 2회이므로 최대 250)
+            dry_run: True면 대상 문서 수만 세고 변경하지 않음
+
+        Returns:
+            처리(또는 대상) 문서 수
+        """
+        db = self._db()
+        max_age_days = max_age_days if max_age_days is not None else Config.QUERY_RETENTION_DAYS
+        cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+        batch_size = min(batch_size, 250 if archive else 500)
+        base_query = db.collection('user_queries').where('timestamp', '<', cutoff)
+
+        if dry_run:
+            from services.storage_backend import FirestoreBackend
+            return FirestoreBackend(db).count('user_queries', [
+                {'field': 'timestamp', 'operator': '<', 'value': cutoff}])
+
+        processed = 0
+        while True:
+            docs = list(base_query.order_by('timestamp').limit(batch_size).stream())
+            if not docs:
+                break
+            batch = db.batch()
+            for doc in docs:
+                if archive:
+                    batch.set(db.collection(Config.QUERY_ARCHIVE_COLLECTION).document(doc.id), doc.to_dict())
+                batch.delete(doc.reference)
+            batch.commit()
+            processed += len(docs)
+
+        if processed:
+            from services.query_cache import query_cache
+            query_cache.invalidate('user_queries')
+        return processed
+
+
+# 싱글톤 인스턴스 생성
+user_history_store = UserHistoryStore()
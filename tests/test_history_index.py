@@ -0,0 +1,79 @@
+"""
+history_index 여러 프로세스 병합/삭제 테스트
+
+같은 파일을 쓰는 HistoryIndex 두 개로 다른 프로세스를 흉내 냅니다.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import history_index as history_index_module
+from services.history_index import HistoryIndex
+
+OLD = datetime(2020, 1, 1)
+NOW = datetime.now()
+
+
+@pytest.fixture
+def make_index(tmp_path, monkeypatch):
+    # 검색할 때마다 파일 변경을 확인하도록 갱신 간격을 없앰
+    monkeypatch.setattr(history_index_module, '_REFRESH_INTERVAL', 0)
+    path = str(tmp_path / 'history_index.json.gz')
+    return lambda: HistoryIndex(path=path, response_chars=200, flush_every=100)
+
+
+def ids(results):
+    return sorted(result['id'] for result in results)
+
+
+def test_flush_merges_documents_from_other_instance(make_index):
+    first, second = make_index(), make_index()
+    first.add('q1', 'u1', '오늘 매출 알려줘', '매출은 100만원입니다', NOW)
+    first.flush()
+    second.add('q2', 'u2', '이번 주 매출은?', '매출은 500만원입니다', NOW)
+    second.flush()
+
+    assert ids(second.search('매출')) == ['q1', 'q2']
+    assert ids(first.search('매출')) == ['q1', 'q2']
+    assert ids(make_index().search('매출')) == ['q1', 'q2']
+
+
+def test_unflushed_documents_survive_merge(make_index):
+    first, second = make_index(), make_index()
+    first.add('q1', 'u1', '가입자 수', '10명', NOW)
+    first.flush()
+    second.add('q2', 'u2', '가입자 추이', '증가', NOW)
+
+    # second는 아직 저장하지 않은 q2를 유지한 채 q1을 가져옴
+    assert ids(second.search('가입자')) == ['q1', 'q2']
+    second.flush()
+    assert ids(make_index().search('가입자')) == ['q1', 'q2']
+
+
+def test_remove_older_than_compacts_memory_and_propagates(make_index):
+    first, second = make_index(), make_index()
+    first.add('q1', 'u1', '작년 환불 건수', '3건', OLD)
+    first.add('q2', 'u1', '오늘 환불 건수', '1건', NOW)
+    first.flush()
+    second.add('q3', 'u2', '이번 달 환불 금액', '5만원', NOW)
+    second.flush()
+
+    # 다른 인스턴스가 저장한 파일에 q1이 있어도 지운 문서를 다시 가져오지 않음
+    assert first.remove_older_than(NOW - timedelta(days=1)) == 1
+    assert [doc['id'] for doc in first.docs] == ['q2', 'q3']
+    assert len(first._texts) == 2 and not first._deleted
+    assert ids(first.search('환불')) == ['q2', 'q3']
+
+    # 다른 인스턴스도 파일을 다시 읽으면 메모리에서 삭제분을 정리
+    assert ids(second.search('환불')) == ['q2', 'q3']
+    assert [doc['id'] for doc in second.docs] == ['q2', 'q3']
+    assert ids(make_index().search('환불')) == ['q2', 'q3']
+
+
+def test_search_by_single_character_and_user(make_index):
+    index = make_index()
+    index.add('q1', 'u1', '공연 목록', '3개', NOW)
+    index.add('q2', 'u2', '공지 사항', '없음', NOW)
+
+    assert ids(index.search('공')) == ['q1', 'q2']
+    assert ids(index.search('공', user_id='u2')) == ['q2']